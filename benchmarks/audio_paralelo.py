@@ -0,0 +1,64 @@
+"""Escalado de la compresión de audio por tramas con 1 a N procesos.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.audio_paralelo [segundos] [max_procesos]
+"""
+import os
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+from compresion_audio.huffman_audio import CompresionAudio
+
+
+def _wav_de_prueba(ruta, segundos, frecuencia=44100):
+    # Estéreo de 16 bits: acordes con armónicos y ruido, siempre igual
+    rng = np.random.default_rng(1234)
+    t = np.arange(segundos * frecuencia) / frecuencia
+    senal = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((220, 330, 440, 660)))
+    senal = senal / np.abs(senal).max() * 12000
+    izquierdo = senal + rng.normal(0, 200, len(t))
+    derecho = 0.8 * senal + rng.normal(0, 200, len(t))
+    with wave.open(ruta, "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(frecuencia)
+        wav.writeframes(np.stack((izquierdo, derecho), axis=1).astype("<i2").tobytes())
+
+
+def _medir(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    segundos = int(sys.argv[1]) if len(sys.argv) > 1 else 120
+    maximo = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "bench.wav")
+        _wav_de_prueba(ruta, segundos)
+        tamano = os.path.getsize(ruta)
+        with open(ruta, "rb") as f:
+            original = f.read()
+        print(f"{segundos} s de audio estéreo ({tamano / 1e6:.1f} MB)")
+
+        base = None
+        for n in range(1, maximo + 1):
+            comp = CompresionAudio(ruta)
+            salida = os.path.join(carpeta, f"bench_{n}.flac")
+            t_comp, _ = _medir(lambda: comp.comprimir(salida, crear_copia_wav=False, n_procesos=n))
+            destino = os.path.join(carpeta, f"bench_{n}.wav")
+            t_desc, _ = _medir(lambda: comp.extraerArchivo(salida, destino, n_procesos=n))
+            with open(destino, "rb") as f:
+                assert f.read() == original
+            base = base or (t_comp, t_desc)
+            print(f"{n:2d} procesos  comprimir: {tamano / t_comp / 1e6:6.2f} MB/s (x{base[0] / t_comp:.2f})  "
+                  f"descomprimir: {tamano / t_desc / 1e6:6.2f} MB/s (x{base[1] / t_desc:.2f})")
+
+
+if __name__ == "__main__":
+    main()
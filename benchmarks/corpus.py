@@ -0,0 +1,163 @@
+"""Corpus sintéticos y deterministas para los benchmarks.
+
+Cada generador escribe un archivo en `carpeta` a partir de una semilla fija,
+así dos corridas (o dos máquinas) miden exactamente los mismos datos. Las
+imágenes necesitan Pillow y NumPy; si no están, esos corpus se omiten.
+"""
+import math
+import os
+import random
+import struct
+import sys
+import wave
+from array import array
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:
+    np = Image = None
+
+# Tamaño aproximado de cada corpus: bytes para texto y binarios, lado en
+# píxeles para imágenes y segundos para audio
+TAMANOS = {
+    "chico": {"bytes": 64 * 1024, "lado": 128, "segundos": 1},
+    "mediano": {"bytes": 1024 * 1024, "lado": 512, "segundos": 10},
+    "grande": {"bytes": 8 * 1024 * 1024, "lado": 1024, "segundos": 60},
+}
+
+_PALABRAS = ("de la que el en y a los se del las un por con no una su para es al lo "
+             "como más pero sus le ya o este sí porque esta entre cuando muy sin sobre "
+             "también me hasta hay donde quien desde todo nos durante todos uno les "
+             "ni contra otros ese eso ante ellos e esto mí antes algunos qué unos yo "
+             "otro otras otra él tanto esa estos mucho quienes nada muchos cual poco "
+             "compresión archivo código árbol niño corazón canción información "
+             "años país ciudad mañana según después señor días acción también").split()
+
+
+# ---------------- Texto y binarios ----------------
+
+def texto(ruta, n_bytes, semilla=1):
+    """Texto parecido al español: palabras con frecuencia de Zipf, puntuación y párrafos."""
+    rng = random.Random(semilla)
+    pesos = [1 / (i + 1) for i in range(len(_PALABRAS))]
+    partes = []
+    total = 0
+    oracion = 0
+    while total < n_bytes:
+        palabra = rng.choices(_PALABRAS, pesos)[0]
+        if oracion == 0:
+            palabra = palabra.capitalize()
+        oracion += 1
+        if oracion > rng.randint(6, 18):
+            palabra += rng.choice((".", ".", ",", ";", ".\n"))
+            oracion = 0 if palabra[-1] in ".\n" else oracion
+        partes.append(palabra)
+        total += len(palabra.encode("utf-8")) + 1
+    with open(ruta, "wb") as f:
+        # Se corta en n_bytes sin dejar un carácter UTF-8 a medias
+        f.write(" ".join(partes).encode("utf-8")[:n_bytes].decode("utf-8", "ignore").encode("utf-8"))
+
+
+def binario_aleatorio(ruta, n_bytes, semilla=2):
+    """Bytes uniformes: no se pueden comprimir, mide el costo fijo del códec."""
+    with open(ruta, "wb") as f:
+        f.write(random.Random(semilla).randbytes(n_bytes))
+
+
+def binario_estructurado(ruta, n_bytes, semilla=3):
+    """Registros de tamaño fijo con contadores, códigos repetidos y medidas con ruido."""
+    rng = random.Random(semilla)
+    registro = struct.Struct("<IHhf8s")
+    codigos = [bytes(rng.choice(b"ABCDEFGH") for _ in range(8)) for _ in range(12)]
+    datos = bytearray()
+    i = 0
+    while len(datos) < n_bytes:
+        datos += registro.pack(i, i % 60, rng.randint(-50, 50),
+                               20 + 5 * math.sin(i / 100) + rng.random(), rng.choice(codigos))
+        i += 1
+    with open(ruta, "wb") as f:
+        f.write(datos[:n_bytes])
+
+
+# ---------------- Imágenes ----------------
+
+def _imagen_plana(lado, semilla):
+    # Fondo liso con rectángulos de pocos colores, como un diagrama o captura
+    rng = np.random.default_rng(semilla)
+    pixeles = np.full((lado, lado, 3), 245, dtype=np.uint8)
+    colores = rng.integers(0, 256, (12, 3), dtype=np.uint8)
+    for _ in range(lado // 8):
+        x, y = rng.integers(0, lado, 2)
+        w, h = rng.integers(lado // 20 + 1, lado // 4 + 2, 2)
+        pixeles[y:y + h, x:x + w] = colores[rng.integers(0, len(colores))]
+    return pixeles
+
+
+def _imagen_fotografica(lado, semilla):
+    # Degradados suaves, manchas y ruido de sensor
+    rng = np.random.default_rng(semilla)
+    y, x = np.mgrid[0:lado, 0:lado] / lado
+    canales = []
+    for c in range(3):
+        fase = rng.random(3) * 6
+        base = 128 + 60 * np.sin(3 * x + fase[0]) * np.cos(2 * y + fase[1]) + 40 * np.sin(9 * (x + y) + fase[2])
+        canales.append(base + rng.normal(0, 6, (lado, lado)))
+    return np.clip(np.stack(canales, axis=2), 0, 255).astype(np.uint8)
+
+
+def imagen(ruta, lado, tipo, semilla=4):
+    """`tipo` es "plana" o "fotografica"; el formato sale de la extensión (.bmp/.png)."""
+    generar = _imagen_plana if tipo == "plana" else _imagen_fotografica
+    Image.fromarray(generar(lado, semilla)).save(ruta)
+
+
+# ---------------- Audio ----------------
+
+def wav(ruta, segundos, tipo, semilla=5, frecuencia=44100, canales=2):
+    """WAV de 16 bits: "silencio", "seno" (440 Hz con armónicos) o "ruido" blanco."""
+    rng = random.Random(semilla)
+    n = segundos * frecuencia
+    if tipo == "silencio":
+        muestras = array("h", bytes(2 * n))
+    elif tipo == "seno":
+        paso = 2 * math.pi * 440 / frecuencia
+        muestras = array("h", (int(9000 * math.sin(paso * i) + 3000 * math.sin(3 * paso * i)) for i in range(n)))
+    else:
+        muestras = array("h", (max(-32768, min(32767, int(rng.gauss(0, 4000)))) for _ in range(n)))
+    intercaladas = array("h", bytes(2 * n * canales))
+    for c in range(canales):
+        intercaladas[c::canales] = muestras
+    if sys.byteorder == "big":
+        intercaladas.byteswap()
+    with wave.open(ruta, "wb") as w:
+        w.setnchannels(canales)
+        w.setsampwidth(2)
+        w.setframerate(frecuencia)
+        w.writeframes(intercaladas.tobytes())
+
+
+def generar(carpeta, tamano="chico"):
+    """Escribe todos los corpus de un tamaño -> {categoría: [(nombre, ruta)]}."""
+    medidas = TAMANOS[tamano]
+    os.makedirs(carpeta, exist_ok=True)
+    corpus = {"texto": [], "imagen": [], "audio": []}
+
+    for nombre, extension, generador in (("texto", ".txt", texto), ("aleatorio", ".bin", binario_aleatorio),
+                                         ("estructurado", ".bin", binario_estructurado)):
+        destino = os.path.join(carpeta, f"{nombre}_{tamano}{extension}")
+        generador(destino, medidas["bytes"])
+        corpus["texto"].append((nombre, destino))
+
+    if Image is not None:
+        for tipo in ("plana", "fotografica"):
+            for extension in (".bmp", ".png"):
+                destino = os.path.join(carpeta, f"{tipo}_{tamano}{extension}")
+                imagen(destino, medidas["lado"], tipo)
+                corpus["imagen"].append((f"{tipo}{extension}", destino))
+
+    for tipo in ("silencio", "seno", "ruido"):
+        destino = os.path.join(carpeta, f"{tipo}_{tamano}.wav")
+        wav(destino, medidas["segundos"], tipo)
+        corpus["audio"].append((tipo, destino))
+    return corpus
@@ -0,0 +1,74 @@
+"""Compara el recorrido del árbol bit a bit con el decodificador por tabla.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.decodificador_huffman [tamaño_en_KB]
+"""
+import random
+import sys
+import time
+
+from compresion_texto import hyffman, gestor_archivos_texto
+from compresion_audio.huffman_audio import CompresionAudio
+from utils.huffman_canonico import codigos_canonicos, codigos_como_texto
+
+
+def _texto_de_prueba(n):
+    rng = random.Random(1234)
+    palabras = ("de la que el en y a los se del las un por con no una su para es "
+                "al lo como más pero sus le ya o este sí porque esta entre cuando "
+                "compresión árbol código niño corazón").split()
+    partes = []
+    total = 0
+    while total < n:
+        palabra = rng.choice(palabras)
+        partes.append(palabra)
+        total += len(palabra) + 1
+    return " ".join(partes)[:n]
+
+
+def _medir(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+def comparar_texto(n):
+    texto = _texto_de_prueba(n)
+    datos, n_bits, longitudes, _ = hyffman.comprimir_texto(texto)
+    tabla = codigos_canonicos(longitudes)
+
+    t_arbol, r_arbol = _medir(gestor_archivos_texto.descomprimir_con_arbol,
+                              datos, n_bits, codigos_como_texto(tabla))
+    t_tabla, r_tabla = _medir(gestor_archivos_texto.descomprimir_con_tabla, datos, n_bits, tabla)
+    assert r_arbol == r_tabla == texto
+    return t_arbol, t_tabla
+
+
+def comparar_audio(n):
+    rng = random.Random(99)
+    muestras = [min(255, max(0, int(rng.gauss(128, 12)))) for _ in range(n)]
+    comp = CompresionAudio("bench.wav", muestras)
+    freqs = {}
+    for m in muestras:
+        freqs[m] = freqs.get(m, 0) + 1
+    longitudes, _ = comp.longitudesCanonicas(freqs)
+    tabla = codigos_canonicos(longitudes)
+    datos, n_bits = comp.codificar(muestras, tabla)
+
+    t_arbol, r_arbol = _medir(comp.decodificar, datos, n_bits, comp.arbolDesdeCodigos(tabla))
+    t_tabla, r_tabla = _medir(comp._decodificar_desde_paquete, datos, n_bits, longitudes, n)
+    assert bytes(r_arbol) == r_tabla == bytes(muestras)
+    return t_arbol, t_tabla
+
+
+def main():
+    kb = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    n = kb * 1024
+    for nombre, comparar in (("texto", comparar_texto), ("audio", comparar_audio)):
+        t_arbol, t_tabla = comparar(n)
+        print(f"{nombre:6s} {kb} KB  árbol: {n / t_arbol / 1e6:6.2f} MB/s  "
+              f"tabla: {n / t_tabla / 1e6:6.2f} MB/s  (x{t_arbol / t_tabla:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Benchmarks de los tres códecs sobre corpus sintéticos reproducibles.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.suite correr [-t chico,mediano] [-c texto,imagen,audio] [-o resultados.json]
+    python -m benchmarks.suite comparar base.json nuevo.json [--umbral 0.10]
+
+`correr` genera los corpus (benchmarks/corpus.py) en una carpeta temporal,
+comprime y descomprime cada uno, verifica que la salida sea igual a la
+entrada y guarda velocidad (MB/s del original), proporción comprimida y
+pico de memoria (tracemalloc). El tiempo es el mejor de varias repeticiones
+sin tracemalloc, que hace todo más lento; la memoria sale de una corrida
+aparte con tracemalloc activo.
+
+`comparar` muestra las diferencias entre dos corridas y termina con código
+1 si alguna métrica empeoró más que el umbral.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks import corpus
+from utils.comparador import comparar_resultados, proporcion
+from utils.metricas import SIN_METRICAS
+from utils.operaciones import CODECS, EXTENSIONES
+
+
+# ---------------- Operaciones por códec ----------------
+
+def _operar(funcion, entrada, salida):
+    # Las operaciones de utils.operaciones no sobrescriben: cada repetición
+    # empieza sin la salida de la anterior
+    if os.path.exists(salida):
+        os.remove(salida)
+    return funcion(entrada, salida, 1, SIN_METRICAS, {})
+
+
+# ---------------- Medición ----------------
+
+def _silencioso(funcion, *args):
+    # Los códecs imprimen su progreso; en el benchmark solo molesta
+    with contextlib.redirect_stdout(io.StringIO()):
+        return funcion(*args)
+
+
+def medir(funcion, *args, repeticiones=3):
+    """-> (resultado, mejor tiempo en segundos, pico de memoria en bytes)."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = _silencioso(funcion, *args)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    tracemalloc.start()
+    try:
+        _silencioso(funcion, *args)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return resultado, mejor, pico
+
+
+def _operacion(tamano, segundos, pico):
+    return {"segundos": round(segundos, 6), "mb_s": round(tamano / segundos / 1e6, 3), "memoria_pico": pico}
+
+
+def correr(tamanos, codecs, repeticiones=3, mostrar=print):
+    """Corre los benchmarks y devuelve el diccionario de resultados."""
+    resultados = []
+    with tempfile.TemporaryDirectory() as carpeta:
+        for tamano in tamanos:
+            archivos = corpus.generar(os.path.join(carpeta, "corpus"), tamano)
+            for codec in codecs:
+                comprimir, descomprimir, iguales = CODECS[codec]
+                for nombre, ruta in archivos[codec]:
+                    trabajo = os.path.join(carpeta, f"{codec}_{nombre}_{tamano}")
+                    os.makedirs(trabajo, exist_ok=True)
+                    original = os.path.getsize(ruta)
+                    comprimido, t_comp, m_comp = medir(_operar, comprimir, ruta,
+                                                       os.path.join(trabajo, "comprimido" + EXTENSIONES[codec]),
+                                                       repeticiones=repeticiones)
+                    salida, t_desc, m_desc = medir(_operar, descomprimir, comprimido,
+                                                   os.path.join(trabajo, "resultado" + os.path.splitext(ruta)[1]),
+                                                   repeticiones=repeticiones)
+                    entrada = {
+                        "codec": codec,
+                        "corpus": nombre,
+                        "tamano": tamano,
+                        "bytes": original,
+                        "comprimido": os.path.getsize(comprimido),
+                        "ratio": round(proporcion(original, os.path.getsize(comprimido)), 5),
+                        "comprimir": _operacion(original, t_comp, m_comp),
+                        "descomprimir": _operacion(original, t_desc, m_desc),
+                        "correcto": iguales(ruta, salida),
+                    }
+                    resultados.append(entrada)
+                    mostrar(f"{codec:6s} {nombre:22s} {tamano:8s} ratio {entrada['ratio']:.3f}  "
+                            f"comp {entrada['comprimir']['mb_s']:8.2f} MB/s {m_comp / 2**20:7.1f} MiB  "
+                            f"desc {entrada['descomprimir']['mb_s']:8.2f} MB/s {m_desc / 2**20:7.1f} MiB"
+                            f"{'' if entrada['correcto'] else '  ¡SALIDA DISTINTA!'}")
+                    shutil.rmtree(trabajo, ignore_errors=True)
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "procesadores": os.cpu_count(),
+        "repeticiones": repeticiones,
+        "resultados": resultados,
+    }
+
+
+# ---------------- Línea de comandos ----------------
+
+def _lista(texto, validas):
+    elegidas = [x for x in texto.split(",") if x]
+    invalidas = [x for x in elegidas if x not in validas]
+    if invalidas:
+        raise argparse.ArgumentTypeError(f"desconocido: {', '.join(invalidas)} (use {', '.join(validas)})")
+    return elegidas
+
+
+def comando_correr(args):
+    resultados = correr(args.tamanos, args.codecs, args.repeticiones)
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {args.salida}")
+    return 0 if all(e["correcto"] for e in resultados["resultados"]) else 1
+
+
+def comando_comparar(args):
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.nuevo, encoding="utf-8") as f:
+        nuevo = json.load(f)
+    diferencias = comparar_resultados(base, nuevo, args.umbral)
+    regresiones = [d for d in diferencias if d.regresion]
+    for d in diferencias:
+        if d.regresion or args.todo:
+            marca = "REGRESIÓN" if d.regresion else ""
+            print(f"{d.clave:40s} {d.metrica:22s} {d.antes:>14.4g} -> {d.despues:<14.4g} {d.cambio:+8.1%}  {marca}")
+    print(f"{len(diferencias)} métricas comparadas, {len(regresiones)} regresiones (umbral {args.umbral:.0%})")
+    return 1 if regresiones else 0
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite", description=__doc__.splitlines()[0])
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    correr_ = comandos.add_parser("correr", help="corre los benchmarks y guarda los resultados en JSON")
+    correr_.add_argument("-t", "--tamanos", type=lambda t: _lista(t, list(corpus.TAMANOS)),
+                         default=["chico", "mediano"], help="chico, mediano y/o grande (por defecto chico,mediano)")
+    correr_.add_argument("-c", "--codecs", type=lambda t: _lista(t, list(CODECS)), default=list(CODECS),
+                         help="texto, imagen y/o audio (por defecto todos)")
+    correr_.add_argument("-r", "--repeticiones", type=int, default=3, help="se toma el mejor tiempo (por defecto 3)")
+    correr_.add_argument("-o", "--salida", default="resultados_benchmark.json")
+    correr_.set_defaults(funcion=comando_correr)
+
+    comparar = comandos.add_parser("comparar", help="compara dos archivos de resultados")
+    comparar.add_argument("base")
+    comparar.add_argument("nuevo")
+    comparar.add_argument("--umbral", type=float, default=0.10, help="empeoramiento relativo tolerado (0.10 = 10 %%)")
+    comparar.add_argument("--todo", action="store_true", help="muestra también las métricas sin regresión")
+    comparar.set_defaults(funcion=comando_comparar)
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    return args.funcion(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
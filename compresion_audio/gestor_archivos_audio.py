@@ -2,6 +2,10 @@
 import pickle, heapq, wave
 from collections import Counter
 
+from utils.huffman_canonico import (DecodificadorTabla, codigos_canonicos,
+                                    deserializar_longitudes, desempaquetar_bloque)
+from utils.contenedor import LectorContenedor, es_contenedor, CODEC_AUDIO_HUFFMAN
+
 
 
 def construir_arbol(freqs: Counter):
@@ -28,21 +32,33 @@ def construir_arbol(freqs: Counter):
 
     return heap[0][2]
 
+def tabla_desde_arbol(nodo, codigo: int = 0, longitud: int = 0, tabla=None) -> dict:
+    """{byte: (codigo, longitud)} a partir del árbol de diccionarios."""
+    if tabla is None:
+        tabla = {}
+    if nodo is None:
+        return tabla
+    if nodo["val"] is not None:
+        tabla[nodo["val"]] = (codigo, longitud)
+        return tabla
+    tabla_desde_arbol(nodo["left"], codigo << 1, longitud + 1, tabla)
+    tabla_desde_arbol(nodo["right"], (codigo << 1) | 1, longitud + 1, tabla)
+    return tabla
+
+
 def decodificar_bits(bits: str, raiz) -> bytes:
-    """Recorre el árbol por cada bit; emite byte al llegar a hoja."""
+    """Decodifica con tabla de búsqueda en vez de recorrer el árbol bit a bit."""
     
     if "_single" in raiz:
         byte_val, rep = raiz["_single"]
         return bytes([byte_val] * rep)
 
-    out = bytearray()
-    n = raiz
-    for b in bits:
-        n = n["left"] if b == "0" else n["right"]
-        if n["val"] is not None:
-            out.append(n["val"])
-            n = raiz
-    return bytes(out)
+    if not bits:
+        return b""
+    n_bits = len(bits)
+    # Se corre a la izquierda para que el relleno quede al final del último byte
+    datos = (int(bits, 2) << ((-n_bits) % 8)).to_bytes((n_bits + 7) // 8, "big")
+    return b"".join(DecodificadorTabla(tabla_desde_arbol(raiz), unir=bytes).decodificar(datos, n_bits))
 
 def escribir_wav(ruta_out: str, params: dict, pcm: bytes):
     """Escribe el WAV con los parámetros originales."""
@@ -52,6 +68,18 @@ def escribir_wav(ruta_out: str, params: dict, pcm: bytes):
         w.setframerate(params["framerate"])
         w.writeframes(pcm)
 
+def leer_contenedor(ruta: str):
+    """Contenedor de audio Huffman -> (parámetros WAV, PCM)."""
+    with LectorContenedor(ruta) as contenedor:
+        if contenedor.codec != CODEC_AUDIO_HUFFMAN:
+            raise ValueError("El archivo no es un audio comprimido con Huffman")
+        partes = []
+        for bloque in contenedor.iterar_bloques():
+            n_bits, cabecera, datos = desempaquetar_bloque(bloque)
+            tabla = codigos_canonicos(deserializar_longitudes(cabecera)[0])
+            partes.append(b"".join(DecodificadorTabla(tabla, unir=bytes).decodificar(datos, n_bits)))
+        return contenedor.meta["parametros_wav"], b"".join(partes)
+
 def extraer_huff(archivo_huff: str, archivo_salida: str | None = None) -> str:
     """.huff -> .wav: cargar -> árbol -> decodificar -> escribir."""
     if not archivo_huff.endswith(".huff"):
@@ -60,7 +88,10 @@ def extraer_huff(archivo_huff: str, archivo_salida: str | None = None) -> str:
     if archivo_salida is None:
         archivo_salida = archivo_huff.replace(".huff", "_descomprimido.wav")
 
-    
+    if es_contenedor(archivo_huff):
+        escribir_wav(archivo_salida, *leer_contenedor(archivo_huff))
+        return archivo_salida
+
     with open(archivo_huff, "rb") as f:
         pkg = pickle.load(f)
 
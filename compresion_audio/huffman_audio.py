@@ -5,8 +5,25 @@ import wave
 import heapq
 import pickle
 import shutil
-from collections import Counter
-from typing import Optional, Tuple, Dict, List
+from functools import partial
+from typing import Optional, Tuple, Dict, List, Iterable, Iterator
+
+from utils.bits import EscritorBits, iterar_bits
+from utils.huffman_bytes import frecuencias_bytes, tabla_bytes, codificar_bytes
+from utils.huffman_canonico import (codigos_canonicos, serializar_longitudes,
+                                    deserializar_longitudes, DecodificadorTabla,
+                                    limitar_longitudes, LONGITUD_MAXIMA,
+                                    empaquetar_bloque, desempaquetar_bloque)
+from utils.contenedor import (EscritorContenedor, LectorContenedor, es_contenedor, leer_cabecera,
+                              exigir_legado, CODEC_AUDIO_HUFFMAN, CODEC_AUDIO_PREDICTIVO)
+from utils.paralelo import mapear_en_orden, en_lotes
+from utils.metricas import SIN_METRICAS
+from utils.trabajos import sin_progreso, borrar_si_falla
+from compresion_audio import prediccion_audio
+
+# "prediccion": predictores y códigos de Rice sobre las muestras (necesita NumPy);
+# "huffman": Huffman sobre los bytes crudos del WAV (formato anterior)
+METODOS = ("prediccion", "huffman")
 
 
 class NodoHuffman:
@@ -21,28 +38,7 @@ class NodoHuffman:
         return self.freq < otro.freq
 
 
-# ===================== UTILIDADES DE BITS =====================
-def _pack_bits(bits_str: str) -> Tuple[bytes, int]:
-    """'0101...' -> (bytes, n_bits_validos)"""
-    n = len(bits_str)
-    if n == 0:
-        return b"", 0
-    pad = (-n) % 8
-    if pad:
-        bits_str += "0" * pad
-    out = bytearray()
-    for i in range(0, len(bits_str), 8):
-        out.append(int(bits_str[i:i + 8], 2))
-    return bytes(out), n
-
-
-def _unpack_bits(data: bytes, n_valid_bits: int) -> str:
-    if not data or n_valid_bits == 0:
-        return ""
-    bits = ''.join(f'{b:08b}' for b in data)
-    return bits[:n_valid_bits]
-
-
+# ===================== UTILIDADES DE RUTAS =====================
 def _unique_path(path: str) -> str:
     if not os.path.exists(path):
         return path
@@ -132,16 +128,48 @@ class CompresionAudio:
 
         return codigos
 
-    def codificar(self, muestras: List[int], codigos: Dict[int, str]) -> str:
-
-        return ''.join(codigos[m] for m in muestras) if muestras else ""
+    def longitudesCanonicas(self, freqs: Dict[int, int],
+                            max_code_len: Optional[int] = None) -> Tuple[Dict[int, int], float]:
+        """Longitud del código de cada valor -> (longitudes, pérdida por el límite).
 
-    def decodificar(self, bits: str, raiz: NodoHuffman) -> List[int]:
+        Con eso basta para el código canónico. Si se da `max_code_len`, los
+        códigos más largos se acortan con package-merge.
+        """
+        codigos = self.generarCodigos(self.construir_arbol(freqs))
+        longitudes = {v: len(c) for v, c in codigos.items()}
+        if max_code_len is None:
+            return longitudes, 0.0
+        return limitar_longitudes(freqs, longitudes, max_code_len)
+
+    def arbolDesdeCodigos(self, tabla: Dict[int, Tuple[int, int]]) -> NodoHuffman:
+        """Reconstruye el árbol a partir de {valor: (codigo, longitud)}."""
+        raiz = NodoHuffman()
+        for valor, (codigo, longitud) in tabla.items():
+            nodo = raiz
+            for d in range(longitud - 1, -1, -1):
+                if (codigo >> d) & 1:
+                    nodo.der = nodo.der or NodoHuffman()
+                    nodo = nodo.der
+                else:
+                    nodo.izq = nodo.izq or NodoHuffman()
+                    nodo = nodo.izq
+            nodo.valor = valor
+        return raiz
+
+    def codificar(self, muestras: List[int], tabla: Dict[int, Tuple[int, int]]) -> Tuple[bytes, int]:
+        """Empaqueta con tabla[valor] = (codigo, longitud) -> (bytes, n_bits_validos)."""
+        if not muestras:
+            return b"", 0
+        escritor = EscritorBits()
+        escritor.escribir_simbolos(muestras, tabla)
+        return bytes(escritor.cerrar()), escritor.total_bits
+
+    def decodificar(self, datos: bytes, n_bits: int, raiz: NodoHuffman) -> List[int]:
         nodo = raiz
         out: List[int] = []
-        for b in bits:
+        for b in iterar_bits(datos, n_bits):
 
-            nodo = nodo.izq if b == "0" else nodo.der
+            nodo = nodo.der if b else nodo.izq
             if nodo.valor is not None:
                 
                 out.append(nodo.valor)
@@ -151,23 +179,38 @@ class CompresionAudio:
     # ==compresion aiduo
     def comprimir(self, archivo_salida_flac: Optional[str] = None,
                   crear_copia_wav: bool = True,
-                  sufijo_copia: str = " (copia)") -> Dict[str, str]:
+                  sufijo_copia: str = " (copia)",
+                  max_code_len: Optional[int] = LONGITUD_MAXIMA,
+                  metodo: Optional[str] = None,
+                  orden_lpc: int = prediccion_audio.ORDEN_LPC,
+                  n_procesos: Optional[int] = 1,
+                  metricas=SIN_METRICAS,
+                  progreso=sin_progreso) -> Dict[str, object]:
         
-        ##Devuelve: {"wav_copia"  "flac": <ruta_flac>}
+        ##Devuelve: {"wav_copia"  "flac": <ruta_flac>, "perdida_limite": fracción de bits de más}
+        ## metodo: uno de METODOS; por defecto "prediccion" si NumPy está instalado
+        ## n_procesos > 1 (None = todos los núcleos): las tramas se comprimen en paralelo
+        ## metricas: utils.metricas.Metricas para registrar etapas, bytes y muestras
+        ## progreso(bytes de audio hechos, total): se llama después de cada trama
         
         if not self.ruta.lower().endswith(".wav"):
             raise ValueError("Inicializa con un archivo .wav para comprimir.")
-
-        if self.muestras is None:
-            self.leerMuestras()
+        if metodo is None:
+            metodo = "prediccion" if prediccion_audio.disponible() else "huffman"
+        if metodo not in METODOS:
+            raise ValueError(f"Método desconocido: {metodo!r} (use {', '.join(METODOS)})")
+        if metodo == "prediccion" and not prediccion_audio.disponible():
+            raise ImportError("El método 'prediccion' necesita numpy instalado")
 
         base, _ = os.path.splitext(self.ruta)
+        metricas.comenzar("comprimir", f"audio/{metodo}", archivo=self.ruta)
 
         #  Copia del WAV
         ruta_wav_copia = None
         if crear_copia_wav:
             ruta_wav_copia = _with_suffix(base, sufijo_copia, ".wav")
-            shutil.copyfile(self.ruta, ruta_wav_copia)
+            with metricas.etapa("copia"):
+                shutil.copyfile(self.ruta, ruta_wav_copia)
 
         # 2) Archivo .flac 
         if not archivo_salida_flac:
@@ -178,35 +221,97 @@ class CompresionAudio:
             archivo_salida_flac += ".flac"
         archivo_salida_flac = _unique_path(archivo_salida_flac)
 
-        freqs = Counter(self.muestras)
-        raiz = self.construir_arbol(freqs)
-        codigos = self.generarCodigos(raiz)
+        if metodo == "prediccion":
+            self._comprimir_prediccion(archivo_salida_flac, orden_lpc, n_procesos, metricas, progreso)
+            perdida = 0.0
+        else:
+            perdida = self._comprimir_huffman(archivo_salida_flac, max_code_len, metricas, progreso)
+        metricas.terminar()
+        metricas.contar("bytes_entrada", os.path.getsize(self.ruta))
+        metricas.contar("bytes_salida", os.path.getsize(archivo_salida_flac))
 
-        bits = self.codificar(self.muestras, codigos)
-        packed, n_valid = _pack_bits(bits)
+        return {"wav_copia": ruta_wav_copia, "flac": archivo_salida_flac, "perdida_limite": perdida}
 
+    def _comprimir_prediccion(self, archivo_salida_flac: str, orden_lpc: int, n_procesos: Optional[int],
+                              metricas=SIN_METRICAS, progreso=sin_progreso):
+        # Se lee, comprime y escribe de a una trama (o de a lotes de tramas
+        # repartidos entre procesos), así la memoria no depende de la duración
         params = self.obtener_parametros_wav()
-        payload = {
-            "packed": packed,
-            "n_valid_bits": n_valid,
-
-            "frecuencias": dict(freqs),
+        meta = {
             "parametros_wav": params,
-
-            "n_muestras": len(self.muestras),
+            "tam_trama": prediccion_audio.TAM_TRAMA,
+            "estereo": True,
             "formato_original": "WAV",
         }
-        with open(archivo_salida_flac, "wb") as f:
-            pickle.dump(payload, f)
+        bytes_por_muestra = params["sampwidth"] * params["nchannels"]
+        total = params["nframes"] * bytes_por_muestra
+        hechos = 0
+        progreso(hechos, total)
+        with wave.open(self.ruta, "rb") as wav, borrar_si_falla(archivo_salida_flac), \
+                open(archivo_salida_flac, "wb") as f, \
+                EscritorContenedor(f, CODEC_AUDIO_PREDICTIVO, meta) as contenedor:
+            tramas = (muestras for _, muestras in prediccion_audio.tramas_de_wav(wav))
+            codificar = partial(prediccion_audio.codificar_lote, orden_lpc=orden_lpc)
+            lotes = metricas.iterar("lectura", en_lotes(tramas, prediccion_audio.TAM_LOTE))
+            # Con varios procesos, "codificacion" es lo que se esperó a los procesos
+            for codificados in metricas.iterar("codificacion", mapear_en_orden(codificar, lotes, n_procesos)):
+                for bloque, n_muestras in codificados:
+                    with metricas.etapa("escritura"):
+                        contenedor.agregar_bloque(bloque, n_muestras * bytes_por_muestra)
+                    metricas.contar("muestras", n_muestras)
+                    metricas.contar("tramas")
+                    hechos += n_muestras * bytes_por_muestra
+                progreso(hechos, total)
+
+    def _comprimir_huffman(self, archivo_salida_flac: str, max_code_len: Optional[int],
+                           metricas=SIN_METRICAS, progreso=sin_progreso) -> float:
+        # Las muestras son los bytes crudos del WAV: histograma y empaquetado con
+        # tablas de 256 entradas (con NumPy si está instalado). Si no se leyeron
+        # antes, se toman como bytes sin pasar por una lista de enteros
+        progreso(0, 1)
+        with metricas.etapa("lectura"):
+            if self.muestras is None:
+                with wave.open(self.ruta, "rb") as wav:
+                    datos = wav.readframes(wav.getnframes())
+            else:
+                datos = bytes(self.muestras)
+        with metricas.etapa("frecuencias"):
+            freqs = {v: f for v, f in enumerate(frecuencias_bytes(datos)) if f}
+        with metricas.etapa("arbol"):
+            longitudes, perdida = self.longitudesCanonicas(freqs, max_code_len) if freqs else ({}, 0.0)
+        with metricas.etapa("codificacion"):
+            packed, n_valid = codificar_bytes(datos, tabla_bytes(codigos_canonicos(longitudes)))
+        metricas.contar("simbolos", len(datos))
+        metricas.contar("simbolos_distintos", len(freqs))
 
-        return {"wav_copia": ruta_wav_copia, "flac": archivo_salida_flac}
+        params = self.obtener_parametros_wav()
+        meta = {
+            "parametros_wav": params,
+            "n_muestras": len(datos),
+            "formato_original": "WAV",
+        }
+        with borrar_si_falla(archivo_salida_flac), open(archivo_salida_flac, "wb") as f, \
+                metricas.etapa("escritura"), EscritorContenedor(f, CODEC_AUDIO_HUFFMAN, meta) as contenedor:
+            contenedor.agregar_bloque(empaquetar_bloque(n_valid, serializar_longitudes(longitudes), packed),
+                                      len(datos))
+            # Antes de cerrar el contenedor: si se cancela acá no queda el archivo
+            progreso(1, 1)
+        return perdida
 
     # descompresioin 
     def extraerArchivo(self, archivo_comprimido: Optional[str] = None,
                        archivo_salida: Optional[str] = None,
-                       sufijo_descomp: str = " (descomprimido)") -> str:
+                       sufijo_descomp: str = " (descomprimido)",
+                       n_procesos: Optional[int] = 1,
+                       metricas=SIN_METRICAS,
+                       progreso=sin_progreso,
+                       legado: bool = True) -> str:
         """
-        Devuelve la ruta del WAV generado.
+        Devuelve la ruta del WAV generado. Con n_procesos > 1 (None = todos
+        los núcleos) las tramas se decodifican en paralelo. Con `metricas` se
+        registra el tiempo de decodificación y de escritura y los bytes.
+        `progreso(bytes escritos, total)` se llama después de cada trama.
+        Con legado=False se rechazan los .flac anteriores guardados con pickle.
         """
         if archivo_comprimido is None:
             if not self.ruta or not self.ruta.lower().endswith(".wav"):
@@ -218,46 +323,178 @@ class CompresionAudio:
         if not os.path.exists(archivo_comprimido):
             raise FileNotFoundError(f"No se encontró el archivo: {archivo_comprimido}")
 
-        with open(archivo_comprimido, "rb") as f:
-            datos = pickle.load(f)
+        if archivo_salida is None:
+            base = os.path.splitext(archivo_comprimido)[0]
+            archivo_salida = _with_suffix(base, sufijo_descomp, ".wav")
 
-        packed: bytes = datos.get("packed", b"")
-        n_valid: int = datos.get("n_valid_bits", 0)
+        metricas.comenzar("descomprimir", "audio", archivo=archivo_comprimido)
+        if es_contenedor(archivo_comprimido):
+            # Trama por trama: se decodifica y se escribe sin juntar todo el audio
+            with LectorContenedor(archivo_comprimido) as contenedor:
+                partes, params = self._leer_contenedor(contenedor, n_procesos)
+                partes = metricas.iterar("decodificacion", partes)
+                archivo_salida = self._escribir_wav(partes, params, archivo_salida, metricas, progreso)
+        else:
+            exigir_legado(archivo_comprimido, legado)
+            progreso(0, 1)
+            with metricas.etapa("decodificacion"):
+                raw, params = self._leer_pickle(archivo_comprimido)
+            archivo_salida = self._escribir_wav([raw], params, archivo_salida, metricas, progreso)
+        metricas.terminar()
+        metricas.contar("bytes_entrada", os.path.getsize(archivo_comprimido))
+        metricas.contar("bytes_salida", os.path.getsize(archivo_salida))
+        metricas.contar("muestras", params["nframes"])
 
-        freqs: Dict[int, int] = datos.get("frecuencias", {})
+        return archivo_salida
 
-        params: Dict[str, int] = datos.get("parametros_wav", {})
-        n_muestras: int = datos.get("n_muestras", 0)
+    def extraer_rango(self, inicio_s: float, fin_s: Optional[float] = None,
+                      archivo_comprimido: Optional[str] = None,
+                      archivo_salida: Optional[str] = None, legado: bool = True) -> str:
+        """Escribe un WAV con el audio entre los segundos inicio_s y fin_s (None = hasta el final).
 
-        dec = self._decodificar_desde_paquete(packed, n_valid, freqs, n_muestras)
-        raw = bytes(dec)
+        En archivos del método "prediccion" solo se decodifican las tramas que
+        tocan el rango, ubicadas con el índice de bloques del contenedor; en
+        los formatos anteriores se decodifica todo y se recorta (con
+        legado=False se rechazan, porque se leen con pickle).
+        """
+        if archivo_comprimido is None:
+            archivo_comprimido = os.path.splitext(self.ruta)[0] + ".flac"
+        if not os.path.exists(archivo_comprimido):
+            raise FileNotFoundError(f"No se encontró el archivo: {archivo_comprimido}")
+        if inicio_s < 0 or (fin_s is not None and fin_s < inicio_s):
+            raise ValueError("Rango de tiempo inválido")
 
         if archivo_salida is None:
             base = os.path.splitext(archivo_comprimido)[0]
-            archivo_salida = _with_suffix(base, sufijo_descomp, ".wav")
+            archivo_salida = _with_suffix(base, f" ({inicio_s:g}-{'fin' if fin_s is None else f'{fin_s:g}'} s)", ".wav")
+
+        if es_contenedor(archivo_comprimido):
+            with LectorContenedor(archivo_comprimido) as contenedor:
+                params = dict(contenedor.meta["parametros_wav"])
+                inicio, fin = self._muestras_del_rango(params, inicio_s, fin_s)
+                params["nframes"] = fin - inicio
+                if contenedor.codec == CODEC_AUDIO_PREDICTIVO:
+                    partes = prediccion_audio.pcm_de_contenedor(contenedor, inicio, fin)
+                else:
+                    partes, _ = self._leer_contenedor(contenedor)
+                    partes = [self._recortar_pcm(b"".join(partes), params, inicio, fin)]
+                return self._escribir_wav(partes, params, archivo_salida)
+
+        exigir_legado(archivo_comprimido, legado)
+        raw, params = self._leer_pickle(archivo_comprimido)
+        params = dict(params)
+        inicio, fin = self._muestras_del_rango(params, inicio_s, fin_s)
+        params["nframes"] = fin - inicio
+        return self._escribir_wav([self._recortar_pcm(raw, params, inicio, fin)], params, archivo_salida)
+
+    def parametros_comprimido(self, archivo_comprimido: str) -> Dict[str, int]:
+        """Parámetros WAV de un audio comprimido, leyendo solo la cabecera."""
+        if es_contenedor(archivo_comprimido):
+            return leer_cabecera(archivo_comprimido).meta["parametros_wav"]
+        return self._leer_pickle(archivo_comprimido)[1]
+
+    def iterar_pcm(self, archivo_comprimido: str, inicio: int = 0) -> Iterator[bytes]:
+        """PCM desde la muestra `inicio` hasta el final, de a una trama (para reproducir).
+
+        Solo el método "prediccion" se decodifica de a poco; los formatos
+        anteriores se decodifican enteros y se entregan de una vez.
+        """
+        if not es_contenedor(archivo_comprimido):
+            raw, params = self._leer_pickle(archivo_comprimido)
+            yield self._recortar_pcm(raw, params, inicio, params["nframes"])
+            return
+        with LectorContenedor(archivo_comprimido) as contenedor:
+            if contenedor.codec == CODEC_AUDIO_PREDICTIVO:
+                yield from prediccion_audio.pcm_de_contenedor(contenedor, inicio)
+            else:
+                partes, params = self._leer_contenedor(contenedor)
+                yield self._recortar_pcm(b"".join(partes), params, inicio, params["nframes"])
+
+    @staticmethod
+    def _muestras_del_rango(params: Dict[str, int], inicio_s: float, fin_s: Optional[float]) -> Tuple[int, int]:
+        # Segundos -> muestras por canal, acotadas a la duración del audio
+        total = params["nframes"]
+        inicio = min(round(inicio_s * params["framerate"]), total)
+        fin = total if fin_s is None else min(round(fin_s * params["framerate"]), total)
+        return inicio, max(fin, inicio)
+
+    @staticmethod
+    def _recortar_pcm(pcm: bytes, params: Dict[str, int], inicio: int, fin: int) -> bytes:
+        bytes_por_muestra = params["sampwidth"] * params["nchannels"]
+        return pcm[inicio * bytes_por_muestra:fin * bytes_por_muestra]
+
+    def _leer_contenedor(self, contenedor: LectorContenedor,
+                         n_procesos: Optional[int] = 1) -> Tuple[Iterator[bytes], Dict[str, int]]:
+        """-> (PCM de cada bloque, a medida que se decodifica; parámetros WAV)."""
+        params = contenedor.meta["parametros_wav"]
+        if contenedor.codec == CODEC_AUDIO_PREDICTIVO:
+            if not prediccion_audio.disponible():
+                raise ImportError("Para descomprimir este audio hace falta numpy instalado")
+            return prediccion_audio.pcm_de_contenedor(contenedor, n_procesos=n_procesos), params
+        if contenedor.codec != CODEC_AUDIO_HUFFMAN:
+            raise ValueError("El archivo no es un audio comprimido con Huffman")
+        return (self._decodificar_bloque_huffman(bloque) for bloque in contenedor.iterar_bloques()), params
+
+    def _decodificar_bloque_huffman(self, bloque) -> bytes:
+        n_valid, cabecera, packed = desempaquetar_bloque(bloque)
+        longitudes, _ = deserializar_longitudes(cabecera)
+        return self._decodificar_desde_paquete(packed, n_valid, longitudes, 0)
+
+    def _leer_pickle(self, archivo_comprimido: str) -> Tuple[bytes, Dict[str, int]]:
+        # Archivos .flac de versiones anteriores: un dict guardado con pickle
+        with open(archivo_comprimido, "rb") as f:
+            datos = pickle.load(f)
 
-        self._escribir_wav(raw, params, archivo_salida)
+        packed: bytes = datos.get("packed", b"")
+        n_valid: int = datos.get("n_valid_bits", 0)
 
-        return archivo_salida
+        params: Dict[str, int] = datos.get("parametros_wav", {})
+        n_muestras: int = datos.get("n_muestras", 0)
+
+        if "longitudes" in datos:
+            longitudes, _ = deserializar_longitudes(datos["longitudes"])
+            dec = self._decodificar_desde_paquete(packed, n_valid, longitudes, n_muestras)
+        else:
+            # Formato anterior: frecuencias completas para reconstruir el árbol
+            freqs: Dict[int, int] = datos.get("frecuencias", {})
+            dec = self._decodificar_legado(packed, n_valid, freqs, n_muestras) if freqs else b""
+        return bytes(dec), params
 
     def _decodificar_desde_paquete(self, data_packed: bytes, n_valid_bits: int,
-                                   freqs: Dict[int, int], n_muestras: int) -> List[int]:
+                                   longitudes: Dict[int, int], n_muestras: int) -> bytes:
+        decodificador = DecodificadorTabla(codigos_canonicos(longitudes), unir=bytes)
+        return b"".join(decodificador.decodificar(data_packed, n_valid_bits))
+
+    def _decodificar_legado(self, data_packed: bytes, n_valid_bits: int,
+                            freqs: Dict[int, int], n_muestras: int) -> bytes:
         raiz = self.construir_arbol(freqs)
         if raiz and raiz.valor is not None:
 
             total = int(n_muestras or sum(freqs.values()))
-            return [raiz.valor] * total
-        
-        bits = _unpack_bits(data_packed, n_valid_bits)
-        return self.decodificar(bits, raiz)
+            return bytes([raiz.valor]) * total
+
+        tabla = {v: (int(c, 2), len(c)) for v, c in self.generarCodigos(raiz).items()}
+        return b"".join(DecodificadorTabla(tabla, unir=bytes).decodificar(data_packed, n_valid_bits))
 
-    def _escribir_wav(self, data_bytes: bytes, params: Dict[str, int], destino: str):
+    def _escribir_wav(self, partes: Iterable[bytes], params: Dict[str, int], destino: str,
+                      metricas=SIN_METRICAS, progreso=sin_progreso) -> str:
+        """Escribe el PCM de `partes` de a una; devuelve la ruta usada.
+
+        Si algo falla a mitad de camino (o se cancela) no queda un WAV incompleto.
+        """
         destino = _unique_path(destino)
-        with wave.open(destino, "wb") as w:
+        total = params["nframes"] * params["sampwidth"] * params["nchannels"]
+        hechos = 0
+        with borrar_si_falla(destino), wave.open(destino, "wb") as w:
             w.setnchannels(params["nchannels"])
 
             w.setsampwidth(params["sampwidth"])
             w.setframerate(params["framerate"])
 
             w.setnframes(params["nframes"])
-            w.writeframes(data_bytes)
+            for parte in partes:
+                with metricas.etapa("escritura"):
+                    w.writeframes(parte)
+                hechos += len(parte)
+                progreso(hechos, total)
+        return destino
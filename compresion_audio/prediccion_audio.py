@@ -0,0 +1,387 @@
+"""Códec de audio sin pérdida en el dominio de las muestras (necesita NumPy).
+
+Las muestras del WAV se interpretan según `sampwidth` y `nchannels` y se
+comprimen en tramas de TAM_TRAMA muestras por canal, cada una en un bloque
+del contenedor. Cada canal de la trama es una subtrama que se predice con
+el mejor de:
+
+    CONSTANTE  todas las muestras iguales
+    FIJO       polinomio de orden 0 a 4 (diferencias sucesivas, como FLAC)
+    LPC        predictor lineal de hasta orden_lpc coeficientes cuantizados
+
+y el residuo se guarda con códigos de Rice adaptativos (utils/rice.py). En
+estéreo, antes de predecir se elige por trama si guardar los canales
+izquierdo y derecho tal cual o reemplazar uno por la diferencia (lado) o
+ambos por promedio y diferencia (medio/lado), lo que salga más barato.
+
+    Trama
+        n            varint  muestras por canal
+        modo         B       solo en estéreo: INDEPENDIENTE, IZQUIERDO_LADO,
+                             LADO_DERECHO o MEDIO_LADO
+        subtramas    una por canal
+    Subtrama
+        tipo         B       CONSTANTE, FIJO o LPC
+        orden        B
+        CONSTANTE:   valor (zigzag varint)
+        FIJO:        orden muestras iniciales (zigzag varint), residuos
+        LPC:         corrimiento B, orden coeficientes y orden muestras
+                     iniciales (zigzag varint), residuos
+
+Los predictores fijos se deshacen con sumas acumuladas de NumPy. El LPC es
+recursivo al decodificar (cada muestra depende de las anteriores ya
+reconstruidas), así que es opcional (orden_lpc > 0) y solo se usa en las
+subtramas donde ahorra al menos MEJORA_MINIMA_LPC de los bits.
+"""
+from bisect import bisect_left, bisect_right
+from functools import partial
+
+from utils.bits import escribir_varint, leer_varint
+from utils.paralelo import mapear_en_orden, cantidad_procesos, en_lotes
+from utils.rice import zigzag, deshacer_zigzag, codificar_rice, decodificar_rice, parametros_rice
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TAM_TRAMA = 4096
+# Tramas por tarea al repartir entre procesos
+TAM_LOTE = 16
+# Por defecto solo predictores fijos; con orden_lpc=ORDEN_LPC_MAXIMO se gana
+# un 3-5 % más, pero la decodificación de esas tramas es varias veces más lenta
+ORDEN_LPC = 0
+# El decodificador LPC tiene los 8 coeficientes desenrollados
+ORDEN_LPC_MAXIMO = 8
+MEJORA_MINIMA_LPC = 0.02
+# Bits de los coeficientes LPC cuantizados
+PRECISION_LPC = 14
+
+CONSTANTE, FIJO, LPC = range(3)
+
+# Cómo se guarda un par estéreo: canales (izquierdo, derecho), (izquierdo, lado),
+# (lado, derecho) o (medio, lado), con medio = (I + D) >> 1 y lado = I - D
+INDEPENDIENTE, IZQUIERDO_LADO, LADO_DERECHO, MEDIO_LADO = range(4)
+
+
+def disponible() -> bool:
+    return np is not None
+
+
+# ---------------- PCM <-> muestras ----------------
+
+def pcm_a_muestras(datos, sampwidth: int, nchannels: int):
+    """Bytes PCM del WAV -> arreglo int64 de (n, nchannels)."""
+    if sampwidth == 1:
+        # Los WAV de 8 bits no tienen signo
+        muestras = np.frombuffer(datos, dtype=np.uint8).astype(np.int64) - 128
+    elif sampwidth == 2:
+        muestras = np.frombuffer(datos, dtype="<i2").astype(np.int64)
+    elif sampwidth == 3:
+        trios = np.frombuffer(datos, dtype=np.uint8).reshape(-1, 3).astype(np.int64)
+        muestras = trios[:, 0] | (trios[:, 1] << 8) | (trios[:, 2] << 16)
+        muestras = (muestras ^ 0x800000) - 0x800000
+    elif sampwidth == 4:
+        muestras = np.frombuffer(datos, dtype="<i4").astype(np.int64)
+    else:
+        raise ValueError(f"Ancho de muestra no soportado: {sampwidth} bytes")
+    return muestras.reshape(-1, nchannels)
+
+
+def muestras_a_pcm(muestras, sampwidth: int) -> bytes:
+    """Inverso de pcm_a_muestras."""
+    muestras = muestras.reshape(-1)
+    if sampwidth == 1:
+        return (muestras + 128).astype(np.uint8).tobytes()
+    if sampwidth == 2:
+        return muestras.astype("<i2").tobytes()
+    if sampwidth == 3:
+        trios = (muestras[:, None] >> np.array([0, 8, 16])) & 0xFF
+        return trios.astype(np.uint8).tobytes()
+    if sampwidth == 4:
+        return muestras.astype("<i4").tobytes()
+    raise ValueError(f"Ancho de muestra no soportado: {sampwidth} bytes")
+
+
+def tramas_de_wav(wav, tam_trama: int = TAM_TRAMA):
+    """Recorre un WAV abierto (wave.open) de a `tam_trama` muestras por canal -> (pcm, muestras)."""
+    sampwidth, nchannels = wav.getsampwidth(), wav.getnchannels()
+    while True:
+        pcm = wav.readframes(tam_trama)
+        if not pcm:
+            return
+        yield pcm, pcm_a_muestras(pcm, sampwidth, nchannels)
+
+
+def tabla_de_busqueda(contenedor) -> list:
+    """Muestra (por canal) donde empieza cada trama, más el total al final.
+
+    Sale del índice de bloques del contenedor (largo original de cada trama),
+    así que no hace falta leer ninguna trama para ubicar una posición.
+    """
+    params = contenedor.meta["parametros_wav"]
+    bytes_por_muestra = params["sampwidth"] * params["nchannels"]
+    tabla = [0]
+    for entrada in contenedor.bloques:
+        tabla.append(tabla[-1] + entrada.largo_original // bytes_por_muestra)
+    return tabla
+
+
+def pcm_de_contenedor(contenedor, inicio: int = 0, fin: int = None, n_procesos=1):
+    """PCM de las muestras [inicio, fin) de un contenedor de audio ya abierto.
+
+    Se decodifican solo las tramas que tocan el rango, en orden y de a una;
+    con n_procesos > 1 (None = todos los núcleos) se reparten por lotes entre
+    procesos y el resultado sale igual, en el mismo orden.
+    """
+    params = contenedor.meta["parametros_wav"]
+    bytes_por_muestra = params["sampwidth"] * params["nchannels"]
+    tabla = tabla_de_busqueda(contenedor)
+    fin = tabla[-1] if fin is None else min(fin, tabla[-1])
+    indices = range(max(bisect_right(tabla, inicio) - 1, 0), bisect_left(tabla, fin))
+    bloques = (contenedor.bloque(i) for i in indices)
+    if cantidad_procesos(n_procesos) > 1:
+        # las memoryview del mmap no viajan entre procesos
+        bloques = map(bytes, bloques)
+    decodificar = partial(decodificar_lote, n_canales=params["nchannels"], sampwidth=params["sampwidth"],
+                          estereo=contenedor.meta.get("estereo", False))
+    lotes = mapear_en_orden(decodificar, en_lotes(bloques, TAM_LOTE), n_procesos)
+    for i, pcm in zip(indices, (pcm for lote in lotes for pcm in lote)):
+        if tabla[i] < inicio or tabla[i + 1] > fin:
+            pcm = pcm[max(inicio - tabla[i], 0) * bytes_por_muestra:(fin - tabla[i]) * bytes_por_muestra]
+        yield pcm
+
+
+def codificar_lote(lote, orden_lpc=ORDEN_LPC) -> list:
+    """codificar_trama para varias tramas seguidas (una tarea del pool) -> [(bloque, muestras por canal)]."""
+    return [(codificar_trama(muestras, orden_lpc), len(muestras)) for muestras in lote]
+
+
+def decodificar_lote(bloques, n_canales: int, sampwidth: int, estereo: bool = True) -> list:
+    """Bloques de tramas -> PCM de cada una (una tarea del pool)."""
+    return [muestras_a_pcm(decodificar_trama(bloque, n_canales, estereo), sampwidth) for bloque in bloques]
+
+
+# ---------------- Predictores ----------------
+
+def _escribir_enteros(salida, valores):
+    for valor in valores:
+        escribir_varint(salida, (-valor << 1) - 1 if valor < 0 else valor << 1)
+
+
+def _leer_enteros(datos, pos, cantidad):
+    valores = []
+    for _ in range(cantidad):
+        u, pos = leer_varint(datos, pos)
+        valores.append((u >> 1) ^ -(u & 1))
+    return valores, pos
+
+
+def _residuo_fijo(x, orden):
+    return np.diff(x, orden)
+
+
+def _deshacer_fijo(residuo, calentamiento):
+    # Cada nivel de diferencias se recupera con una suma acumulada que arranca
+    # en el primer valor de ese nivel, calculado a partir de las muestras iniciales
+    calentamiento = np.array(calentamiento, dtype=np.int64)
+    nivel = residuo
+    for j in range(len(calentamiento) - 1, -1, -1):
+        inicial = np.diff(calentamiento, j)[0]
+        nivel = np.concatenate(([inicial], inicial + np.cumsum(nivel)))
+    return nivel
+
+
+def _coeficientes_lpc(x, orden_maximo):
+    # Autocorrelación con ventana de Welch y Levinson-Durbin -> coeficientes por orden
+    n = len(x)
+    ventana = 1 - ((np.arange(n) - (n - 1) / 2) / ((n + 1) / 2)) ** 2
+    xv = x * ventana
+    r = np.array([np.dot(xv[:n - i], xv[i:]) for i in range(orden_maximo + 1)])
+    if r[0] <= 0:
+        return []
+    a = np.zeros(0)
+    error = r[0]
+    resultado = []
+    for m in range(orden_maximo):
+        reflexion = (r[m + 1] - np.dot(a, r[m:0:-1])) / error
+        a = np.concatenate((a - reflexion * a[::-1], [reflexion]))
+        error *= 1 - reflexion * reflexion
+        resultado.append((a.copy(), error))
+        if error <= 0:
+            break
+    return resultado
+
+
+def _cuantizar(coeficientes):
+    mayor = np.abs(coeficientes).max()
+    corrimiento = PRECISION_LPC - 1 - max(int(np.floor(np.log2(mayor))) + 1, 0) if mayor > 0 else 0
+    corrimiento = min(max(corrimiento, 0), 15)
+    return np.round(coeficientes * (1 << corrimiento)).astype(np.int64), corrimiento
+
+
+def _residuo_lpc(x, coeficientes, corrimiento):
+    orden = len(coeficientes)
+    prediccion = np.zeros(len(x) - orden, dtype=np.int64)
+    for i, c in enumerate(coeficientes.tolist(), 1):
+        prediccion += c * x[orden - i:len(x) - i]
+    return x[orden:] - (prediccion >> corrimiento)
+
+
+def _deshacer_lpc(residuo, calentamiento, coeficientes, corrimiento):
+    # Recursivo: cada muestra se predice con las ya reconstruidas. Con el orden
+    # completado a ORDEN_LPC_MAXIMO y las muestras anteriores en variables
+    # locales el bucle corre al doble de velocidad que con sum(map(...))
+    orden = len(coeficientes)
+    c1, c2, c3, c4, c5, c6, c7, c8 = list(coeficientes) + [0] * (ORDEN_LPC_MAXIMO - orden)
+    x1, x2, x3, x4, x5, x6, x7, x8 = (list(calentamiento[::-1]) + [0] * ORDEN_LPC_MAXIMO)[:ORDEN_LPC_MAXIMO]
+    salida = list(calentamiento)
+    agregar = salida.append
+    for e in residuo.tolist():
+        v = e + ((c1 * x1 + c2 * x2 + c3 * x3 + c4 * x4 + c5 * x5 + c6 * x6 + c7 * x7 + c8 * x8) >> corrimiento)
+        x8, x7, x6, x5, x4, x3, x2, x1 = x7, x6, x5, x4, x3, x2, x1, v
+        agregar(v)
+    return np.array(salida, dtype=np.int64)
+
+
+def _orden_fijo(x):
+    # Predictor fijo con menos suma de |residuo| -> (orden, suma)
+    mejor = None
+    diferencias = x
+    for orden in range(min(4, len(x) - 1) + 1):
+        if orden:
+            diferencias = np.diff(diferencias)
+        suma = int(np.abs(diferencias).sum())
+        if mejor is None or suma < mejor[1]:
+            mejor = (orden, suma)
+    return mejor
+
+
+def _codificar_subtrama(x, orden_lpc):
+    n = len(x)
+    if (x == x[0]).all():
+        salida = bytearray((CONSTANTE, 0))
+        _escribir_enteros(salida, [int(x[0])])
+        return salida
+
+    orden, _ = _orden_fijo(x)
+    salida = bytearray((FIJO, orden))
+    _escribir_enteros(salida, x[:orden].tolist())
+    residuo = zigzag(_residuo_fijo(x, orden))
+    parametros = parametros_rice(residuo)
+
+    orden_lpc = min(orden_lpc, ORDEN_LPC_MAXIMO, n - 1)
+    candidatos = _coeficientes_lpc(x.astype(np.float64), orden_lpc) if orden_lpc > 0 else []
+    if candidatos:
+        # Orden estimado por el error de predicción más el costo de los coeficientes
+        m = min(range(len(candidatos)),
+                key=lambda i: 0.5 * n * np.log2(max(candidatos[i][1], 1e-9) / n) + (i + 1) * PRECISION_LPC)
+        coeficientes, corrimiento = _cuantizar(candidatos[m][0])
+        if coeficientes.any():
+            alternativa = bytearray((LPC, len(coeficientes), corrimiento))
+            _escribir_enteros(alternativa, coeficientes.tolist())
+            _escribir_enteros(alternativa, x[:len(coeficientes)].tolist())
+            residuo_lpc = zigzag(_residuo_lpc(x, coeficientes, corrimiento))
+            parametros_lpc = parametros_rice(residuo_lpc)
+            if (8 * len(alternativa) + parametros_lpc[0]
+                    < (8 * len(salida) + parametros[0]) * (1 - MEJORA_MINIMA_LPC)):
+                salida, residuo, parametros = alternativa, residuo_lpc, parametros_lpc
+    codificar_rice(salida, residuo, parametros)
+    return salida
+
+
+def _decodificar_subtrama(datos, pos, n):
+    tipo, orden = datos[pos], datos[pos + 1]
+    pos += 2
+    if tipo == CONSTANTE:
+        (valor,), pos = _leer_enteros(datos, pos, 1)
+        return np.full(n, valor, dtype=np.int64), pos
+    if tipo == FIJO:
+        calentamiento, pos = _leer_enteros(datos, pos, orden)
+        u, pos = decodificar_rice(datos, pos, n - orden)
+        return _deshacer_fijo(deshacer_zigzag(u), calentamiento), pos
+    if tipo == LPC:
+        corrimiento = datos[pos]
+        coeficientes, pos = _leer_enteros(datos, pos + 1, orden)
+        calentamiento, pos = _leer_enteros(datos, pos, orden)
+        u, pos = decodificar_rice(datos, pos, n - orden)
+        return _deshacer_lpc(deshacer_zigzag(u), calentamiento, coeficientes, corrimiento), pos
+    raise ValueError(f"Tipo de subtrama desconocido: {tipo}")
+
+
+# ---------------- Estéreo ----------------
+
+def _bits_estimados(x):
+    # Bits aproximados del residuo fijo: log2 del |residuo| medio por muestra
+    _, suma = _orden_fijo(x)
+    return len(x) * np.log2(1 + suma / len(x))
+
+
+def decorrelar(izquierdo, derecho):
+    """Elige cómo guardar un par estéreo -> (modo, primer canal, segundo canal).
+
+    Se estiman los bits de los cuatro canales posibles (izquierdo, derecho,
+    medio y lado) y se queda la combinación más barata.
+    """
+    medio = (izquierdo + derecho) >> 1
+    lado = izquierdo - derecho
+    bits_i, bits_d, bits_m, bits_l = map(_bits_estimados, (izquierdo, derecho, medio, lado))
+    opciones = {
+        INDEPENDIENTE: (bits_i + bits_d, izquierdo, derecho),
+        IZQUIERDO_LADO: (bits_i + bits_l, izquierdo, lado),
+        LADO_DERECHO: (bits_l + bits_d, lado, derecho),
+        MEDIO_LADO: (bits_m + bits_l, medio, lado),
+    }
+    modo = min(opciones, key=lambda m: opciones[m][0])
+    return (modo,) + opciones[modo][1:]
+
+
+def recorrelar(modo, a, b):
+    """Inverso de decorrelar -> (izquierdo, derecho)."""
+    if modo == INDEPENDIENTE:
+        return a, b
+    if modo == IZQUIERDO_LADO:
+        return a, a - b
+    if modo == LADO_DERECHO:
+        return a + b, b
+    if modo == MEDIO_LADO:
+        # El bit que pierde el medio al dividir es el mismo que el bit bajo del lado
+        suma = (a << 1) | (b & 1)
+        return (suma + b) >> 1, (suma - b) >> 1
+    raise ValueError(f"Modo estéreo desconocido: {modo}")
+
+
+# ---------------- Tramas ----------------
+
+def codificar_trama(muestras, orden_lpc=ORDEN_LPC) -> bytes:
+    """Arreglo (n, canales) de muestras -> bloque comprimido."""
+    salida = bytearray()
+    escribir_varint(salida, len(muestras))
+    canales = list(muestras.T)
+    if len(canales) == 2:
+        modo, *canales = decorrelar(canales[0], canales[1])
+        salida.append(modo)
+    for canal in canales:
+        salida += _codificar_subtrama(np.ascontiguousarray(canal), orden_lpc)
+    return bytes(salida)
+
+
+def decodificar_trama(bloque, n_canales: int, estereo: bool = True):
+    """Inverso de codificar_trama -> arreglo int64 de (n, n_canales).
+
+    Con `estereo=False` se leen tramas sin el byte de modo estéreo (archivos
+    anteriores a la decorrelación).
+    """
+    bloque = bytes(bloque)
+    n, pos = leer_varint(bloque, 0)
+    modo = INDEPENDIENTE
+    if n_canales == 2 and estereo:
+        modo = bloque[pos]
+        pos += 1
+    muestras = np.empty((n, n_canales), dtype=np.int64)
+    for c in range(n_canales):
+        muestras[:, c], pos = _decodificar_subtrama(bloque, pos, n)
+    if pos != len(bloque):
+        raise ValueError("La trama de audio tiene bytes de más")
+    if modo != INDEPENDIENTE:
+        muestras[:, 0], muestras[:, 1] = recorrelar(modo, muestras[:, 0].copy(), muestras[:, 1].copy())
+    return muestras
@@ -1,5 +1,10 @@
 import os
+import sys
 from tkinter import Tk, filedialog
+
+# rle_imagen usa el paquete utils de la raíz del proyecto
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import rle_imagen 
 
 print("Compresion y Descompresion")
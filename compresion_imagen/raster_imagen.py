@@ -0,0 +1,507 @@
+"""Modo raster: se comprimen los píxeles de la imagen, no los bytes del archivo.
+
+Cada fila pasa por el filtro de PNG que deja los residuos más chicos
+(ninguno, Sub, Up, Average o Paeth) y el flujo de filas filtradas va por
+RLE y después por Huffman. Al descomprimir se deshacen los filtros y se
+guarda una imagen con exactamente los mismos píxeles, el mismo modo (con su
+paleta, si tenía) y los mismos metadatos: los fragmentos auxiliares de los
+PNG (texto, DPI, transparencia, perfil de color...) y los DPI de BMP y TIFF.
+Si un PNG trae un fragmento que no se puede volver a escribir, la imagen no
+se trata como raster.
+
+La imagen se parte en teselas (por defecto de 256x256) que se comprimen
+cada una por su lado, con un bloque del contenedor por tesela. Así se pueden
+codificar en paralelo y decodificar_region() puede sacar un recorte
+decodificando solo las teselas que lo tocan.
+
+Necesita Pillow y NumPy; si falta alguno, `disponible()` es False y
+rle_imagen usa el modo por bytes.
+"""
+import struct
+import zlib
+from functools import partial
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from PIL import Image, PngImagePlugin
+except ImportError:
+    Image = None
+
+from utils.rle import codificar_rle, decodificar_rle
+from utils.huffman_bytes import (frecuencias_bytes, longitudes_bytes, tabla_bytes, codificar_bytes,
+                                 descomprimir_bytes, descomprimir_de_bloque)
+from utils.huffman_canonico import codigos_canonicos, empaquetar_bloque, desempaquetar_bloque
+from utils.paralelo import mapear_en_orden, cantidad_procesos
+from utils.metricas import SIN_METRICAS
+from utils.contenedor import LectorContenedor, CODEC_IMAGEN_RASTER, CODEC_IMAGEN_PALETA
+
+# Formatos de origen sin pérdida que Pillow puede volver a escribir
+FORMATOS = {"PNG", "BMP", "TIFF", "PPM"}
+
+# Bytes por píxel de cada modo de Pillow admitido ("P": índices a la paleta de la imagen)
+BYTES_POR_PIXEL = {"L": 1, "P": 1, "LA": 2, "RGB": 3, "RGBA": 4}
+
+# Modos que se convierten al leer, sin cambiar ningún color, y se restauran al guardar
+_CONVERSIONES = {"1": "L"}
+
+# Fragmentos auxiliares de PNG que Pillow vuelve a escribir tal cual (los
+# privados, con la segunda letra en minúscula, también)
+_FRAGMENTOS_COPIADOS = {b"cHRM", b"cICP", b"gAMA", b"sBIT", b"sRGB", b"tIME", b"bKGD", b"hIST",
+                        b"sPLT", b"iTXt", b"tEXt", b"zTXt"}
+# Los que Pillow escribe a partir de una opción de save() (ver _opciones_png)
+_FRAGMENTOS_TRADUCIDOS = {b"tRNS", b"pHYs", b"iCCP", b"eXIf"}
+# Los que salen de los píxeles, el modo y la paleta
+_FRAGMENTOS_IMAGEN = {b"IHDR", b"PLTE", b"IDAT", b"IEND"}
+_FRAGMENTOS_ANIMACION = {b"acTL", b"fcTL", b"fdAT"}
+
+NINGUNO, SUB, UP, AVERAGE, PAETH = range(5)
+
+# Lado de las teselas en píxeles
+TAM_TESELA = 256
+
+# Average y Paeth se deshacen byte a byte en Python (los otros con NumPy), así
+# que solo se eligen si dejan residuos al menos un 10 % más chicos.
+_RECARGO_SECUENCIAL = 1.1
+
+
+def disponible() -> bool:
+    return np is not None and Image is not None
+
+
+def leer_pixeles(ruta):
+    """-> (pixeles, meta) o None si la imagen no se puede tratar como raster.
+
+    `pixeles` es un arreglo uint8 de alto x (ancho * bytes por píxel).
+    """
+    if not disponible():
+        return None
+    try:
+        imagen = Image.open(ruta)
+    except OSError:
+        return None
+    with imagen:
+        if imagen.format not in FORMATOS or getattr(imagen, "n_frames", 1) > 1:
+            return None
+        meta = {"formato": imagen.format}
+        if imagen.format == "PNG":
+            fragmentos = fragmentos_png(ruta)
+            if fragmentos is None:
+                return None
+            if fragmentos:
+                meta["png"] = [[tipo.decode("ascii"), datos.hex(), despues] for tipo, datos, despues in fragmentos]
+        elif imagen.info.get("resolution", (1, 1)) != (1, 1):
+            # TIFF con resolución sin unidad: Pillow no la puede volver a escribir igual
+            return None
+        elif "dpi" in imagen.info and "resolution" not in imagen.info:
+            meta["dpi"] = [float(valor) for valor in imagen.info["dpi"]]
+        if imagen.mode in _CONVERSIONES:
+            # Imágenes de 1 bit: se pasan a escala de grises y se vuelven a convertir al guardar
+            meta["modo_original"] = imagen.mode
+            imagen = imagen.convert(_CONVERSIONES[imagen.mode])
+        if imagen.mode not in BYTES_POR_PIXEL:
+            return None
+        if imagen.mode == "P":
+            meta["paleta_imagen"] = bytes(imagen.getpalette("RGB")).hex()
+        ancho, alto = imagen.size
+        bpp = BYTES_POR_PIXEL[imagen.mode]
+        pixeles = np.frombuffer(imagen.tobytes(), dtype=np.uint8).reshape(alto, ancho * bpp)
+        meta.update({"modo": imagen.mode, "ancho": ancho, "alto": alto})
+    return pixeles, meta
+
+
+def fragmentos_png(ruta):
+    """Fragmentos auxiliares de un PNG -> [(tipo, datos, va después de IDAT)],
+    o None si alguno no se puede volver a escribir con Pillow."""
+    fragmentos = []
+    despues_de_idat = False
+    with open(ruta, "rb") as f:
+        f.read(8)
+        while True:
+            cabecera = f.read(8)
+            if len(cabecera) < 8:
+                break
+            largo, tipo = struct.unpack(">I4s", cabecera)
+            datos = f.read(largo)
+            f.read(4)  # CRC
+            if tipo == b"IEND":
+                break
+            despues_de_idat = despues_de_idat or tipo == b"IDAT"
+            if tipo in _FRAGMENTOS_IMAGEN:
+                continue
+            privado = tipo[1:2].islower() and tipo not in _FRAGMENTOS_ANIMACION
+            if not (privado or tipo in _FRAGMENTOS_COPIADOS or tipo in _FRAGMENTOS_TRADUCIDOS):
+                return None
+            if tipo == b"pHYs" and datos[8:9] != b"\x01":
+                # Sin unidad (solo la proporción de los píxeles): Pillow solo escribe DPI
+                return None
+            fragmentos.append((tipo, datos, despues_de_idat))
+    return fragmentos
+
+
+def _opciones_png(fragmentos, modo):
+    # Fragmentos guardados en los metadatos -> opciones de Image.save()
+    info = PngImagePlugin.PngInfo()
+    opciones = {"pnginfo": info}
+    for tipo, datos, despues_de_idat in fragmentos:
+        tipo, datos = tipo.encode("ascii"), bytes.fromhex(datos)
+        if tipo == b"tRNS":
+            if modo == "P":
+                opciones["transparency"] = datos
+            elif modo == "RGB":
+                opciones["transparency"] = struct.unpack(">3H", datos)
+            else:
+                opciones["transparency"] = struct.unpack(">H", datos)[0]
+        elif tipo == b"pHYs":
+            x, y = struct.unpack(">II", datos[:8])
+            opciones["dpi"] = (x * 0.0254, y * 0.0254)
+        elif tipo == b"iCCP":
+            # Nombre del perfil, separador y método de compresión
+            opciones["icc_profile"] = zlib.decompress(datos[datos.index(b"\0") + 2:])
+        elif tipo == b"eXIf":
+            opciones["exif"] = datos
+        else:
+            info.add(tipo, datos, after_idat=despues_de_idat)
+    return opciones
+
+
+def _imagen_de(pixeles, meta, ancho, alto):
+    # Píxeles en el modo de los metadatos -> imagen de Pillow en el modo original
+    imagen = Image.frombytes(meta["modo"], (ancho, alto), pixeles.tobytes())
+    if "paleta_imagen" in meta:
+        imagen.putpalette(bytes.fromhex(meta["paleta_imagen"]))
+    if "modo_original" in meta:
+        imagen = imagen.convert(meta["modo_original"], dither=Image.Dither.NONE)
+    return imagen
+
+
+def guardar_pixeles(pixeles, meta, ruta):
+    imagen = _imagen_de(pixeles, meta, meta["ancho"], meta["alto"])
+    opciones = {}
+    if "dpi" in meta:
+        opciones["dpi"] = tuple(meta["dpi"])
+    if "png" in meta:
+        opciones = _opciones_png(meta["png"], imagen.mode)
+    imagen.save(ruta, format=meta["formato"], **opciones)
+
+
+def _vecinos(x, bpp):
+    # a = izquierda, b = arriba, c = arriba a la izquierda (0 fuera de la imagen)
+    a = np.zeros_like(x)
+    a[:, bpp:] = x[:, :-bpp]
+    b = np.zeros_like(x)
+    b[1:] = x[:-1]
+    c = np.zeros_like(x)
+    c[1:, bpp:] = x[:-1, :-bpp]
+    return a, b, c
+
+
+def _paeth(a, b, c):
+    pa = np.abs(b - c)
+    pb = np.abs(a - c)
+    pc = np.abs(a + b - 2 * c)
+    return np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+
+
+def filtrar_filas(pixeles, bpp):
+    """Filtra cada fila -> arreglo uint8 de alto x (1 + ancho * bpp).
+
+    La primera columna es el tipo de filtro de la fila. Como en PNG, se elige
+    el filtro con menor suma de |residuo| leyendo los residuos con signo,
+    con un recargo para los filtros lentos de deshacer.
+    """
+    x = pixeles.astype(np.int16)
+    a, b, c = _vecinos(x, bpp)
+    candidatos = np.stack([x, x - a, x - b, x - ((a + b) >> 1), x - _paeth(a, b, c)])
+    candidatos = (candidatos & 0xFF).astype(np.uint8)
+    costos = np.abs(candidatos.view(np.int8).astype(np.int32)).sum(axis=2).astype(np.float64)
+    costos[AVERAGE:] *= _RECARGO_SECUENCIAL
+    tipos = costos.argmin(axis=0).astype(np.uint8)
+    filas = candidatos[tipos, np.arange(len(tipos))]
+    return np.concatenate([tipos[:, None], filas], axis=1)
+
+
+# Average y Paeth dependen del píxel de la izquierda ya reconstruido, así que
+# van byte a byte; los primeros bpp bytes de la fila no tienen vecino izquierdo.
+
+def _deshacer_average(residuos, anterior, bpp):
+    fila = residuos.tolist()
+    arriba = anterior.tolist()
+    for i in range(bpp):
+        fila[i] = (fila[i] + (arriba[i] >> 1)) & 0xFF
+    for i in range(bpp, len(fila)):
+        fila[i] = (fila[i] + ((fila[i - bpp] + arriba[i]) >> 1)) & 0xFF
+    return fila
+
+
+def _deshacer_paeth(residuos, anterior, bpp):
+    fila = residuos.tolist()
+    arriba = anterior.tolist()
+    for i in range(bpp):
+        fila[i] = (fila[i] + arriba[i]) & 0xFF
+    for i in range(bpp, len(fila)):
+        a = fila[i - bpp]
+        b = arriba[i]
+        c = arriba[i - bpp]
+        # p = a + b - c; las distancias de p a a, b y c
+        pa = b - c
+        pb = a - c
+        pc = abs(pa + pb)
+        pa = abs(pa)
+        pb = abs(pb)
+        if pa <= pb and pa <= pc:
+            fila[i] = (fila[i] + a) & 0xFF
+        elif pb <= pc:
+            fila[i] = (fila[i] + b) & 0xFF
+        else:
+            fila[i] = (fila[i] + c) & 0xFF
+    return fila
+
+
+def reconstruir_filas(filtrado, bpp):
+    """Inverso de filtrar_filas -> píxeles uint8 de alto x (ancho * bpp)."""
+    alto, largo = filtrado.shape
+    pixeles = np.empty((alto, largo - 1), dtype=np.uint8)
+    anterior = np.zeros(largo - 1, dtype=np.uint8)
+    for y in range(alto):
+        tipo = int(filtrado[y, 0])
+        residuos = filtrado[y, 1:]
+        if tipo == NINGUNO:
+            fila = residuos
+        elif tipo == SUB:
+            # x[i] = r[i] + x[i - bpp] es una suma acumulada por canal (mod 256)
+            fila = np.cumsum(residuos.reshape(-1, bpp), axis=0, dtype=np.uint8).reshape(-1)
+        elif tipo == UP:
+            fila = residuos + anterior
+        elif tipo == AVERAGE:
+            fila = _deshacer_average(residuos, anterior, bpp)
+        elif tipo == PAETH:
+            fila = _deshacer_paeth(residuos, anterior, bpp)
+        else:
+            raise ValueError(f"Tipo de filtro desconocido: {tipo}")
+        pixeles[y] = fila
+        anterior = pixeles[y]
+    return pixeles
+
+
+def descomprimir_pixeles(bloque, alto, ancho, bpp, longitudes=None):
+    """Bloque de una tesela -> píxeles.
+
+    Con `longitudes` el bloque usa la tabla de Huffman común de la imagen; sin
+    ellas trae su propia cabecera de longitudes.
+    """
+    if longitudes is None:
+        rle = descomprimir_de_bloque(bloque)
+    else:
+        n_bits, _, datos = desempaquetar_bloque(bloque)
+        rle = descomprimir_bytes(datos, n_bits, longitudes)
+    largo_fila = 1 + ancho * bpp
+    filtrado = decodificar_rle(rle, alto * largo_fila)
+    return reconstruir_filas(np.frombuffer(filtrado, dtype=np.uint8).reshape(alto, largo_fila), bpp)
+
+
+# ---------------- Teselas ----------------
+
+def teselas(ancho, alto, tam=TAM_TESELA):
+    """Rectángulos (x, y, ancho, alto) de cada tesela, fila por fila."""
+    return [(x, y, min(tam, ancho - x), min(tam, alto - y))
+            for y in range(0, alto, tam) for x in range(0, ancho, tam)]
+
+
+def _filtrar_tesela(pixeles, bpp):
+    return codificar_rle(filtrar_filas(pixeles, bpp).tobytes())
+
+
+def _codificar_tesela(rle, tabla):
+    empaquetados, n_bits = codificar_bytes(rle, tabla)
+    return empaquetar_bloque(n_bits, b"", empaquetados)
+
+
+def comprimir_teselas(pixeles, bpp, tam=TAM_TESELA, n_procesos=1, metricas=SIN_METRICAS, progreso=None):
+    """Comprime cada tesela -> (bloques en el orden de teselas(), longitudes de Huffman).
+
+    Todas las teselas comparten una tabla de Huffman (se guarda en los
+    metadatos): una tabla por tesela ocuparía más y haría que cada tesela
+    decodificada tenga que armar la suya. Los filtros y el RLE se hacen primero
+    para tener el histograma de toda la imagen; con n_procesos > 1 los dos
+    pasos se reparten entre procesos.
+
+    Si se da, `progreso(teselas hechas, total)` se llama después de cada
+    tesela en cada uno de los dos pasos (el total es el doble de teselas).
+    """
+    alto, largo = pixeles.shape
+    rectangulos = teselas(largo // bpp, alto, tam)
+    total = 2 * len(rectangulos)
+    recortes = (np.ascontiguousarray(pixeles[y:y + h, x * bpp:(x + w) * bpp])
+                for x, y, w, h in rectangulos)
+    with metricas.etapa("filtros y rle"):
+        rles = []
+        for rle in mapear_en_orden(partial(_filtrar_tesela, bpp=bpp), recortes, n_procesos):
+            rles.append(rle)
+            if progreso is not None:
+                progreso(len(rles), total)
+
+    with metricas.etapa("frecuencias"):
+        frecuencias = [0] * 256
+        for rle in rles:
+            frecuencias = [a + b for a, b in zip(frecuencias, frecuencias_bytes(rle))]
+    with metricas.etapa("arbol"):
+        longitudes, _ = longitudes_bytes(frecuencias)
+        tabla = tabla_bytes(codigos_canonicos(longitudes))
+    with metricas.etapa("codificacion"):
+        bloques = []
+        for bloque in mapear_en_orden(partial(_codificar_tesela, tabla=tabla), rles, n_procesos):
+            bloques.append(bloque)
+            if progreso is not None:
+                progreso(len(rles) + len(bloques), total)
+    metricas.contar("teselas", len(bloques))
+    return bloques, longitudes
+
+
+def _longitudes_a_meta(longitudes):
+    # {byte: longitud} -> lista de 256 enteros (0 = el byte no aparece), para el JSON
+    return [longitudes.get(valor, 0) for valor in range(256)]
+
+
+def _longitudes_de_meta(meta):
+    lista = meta.get("longitudes")
+    if lista is None:
+        return None
+    return {valor: largo for valor, largo in enumerate(lista) if largo}
+
+
+def _bloques_de_teselas(pixeles, bpp, meta, n_procesos, metricas, progreso):
+    # Comprime las teselas y completa los metadatos -> [(bloque, largo original)]
+    meta["tesela"] = TAM_TESELA
+    bloques, longitudes = comprimir_teselas(pixeles, bpp, n_procesos=n_procesos, metricas=metricas,
+                                            progreso=progreso)
+    meta["longitudes"] = _longitudes_a_meta(longitudes)
+    rectangulos = teselas(meta["ancho"], meta["alto"])
+    return [(bloque, w * h * bpp) for bloque, (_, _, w, h) in zip(bloques, rectangulos)]
+
+
+def comprimir_raster(pixeles, meta, n_procesos=1, metricas=SIN_METRICAS, progreso=None):
+    """Modo raster: filtros sobre los píxeles -> [(bloque, largo original)]."""
+    return _bloques_de_teselas(pixeles, BYTES_POR_PIXEL[meta["modo"]], meta, n_procesos, metricas, progreso)
+
+
+# ---------------- Paleta ----------------
+
+def paleta_de(pixeles, bpp):
+    """-> (índices uint8 de alto x ancho, paleta uint8 de n x bpp) o None si hay más de 256 colores.
+
+    La paleta queda ordenada de más a menos frecuente, así los colores
+    comunes tienen índices chicos.
+    """
+    alto = pixeles.shape[0]
+    canales = pixeles.reshape(alto, -1, bpp)
+    # Cada color como un entero de hasta 32 bits
+    colores = np.zeros(canales.shape[:2], dtype=np.uint32)
+    for k in range(bpp):
+        colores |= canales[:, :, k].astype(np.uint32) << np.uint32(8 * k)
+    unicos, inverso, cuentas = np.unique(colores.reshape(-1), return_inverse=True, return_counts=True)
+    if len(unicos) > 256:
+        return None
+    orden = np.argsort(-cuentas, kind="stable")
+    posicion = np.empty_like(orden)
+    posicion[orden] = np.arange(len(orden))
+    indices = posicion[inverso].astype(np.uint8).reshape(colores.shape)
+    paleta = np.stack([(unicos[orden] >> np.uint32(8 * k)) & 0xFF for k in range(bpp)], axis=1)
+    return indices, paleta.astype(np.uint8)
+
+
+def comprimir_paleta(pixeles, meta, n_procesos=1, metricas=SIN_METRICAS, progreso=None):
+    """Modo paleta -> [(bloque, largo original)] o None si la imagen tiene más de 256 colores.
+
+    Los índices se comprimen igual que una imagen en escala de grises (filtros,
+    RLE y Huffman por teselas) y la paleta va en los metadatos.
+    """
+    with metricas.etapa("paleta"):
+        resultado = paleta_de(pixeles, BYTES_POR_PIXEL[meta["modo"]])
+    if resultado is None:
+        return None
+    indices, paleta = resultado
+    meta["paleta"] = paleta.tobytes().hex()
+    return _bloques_de_teselas(indices, 1, meta, n_procesos, metricas, progreso)
+
+
+def _aplicar_paleta(meta, raster):
+    # Índices -> píxeles si el archivo está en modo paleta; si no, nada que hacer
+    if "paleta" not in meta:
+        return raster
+    bpp = BYTES_POR_PIXEL[meta["modo"]]
+    paleta = np.frombuffer(bytes.fromhex(meta["paleta"]), dtype=np.uint8).reshape(-1, bpp)
+    return paleta[raster].reshape(raster.shape[0], -1)
+
+
+def _bpp_teselas(meta):
+    return 1 if "paleta" in meta else BYTES_POR_PIXEL[meta["modo"]]
+
+
+def _tam_tesela(meta):
+    # Sin "tesela" en los metadatos la imagen entera es un único bloque
+    return meta.get("tesela") or max(meta["ancho"], meta["alto"], 1)
+
+
+def _descomprimir_tesela(argumentos):
+    bloque, alto, ancho, bpp, longitudes = argumentos
+    return descomprimir_pixeles(bloque, alto, ancho, bpp, longitudes)
+
+
+def descomprimir_teselas(contenedor, n_procesos=1, progreso=None):
+    """Píxeles de la imagen completa a partir de un contenedor ya abierto (raster o paleta).
+
+    Si se da, `progreso(bytes decodificados, total)` se llama después de cada tesela.
+    """
+    meta = contenedor.meta
+    bpp = _bpp_teselas(meta)
+    pixeles = np.empty((meta["alto"], meta["ancho"] * bpp), dtype=np.uint8)
+    rectangulos = teselas(meta["ancho"], meta["alto"], _tam_tesela(meta))
+    longitudes = _longitudes_de_meta(meta)
+    paralelo = cantidad_procesos(n_procesos) > 1
+    # las memoryview del mmap no viajan entre procesos
+    trabajos = ((bytes(bloque) if paralelo else bloque, h, w, bpp, longitudes)
+                for bloque, (_, _, w, h) in zip(contenedor.iterar_bloques(), rectangulos))
+    hechos = 0
+    for (x, y, w, h), tesela in zip(rectangulos, mapear_en_orden(_descomprimir_tesela, trabajos, n_procesos)):
+        pixeles[y:y + h, x * bpp:(x + w) * bpp] = tesela
+        if progreso is not None:
+            hechos += tesela.size
+            progreso(hechos, contenedor.tamano_original)
+    return _aplicar_paleta(meta, pixeles)
+
+
+def decodificar_region(ruta, x, y, ancho, alto):
+    """Recorte (x, y, ancho, alto) de una imagen comprimida en modo raster o paleta, como imagen de Pillow.
+
+    Solo se decodifican las teselas que tocan el recorte; el rectángulo se
+    ajusta a los bordes de la imagen.
+    """
+    if not disponible():
+        raise ValueError("Para decodificar imágenes en modo raster hace falta Pillow y NumPy")
+    with LectorContenedor(ruta) as contenedor:
+        if contenedor.codec not in (CODEC_IMAGEN_RASTER, CODEC_IMAGEN_PALETA):
+            raise ValueError("El archivo no es una imagen comprimida en modo raster")
+        meta = contenedor.meta
+        bpp = _bpp_teselas(meta)
+        longitudes = _longitudes_de_meta(meta)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + ancho, meta["ancho"]), min(y + alto, meta["alto"])
+        if x1 <= x0 or y1 <= y0:
+            raise ValueError("La región queda fuera de la imagen")
+
+        region = np.empty((y1 - y0, (x1 - x0) * bpp), dtype=np.uint8)
+        for i, (tx, ty, w, h) in enumerate(teselas(meta["ancho"], meta["alto"], _tam_tesela(meta))):
+            if tx >= x1 or ty >= y1 or tx + w <= x0 or ty + h <= y0:
+                continue
+            tesela = descomprimir_pixeles(contenedor.bloque(i), h, w, bpp, longitudes)
+            # Intersección entre la tesela y la región, en coordenadas de la imagen
+            ix0, iy0 = max(tx, x0), max(ty, y0)
+            ix1, iy1 = min(tx + w, x1), min(ty + h, y1)
+            region[iy0 - y0:iy1 - y0, (ix0 - x0) * bpp:(ix1 - x0) * bpp] = \
+                tesela[iy0 - ty:iy1 - ty, (ix0 - tx) * bpp:(ix1 - tx) * bpp]
+    region = _aplicar_paleta(meta, region)
+    return _imagen_de(region, meta, x1 - x0, y1 - y0)
@@ -1,74 +1,195 @@
 import os
 
-def comprimir_a_rlebits(ruta):
+from utils.bits import EscritorBits
+from utils.rle import codificar_rle, decodificar_rle
+from utils.metricas import SIN_METRICAS
+from utils.trabajos import sin_progreso, borrar_si_falla
+from utils.contenedor import (EscritorContenedor, LectorContenedor, es_contenedor, tamano_contenedor,
+                              CODEC_IMAGEN_RLE_BITS, CODEC_IMAGEN_RLE_BYTES,
+                              CODEC_IMAGEN_RASTER, CODEC_IMAGEN_PALETA, CODEC_IMAGEN_ALMACENADO)
+from compresion_imagen import raster_imagen
+from compresion_imagen.vista_previa import crear_vista_previa, FRACCION_MAXIMA_VISTA_PREVIA
+
+# "bytes": RLE sobre los bytes del archivo; "raster": filtros de PNG sobre los
+# píxeles (PNG/BMP/TIFF/PPM con Pillow y NumPy); "paleta": como raster pero
+# sobre índices a una paleta de hasta 256 colores; "almacenado": el archivo
+# tal cual, sin comprimir; "auto": el que ocupe menos.
+MODOS = ("auto", "bytes", "raster", "paleta", "almacenado")
+
+_NOMBRES_MODO = {CODEC_IMAGEN_RLE_BYTES: "bytes", CODEC_IMAGEN_RASTER: "raster",
+                 CODEC_IMAGEN_PALETA: "paleta", CODEC_IMAGEN_ALMACENADO: "almacenado"}
+
+
+def _dentro_del_paso(progreso, paso, pasos):
+    # Avance de las teselas de un modo -> fracción del paso de ese modo
+    return lambda hechos, total: progreso(paso + hechos / total, pasos)
+
+
+def comprimir_a_rlebits(ruta, modo="auto", n_procesos=1, vista_previa=True, metricas=SIN_METRICAS,
+                        progreso=sin_progreso, ruta_salida=None):
+    """Guarda en `ruta_salida` o, por defecto, en nombre_ext.rlebits junto a
+    la imagen. Con n_procesos > 1 (None = todos los núcleos) las teselas del modo
+    raster se comprimen en paralelo. Con `vista_previa` se guarda una
+    miniatura al principio del archivo si Pillow puede abrir la imagen, si
+    es más grande que la miniatura y si esta no pesa más que una fracción
+    de los bloques (ver compresion_imagen/vista_previa.py).
+    Con `metricas` (utils.metricas.Metricas) se registra el tiempo de cada
+    etapa de todos los modos probados, los bytes y los píxeles.
+    `progreso(pasos hechos, total)` se llama al leer, después de cada tesela
+    de los modos raster y paleta (con fracciones de paso) y de cada bloque
+    guardado; la última llamada es antes de cerrar el archivo, así que
+    cancelar nunca deja una salida completa ni una a medias."""
+    if modo not in MODOS:
+        raise ValueError(f"Modo desconocido: {modo!r} (use {', '.join(MODOS)})")
+    metricas.comenzar("comprimir", "imagen", archivo=ruta)
+    # Leer, un paso por modo que se prueba y guardar (almacenar no cuesta nada)
+    pasos = 2 + (len(MODOS) - 2 if modo == "auto" else 1)
+    paso = 0
+    progreso(paso, pasos)
     print("Leyendo archivo original")
-    with open(ruta, "rb") as archivo:
-        datos = archivo.read()
-
-    print("Convirtiendo")
-    bits = ""
-    for byte in datos:
-        bits_de_byte = format(byte, "08b")
-        bits += bits_de_byte
+    with metricas.etapa("lectura"):
+        with open(ruta, "rb") as archivo:
+            datos = archivo.read()
 
+    paso += 1
     print("Iniciando compresión")
-    resultado = []
-    contador = 1
-
-    for i in range(1, len(bits)):
-        if bits[i] == bits[i - 1] and contador < 255:
-            contador += 1
+    # Cada candidato es (codec, metadatos propios, [(bloque, largo original)])
+    candidatos = []
+    if modo in ("auto", "raster", "paleta"):
+        with metricas.etapa("lectura"):
+            raster = raster_imagen.leer_pixeles(ruta)
+        if raster is None and modo != "auto":
+            raise ValueError(f"La imagen no se puede comprimir en modo {modo} (hace falta Pillow, NumPy "
+                             "y un PNG/BMP/TIFF/PPM sin metadatos que se perderían)")
+        if raster is None:
+            # No se prueban paleta ni raster
+            pasos -= 2
         else:
-            resultado.append(str(contador))
-            resultado.append(bits[i - 1])
-            contador = 1
-
-    resultado.append(str(contador))
-    resultado.append(bits[-1])
+            pixeles, meta_raster = raster
+            metricas.contar("pixeles", meta_raster["ancho"] * meta_raster["alto"])
+            if modo in ("auto", "paleta"):
+                meta_paleta = dict(meta_raster)
+                progreso(paso, pasos)
+                bloques = raster_imagen.comprimir_paleta(pixeles, meta_paleta, n_procesos, metricas,
+                                                         _dentro_del_paso(progreso, paso, pasos))
+                paso += 1
+                if bloques is not None:
+                    candidatos.append((CODEC_IMAGEN_PALETA, meta_paleta, bloques))
+                elif modo == "paleta":
+                    raise ValueError("La imagen tiene más de 256 colores; no se puede usar el modo paleta")
+            if modo in ("auto", "raster"):
+                progreso(paso, pasos)
+                bloques = raster_imagen.comprimir_raster(pixeles, meta_raster, n_procesos, metricas,
+                                                         _dentro_del_paso(progreso, paso, pasos))
+                paso += 1
+                candidatos.append((CODEC_IMAGEN_RASTER, meta_raster, bloques))
+    if modo in ("auto", "bytes"):
+        progreso(paso, pasos)
+        # Rachas de bytes iguales en paquetes literal/repetición (ver utils/rle.py)
+        with metricas.etapa("rle"):
+            candidatos.append((CODEC_IMAGEN_RLE_BYTES, {}, [(codificar_rle(datos), len(datos))]))
+    if modo in ("auto", "almacenado"):
+        # Si ningún modo achica el archivo (un PNG o un JPEG ya comprimidos) se guarda tal cual
+        candidatos.append((CODEC_IMAGEN_ALMACENADO, {}, [(datos, len(datos))]))
 
     nombre = os.path.splitext(os.path.basename(ruta))[0]
     carpeta = os.path.dirname(ruta)
     extension_original = os.path.splitext(ruta)[1]  # Guarda extensión original (.png / .jpg)
-    archivo_salida = os.path.join(carpeta, f"{nombre}_{extension_original[1:]}.rlebits")
+    # Se compara el archivo entero: en imágenes chicas los metadatos (longitudes
+    # de Huffman, paleta) y el índice de teselas pesan más que los bloques
+    codec, meta_codec, bloques = min(candidatos, key=lambda c: tamano_contenedor(
+        {"nombre": nombre, "extension": extension_original, **c[1]}, (len(b) for b, _ in c[2])))
+    archivo_salida = ruta_salida or os.path.join(carpeta, f"{nombre}_{extension_original[1:]}.rlebits")
 
+    progreso(pasos - 1, pasos)
     print("Guardando archivo comprimido...")
-    with open(archivo_salida, "w") as f:
-        f.write(",".join(resultado))
+    meta = {"nombre": nombre, "extension": extension_original, **meta_codec}
+    with metricas.etapa("vista previa"):
+        tamano_maximo = FRACCION_MAXIMA_VISTA_PREVIA * sum(len(bloque) for bloque, _ in bloques)
+        miniatura = crear_vista_previa(ruta, tamano_maximo=tamano_maximo) if vista_previa else None
+    with metricas.etapa("escritura"):
+        with borrar_si_falla(archivo_salida), open(archivo_salida, "wb") as f, \
+                EscritorContenedor(f, codec, meta, miniatura) as contenedor:
+            for i, (bloque, largo_original) in enumerate(bloques, 1):
+                contenedor.agregar_bloque(bloque, largo_original)
+                progreso(pasos - 1 + i / len(bloques), pasos)
 
     tamaño_original = os.path.getsize(ruta)
     tamaño_comprimido = os.path.getsize(archivo_salida)
+    metricas.terminar()
+    metricas.etiquetar(modo=_NOMBRES_MODO[codec])
+    metricas.contar("bytes_entrada", tamaño_original)
+    metricas.contar("bytes_salida", tamaño_comprimido)
 
     print("")
+    print("Modo:", _NOMBRES_MODO[codec])
     print("Tamaño original:", tamaño_original, "bytes")
     print("Tamaño comprimido:", tamaño_comprimido, "bytes")
 
     return archivo_salida
 
 
-def descomprimir_rlebits(ruta):
-    print("Abriendo archivo ")
+def _leer_rachas_csv(ruta):
+    # Formato anterior: "cantidad,bit,cantidad,bit,..." en texto plano
     with open(ruta, "r") as f:
         datos = f.read().split(",")
+    for i in range(0, len(datos) - 1, 2):
+        yield int(datos[i]), int(datos[i + 1])
+
 
+def _bits_desde_rachas(rachas):
+    # Formatos anteriores: rachas (cantidad, bit) sobre los bits del archivo
     print("Reconstruyendo")
-    bits = ""
-    for i in range(0, len(datos) - 1, 2):
-        cantidad = int(datos[i])
-        valor = datos[i + 1]
-        bits += valor * cantidad
+    escritor = EscritorBits()
+    for cantidad, valor in rachas:
+        escritor.escribir((1 << cantidad) - 1 if valor else 0, cantidad)
 
     print("Convirtiendo")
-    bytes_resultado = bytearray()
-    for i in range(0, len(bits), 8):
-        byte = bits[i:i + 8]
-        if len(byte) < 8:
-            byte = byte.ljust(8, "0")
-        bytes_resultado.append(int(byte, 2))
+    return escritor.cerrar()
+
+
+def descomprimir_rlebits(ruta, n_procesos=1, metricas=SIN_METRICAS, progreso=sin_progreso, ruta_salida=None):
+    """Guarda en `ruta_salida` o, por defecto, en nombre_descomprimido.ext
+    junto al comprimido. `progreso(bytes decodificados, total)` se llama
+    después de cada tesela."""
+    metricas.comenzar("descomprimir", "imagen", archivo=ruta)
+    progreso(0, 1)
+    print("Abriendo archivo ")
+    meta = {}
+    pixeles = None
+    if es_contenedor(ruta):
+        with LectorContenedor(ruta) as contenedor, metricas.etapa("decodificacion"):
+            meta = contenedor.meta
+            metricas.etiquetar(modo=_NOMBRES_MODO.get(contenedor.codec, "bits"))
+            if contenedor.codec in (CODEC_IMAGEN_RASTER, CODEC_IMAGEN_PALETA):
+                if not raster_imagen.disponible():
+                    raise ValueError("Para descomprimir imágenes en modo raster hace falta Pillow y NumPy")
+                print("Reconstruyendo píxeles")
+                pixeles = raster_imagen.descomprimir_teselas(contenedor, n_procesos, progreso)
+            elif contenedor.codec == CODEC_IMAGEN_RLE_BYTES:
+                print("Reconstruyendo")
+                bytes_resultado = bytearray()
+                if contenedor.bloques:
+                    bytes_resultado = decodificar_rle(contenedor.bloque(0),
+                                                      contenedor.bloques[0].largo_original)
+            elif contenedor.codec == CODEC_IMAGEN_ALMACENADO:
+                bytes_resultado = bytes(contenedor.bloque(0)) if contenedor.bloques else b""
+            elif contenedor.codec == CODEC_IMAGEN_RLE_BITS:
+                rachas = bytes(contenedor.bloque(0)) if contenedor.bloques else b""
+                bytes_resultado = _bits_desde_rachas(zip(rachas[0::2], rachas[1::2]))
+            else:
+                raise ValueError("El archivo no es una imagen comprimida con RLE")
+    else:
+        with metricas.etapa("decodificacion"):
+            bytes_resultado = _bits_desde_rachas(_leer_rachas_csv(ruta))
 
     nombre = os.path.splitext(os.path.basename(ruta))[0]
 
-    # 🔹 Detectar formato original desde el nombre
-    if "_png" in nombre:
+    # 🔹 Detectar formato original desde los metadatos o, si no hay, desde el nombre
+    if meta:
+        extension_original = meta["extension"]
+        nombre = meta["nombre"]
+    elif "_png" in nombre:
         extension_original = ".png"
         nombre = nombre.replace("_png", "")
     elif "_jpg" in nombre or "_jpeg" in nombre:
@@ -78,11 +199,20 @@ def descomprimir_rlebits(ruta):
         extension_original = ".bin"
 
     carpeta = os.path.dirname(ruta)
-    salida = os.path.join(carpeta, f"{nombre}_descomprimido{extension_original}")
+    salida = ruta_salida or os.path.join(carpeta, f"{nombre}_descomprimido{extension_original}")
 
+    # Lo último que se puede cancelar: la escritura ya no se interrumpe
+    progreso(1, 1)
     print("Guardando archivo ")
-    with open(salida, "wb") as f:
-        f.write(bytes_resultado)
+    with metricas.etapa("escritura"), borrar_si_falla(salida):
+        if pixeles is not None:
+            raster_imagen.guardar_pixeles(pixeles, meta, salida)
+        else:
+            with open(salida, "wb") as f:
+                f.write(bytes_resultado)
+    metricas.terminar()
+    metricas.contar("bytes_entrada", os.path.getsize(ruta))
+    metricas.contar("bytes_salida", os.path.getsize(salida))
 
     print("✅ Archivo descomprimido correctamente:", salida)
     return salida
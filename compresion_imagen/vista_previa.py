@@ -0,0 +1,61 @@
+"""Miniatura guardada al principio de los .rlebits.
+
+Al comprimir se agrega una versión chica de la imagen (JPEG, o PNG si tiene
+transparencia) justo después de la cabecera del contenedor. Para mostrarla
+basta leer los primeros KB del archivo, sin descomprimir nada. No se agrega
+si la imagen ya es del tamaño de una miniatura o si la miniatura pesaría
+demasiado al lado de la imagen comprimida.
+"""
+import io
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from utils.contenedor import leer_cabecera
+
+# Lado mayor de la miniatura en píxeles
+TAM_VISTA_PREVIA = 128
+
+# Fracción de los bloques comprimidos que puede ocupar la miniatura
+FRACCION_MAXIMA_VISTA_PREVIA = 0.25
+
+
+def crear_vista_previa(ruta, tam=TAM_VISTA_PREVIA, tamano_maximo=None):
+    """Bytes de la miniatura de la imagen en `ruta`, o None si Pillow no está
+    o no puede abrirla, si la imagen no pasa de `tam` píxeles de lado (la
+    miniatura sería la imagen misma) o si ocupa más de `tamano_maximo` bytes."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(ruta) as imagen:
+            if max(imagen.size) <= tam:
+                return None
+            imagen.thumbnail((tam, tam))
+            if imagen.mode in ("RGBA", "LA", "PA") or "transparency" in imagen.info:
+                imagen = imagen.convert("RGBA")
+            if imagen.mode == "RGBA" and imagen.getchannel("A").getextrema()[0] < 255:
+                # Con transparencia real: PNG con paleta, que ocupa unos pocos KB
+                imagen = imagen.quantize(colors=64, method=Image.Quantize.FASTOCTREE)
+                formato, opciones = "PNG", {"optimize": True}
+            else:
+                imagen = imagen.convert("L" if imagen.mode in ("1", "L", "I", "I;16") else "RGB")
+                formato, opciones = "JPEG", {"quality": 80}
+            salida = io.BytesIO()
+            imagen.save(salida, format=formato, **opciones)
+    except (OSError, ValueError):
+        return None
+    if tamano_maximo is not None and salida.tell() > tamano_maximo:
+        return None
+    return salida.getvalue()
+
+
+def leer_vista_previa(ruta):
+    """Miniatura de un .rlebits como imagen de Pillow, o None si el archivo no trae una."""
+    vista_previa = leer_cabecera(ruta).vista_previa
+    if vista_previa is None or Image is None:
+        return None
+    imagen = Image.open(io.BytesIO(vista_previa))
+    imagen.load()
+    return imagen
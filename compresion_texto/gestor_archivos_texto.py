@@ -1,5 +1,21 @@
+import math
+import os
 import pickle
+from collections import Counter
+from functools import partial
+from itertools import chain
+
 from compresion_texto import hyffman
+from utils.paralelo import mapear_en_orden, cantidad_procesos
+from utils.bits import iterar_bits
+from utils.huffman_canonico import (codigos_canonicos, DecodificadorTabla,
+                                    empaquetar_bloque, desempaquetar_bloque,
+                                    serializar_longitudes)
+from utils.huffman_bytes import comprimir_bytes, descomprimir_de_bloque, frecuencias_bytes
+from utils.metricas import Metricas, SIN_METRICAS
+from utils.trabajos import sin_progreso, borrar_si_falla
+from utils.contenedor import (EscritorContenedor, LectorContenedor, es_contenedor, exigir_legado,
+                              CODEC_TEXTO_HUFFMAN, CODEC_TEXTO_BYTES)
 
 class NodoHuffman:
     def __init__(self, caracter, frecuencia):
@@ -11,27 +27,219 @@ class NodoHuffman:
     def __lt__(self, otro):
         return self.frecuencia < otro.frecuencia
 
-def comprimir_archivo_txt(ruta_entrada, ruta_salida):
-    with open(ruta_entrada, 'r', encoding='utf-8') as f:
-        texto = f.read()
-
-    texto_codificado, codigos = hyffman.comprimir_texto(texto)
-
-    bits_extra = 8 - len(texto_codificado) % 8
-    texto_codificado += "0" * bits_extra
-
-    bytes_array = bytearray()
-    for i in range(0, len(texto_codificado), 8):
-        byte = texto_codificado[i:i+8]
-        bytes_array.append(int(byte, 2))
-
-   
-    with open(ruta_salida, 'wb') as f:
-        pickle.dump({"bits_extra": bits_extra, "data": bytes_array, "codigos": codigos}, f)
-
+# Bytes de entrada por bloque. Cada bloque tiene su propia tabla de Huffman,
+# así que comprimir y descomprimir usa memoria acotada sin importar el tamaño del archivo.
+TAMANO_BLOQUE = 1 << 20
+
+# Formato por bloques anterior al contenedor: esta cabecera, un dict por
+# bloque y un None final, todos escritos uno detrás de otro con pickle.
+_CABECERA_BLOQUES = {"formato": "bloques", "version": 1}
+
+
+def _corte_utf8(datos):
+    """Posición hasta la que `datos` termina en un carácter UTF-8 completo."""
+    for atras in range(1, min(4, len(datos)) + 1):
+        byte = datos[-atras]
+        if byte & 0xC0 != 0x80:
+            # byte inicial: cuántos bytes ocupa su carácter
+            largo = 1 if byte < 0x80 else 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+            return len(datos) if largo <= atras else len(datos) - atras
+    return len(datos)
+
+
+def leer_bloques_utf8(f, tam_bloque=TAMANO_BLOQUE, inicio=b""):
+    """Lee un archivo binario en bloques que no parten ningún carácter UTF-8.
+    `inicio` son bytes ya leídos de `f` que van antes del resto."""
+    resto = inicio
+    while True:
+        trozo = f.read(tam_bloque)
+        if not trozo:
+            if resto:
+                yield resto
+            return
+        datos = resto + trozo
+        corte = _corte_utf8(datos)
+        resto = datos[corte:]
+        if corte:
+            yield datos[:corte]
+
+
+def comprimir_bloque(datos, max_code_len=hyffman.LONGITUD_MAXIMA):
+    """Comprime un bloque de bytes UTF-8 con su propia tabla.
+
+    Devuelve un dict con el bloque listo para el contenedor ("payload") y
+    datos para el resumen y las métricas; se puede enviar entre procesos.
+    """
+    reloj = Metricas()
+    texto = datos.decode('utf-8')
+    bytes_array, n_bits, longitudes, perdida = hyffman.comprimir_texto(texto, max_code_len, reloj)
+    with reloj.etapa("empaquetado"):
+        # Solo se guardan las longitudes de los códigos canónicos, no el diccionario de códigos
+        payload = empaquetar_bloque(n_bits, hyffman.cabecera_de_longitudes(longitudes), bytes_array)
+    return {"payload": payload, "n_caracteres": len(texto), "n_bytes": len(datos),
+            "n_lineas": datos.count(b"\n"), "perdida": perdida,
+            "n_distintos": len(longitudes), "etapas": reloj.etapas}
+
+
+def descomprimir_bloque(payload):
+    """Inverso de comprimir_bloque -> bytes UTF-8 originales."""
+    n_bits, cabecera, datos = desempaquetar_bloque(payload)
+    tabla = codigos_canonicos(hyffman.longitudes_de_cabecera(cabecera))
+    return descomprimir_con_tabla(datos, n_bits, tabla).encode('utf-8')
+
+
+def comprimir_bloque_bytes(datos, max_code_len=hyffman.LONGITUD_MAXIMA):
+    """Como comprimir_bloque pero sobre los bytes crudos (acepta cualquier contenido)."""
+    reloj = Metricas()
+    bytes_array, n_bits, longitudes, perdida = comprimir_bytes(datos, max_code_len, metricas=reloj)
+    with reloj.etapa("empaquetado"):
+        payload = empaquetar_bloque(n_bits, serializar_longitudes(longitudes), bytes_array)
+    return {"payload": payload, "n_bytes": len(datos),
+            "n_lineas": datos.count(b"\n"), "perdida": perdida,
+            "n_distintos": len(longitudes), "etapas": reloj.etapas}
+
+
+def descomprimir_bloque_bytes(payload):
+    """Inverso de comprimir_bloque_bytes."""
+    return descomprimir_de_bloque(payload)
+
+
+# Modos de compresión: "bytes" codifica los bytes tal cual (256 símbolos, más
+# rápido y exacto para cualquier archivo); "texto" codifica caracteres Unicode
+# y exige UTF-8 válido; "auto" elige por archivo con elegir_modo().
+_MODOS = {
+    "bytes": (CODEC_TEXTO_BYTES, comprimir_bloque_bytes),
+    "texto": (CODEC_TEXTO_HUFFMAN, comprimir_bloque),
+}
+
+_DESCOMPRESORES = {
+    CODEC_TEXTO_BYTES: descomprimir_bloque_bytes,
+    CODEC_TEXTO_HUFFMAN: descomprimir_bloque,
+}
+
+
+# El modo texto es varias veces más lento que el de bytes: solo se elige si
+# se estima al menos esta fracción más chico. En CJK la diferencia ronda el
+# 40 %; en español o en ASCII con algún acento es de un 2 % y no compensa.
+_VENTAJA_MINIMA_TEXTO = 0.15
+
+# Bits por símbolo distinto que agrega la tabla de un bloque en modo texto
+# (punto de código y longitud)
+_BITS_TABLA_TEXTO = 32
+
+
+def _bits_estimados(frecuencias):
+    """Entropía de orden 0 en bits: lo que ocuparía un Huffman ideal."""
+    total = sum(frecuencias)
+    return sum(f * math.log2(total / f) for f in frecuencias if f)
+
+
+def elegir_modo(muestra: bytes) -> str:
+    """Modo de compresión para un archivo a partir de su primer bloque.
+
+    Compara el tamaño estimado con el histograma de bytes y con el de
+    caracteres: "texto" solo si la muestra es UTF-8 y los caracteres ganan
+    por más de _VENTAJA_MINIMA_TEXTO; si no, "bytes"."""
+    muestra = muestra[:_corte_utf8(muestra)]
+    try:
+        texto = muestra.decode("utf-8")
+    except UnicodeDecodeError:
+        return "bytes"
+    if len(texto) == len(muestra):
+        # ASCII: un carácter por byte, los dos modos dan lo mismo
+        return "bytes"
+    caracteres = Counter(texto)
+    bits_texto = _bits_estimados(caracteres.values()) + _BITS_TABLA_TEXTO * len(caracteres)
+    bits_bytes = _bits_estimados(frecuencias_bytes(muestra))
+    return "texto" if bits_texto < (1 - _VENTAJA_MINIMA_TEXTO) * bits_bytes else "bytes"
+
+
+def comprimir_archivo_txt(ruta_entrada, ruta_salida, max_code_len=hyffman.LONGITUD_MAXIMA,
+                          tam_bloque=TAMANO_BLOQUE, n_procesos=1, modo="auto", metricas=SIN_METRICAS,
+                          progreso=sin_progreso):
+    """Comprime por bloques; con n_procesos > 1 (None = todos los núcleos) los
+    bloques se codifican en paralelo y se escriben en orden. `modo` es
+    "bytes", "texto" o "auto": elegir_modo() decide con el primer bloque y,
+    si más adelante aparece UTF-8 inválido, se vuelve a comprimir por bytes.
+
+    Con `metricas` (utils.metricas.Metricas) se registra el tiempo de cada
+    etapa, los bytes de entrada y salida y los símbolos codificados.
+    `progreso(bytes leídos, total)` se llama después de cada bloque; si lanza
+    una excepción (ver utils.trabajos) se borra la salida a medio escribir."""
+    if modo != "auto" and modo not in _MODOS:
+        raise ValueError(f"Modo desconocido: {modo!r} (use auto, {' o '.join(_MODOS)})")
+    metricas.comenzar("comprimir", "texto", archivo=ruta_entrada)
+    comprimir = partial(_comprimir_en_contenedor, ruta_entrada, ruta_salida, max_code_len=max_code_len,
+                        tam_bloque=tam_bloque, n_procesos=n_procesos, metricas=metricas, progreso=progreso)
+    try:
+        r = comprimir(modo)
+    except UnicodeDecodeError:
+        if modo != "auto":
+            raise
+        r = comprimir("bytes")
+
+    metricas.terminar()
+    metricas.contar("bytes_entrada", r["n_bytes"])
+    metricas.contar("bytes_salida", os.path.getsize(ruta_salida))
+    metricas.contar("simbolos", r["n_caracteres"] if r["modo"] == "texto" else r["n_bytes"])
+    metricas.contar("bloques", r["n_bloques"])
     print(f"Archivo comprimido guardado en: {ruta_salida}")
-    print(f"Tamaño original: {len(texto)} caracteres")
-    print(f"Tamaño comprimido: {len(bytes_array)} bytes")
+    if r["modo"] == "texto":
+        print(f"Tamaño original: {r['n_caracteres']} caracteres")
+    else:
+        print(f"Tamaño original: {r['n_bytes']} bytes")
+    print(f"Tamaño comprimido: {r['n_comprimido']} bytes")
+    if r["perdida_maxima"]:
+        print(f"Códigos limitados a {max_code_len} bits: hasta {r['perdida_maxima']:.3%} más grande que sin límite")
+
+
+def _comprimir_en_contenedor(ruta_entrada, ruta_salida, modo, max_code_len, tam_bloque, n_procesos,
+                             metricas, progreso):
+    """Una pasada de lectura y escritura de comprimir_archivo_txt -> dict con los totales."""
+    n_caracteres = 0
+    n_bytes = 0
+    n_comprimido = 0
+    perdida_maxima = 0.0
+    # Índice disperso de líneas: cuántos saltos de línea tiene cada bloque
+    lineas_por_bloque = []
+    total = os.path.getsize(ruta_entrada)
+    progreso(0, total)
+
+    with open(ruta_entrada, 'rb') as entrada:
+        inicio = b""
+        if modo == "auto":
+            # La detección usa el primer bloque de la misma lectura
+            with metricas.etapa("deteccion"):
+                inicio = entrada.read(tam_bloque)
+                modo = elegir_modo(inicio)
+        metricas.etiquetar(modo=modo)
+        codec, comprimir = _MODOS[modo]
+        if modo == "texto":
+            trozos = leer_bloques_utf8(entrada, tam_bloque, inicio)
+        else:
+            trozos = chain([inicio] if inicio else [], iter(partial(entrada.read, tam_bloque), b""))
+        trozos = metricas.iterar("lectura", trozos)
+
+        with borrar_si_falla(ruta_salida), open(ruta_salida, 'wb') as f, \
+                EscritorContenedor(f, codec, {"tam_bloque": tam_bloque}) as contenedor:
+            bloques = mapear_en_orden(partial(comprimir, max_code_len=max_code_len), trozos, n_procesos)
+            for bloque in bloques:
+                metricas.sumar_etapas(bloque["etapas"])
+                metricas.maximo("simbolos_distintos", bloque["n_distintos"])
+                with metricas.etapa("escritura"):
+                    contenedor.agregar_bloque(bloque["payload"], bloque["n_bytes"])
+                n_caracteres += bloque.get("n_caracteres", 0)
+                n_bytes += bloque["n_bytes"]
+                n_comprimido += len(bloque["payload"])
+                perdida_maxima = max(perdida_maxima, bloque["perdida"])
+                lineas_por_bloque.append(bloque["n_lineas"])
+                progreso(n_bytes, total)
+            if modo == "texto":
+                contenedor.meta_final["n_caracteres"] = n_caracteres
+            contenedor.meta_final["lineas_por_bloque"] = lineas_por_bloque
+
+    return {"modo": modo, "n_caracteres": n_caracteres, "n_bytes": n_bytes, "n_comprimido": n_comprimido,
+            "perdida_maxima": perdida_maxima, "n_bloques": len(lineas_por_bloque)}
 
 
 ##Ejemplo uso 
@@ -42,25 +250,148 @@ def comprimir_archivo_txt(ruta_entrada, ruta_salida):
 
 # Descompresión de texto.
 
-def descomprimir_archivo_txt(ruta_entrada, ruta_salida):
-    with open(ruta_entrada, 'rb') as f:
+def descomprimir_archivo_txt(ruta_entrada, ruta_salida, n_procesos=1, metricas=SIN_METRICAS,
+                             progreso=sin_progreso, legado=True):
+    """`progreso(bytes escritos, total)` se llama después de cada bloque.
+    Con legado=False se rechazan los formatos anteriores guardados con pickle."""
+    metricas.comenzar("descomprimir", "texto", archivo=ruta_entrada)
+    if es_contenedor(ruta_entrada):
+        with _abrir_texto(ruta_entrada) as contenedor, borrar_si_falla(ruta_salida), \
+                open(ruta_salida, 'wb') as salida:
+            hechos = 0
+            progreso(hechos, contenedor.tamano_original)
+            bloques = metricas.iterar("lectura", contenedor.iterar_bloques())
+            if cantidad_procesos(n_procesos) > 1:
+                # las memoryview del mmap no viajan entre procesos
+                bloques = map(bytes, bloques)
+            descomprimir = _DESCOMPRESORES[contenedor.codec]
+            # Con varios procesos, "decodificacion" es lo que se esperó a los procesos
+            partes = mapear_en_orden(descomprimir, bloques, n_procesos)
+            for datos in metricas.iterar("decodificacion", partes):
+                with metricas.etapa("escritura"):
+                    salida.write(datos)
+                hechos += len(datos)
+                progreso(hechos, contenedor.tamano_original)
+            metricas.contar("bloques", len(contenedor.bloques))
+    else:
+        exigir_legado(ruta_entrada, legado)
+        progreso(0, 1)
+        with metricas.etapa("decodificacion"):
+            _descomprimir_pickle(ruta_entrada, ruta_salida)
+        progreso(1, 1)
+    metricas.terminar()
+    metricas.contar("bytes_entrada", os.path.getsize(ruta_entrada))
+    metricas.contar("bytes_salida", os.path.getsize(ruta_salida))
+
+    print(f"Archivo descomprimido guardado en: {ruta_salida}")
+
+def _descomprimir_pickle(ruta_entrada, ruta_salida):
+    # Archivos de versiones anteriores guardados con pickle
+    with open(ruta_entrada, 'rb') as f, open(ruta_salida, 'wb') as salida:
         data = pickle.load(f)
+        if data == _CABECERA_BLOQUES:
+            while True:
+                bloque = pickle.load(f)
+                if bloque is None:
+                    break
+                tabla = codigos_canonicos(hyffman.longitudes_de_cabecera(bloque["longitudes"]))
+                salida.write(descomprimir_con_tabla(bloque["data"], bloque["n_bits"], tabla).encode('utf-8'))
+        else:
+            salida.write(_descomprimir_formato_unico(data).encode('utf-8'))
 
+def _descomprimir_formato_unico(data):
+    # Un solo dict con todo el texto
     bits_extra = data["bits_extra"]
     bytes_array = data["data"]
-    codigos = data["codigos"]
-
-    texto_codificado = ''.join(f'{byte:08b}' for byte in bytes_array)
-    texto_codificado = texto_codificado[:-bits_extra] if bits_extra > 0 else texto_codificado
-
-    texto_descomprimido = descomprimir_con_arbol(texto_codificado, codigos)
-
-    with open(ruta_salida, 'w', encoding='utf-8') as f:
-        f.write(texto_descomprimido)
-
-    print(f"Archivo descomprimido guardado en: {ruta_salida}")
-
-def descomprimir_con_arbol(texto_codificado, codigos):
+    if "longitudes" in data:
+        longitudes = hyffman.longitudes_de_cabecera(data["longitudes"])
+        tabla = codigos_canonicos(longitudes)
+    else:
+        # Formato anterior: diccionario de códigos completo
+        tabla = {caracter: (int(codigo, 2), len(codigo)) for caracter, codigo in data["codigos"].items()}
+
+    n_bits = len(bytes_array) * 8 - bits_extra
+    return descomprimir_con_tabla(bytes_array, n_bits, tabla)
+
+# Extracción parcial: solo se decodifican los bloques que tocan el rango pedido.
+
+def _abrir_texto(ruta_entrada):
+    contenedor = LectorContenedor(ruta_entrada)
+    if contenedor.codec not in _DESCOMPRESORES:
+        contenedor.cerrar()
+        raise ValueError("El archivo no es un texto comprimido con Huffman")
+    return contenedor
+
+
+def extraer_rango_bytes(ruta_entrada, inicio, fin=None):
+    """Bytes [inicio, fin) del texto original sin descomprimir todo el archivo."""
+    with _abrir_texto(ruta_entrada) as contenedor:
+        if fin is None or fin > contenedor.tamano_original:
+            fin = contenedor.tamano_original
+        descomprimir = _DESCOMPRESORES[contenedor.codec]
+        partes = []
+        posicion = 0
+        for i, entrada in enumerate(contenedor.bloques):
+            siguiente = posicion + entrada.largo_original
+            if siguiente > inicio and posicion < fin:
+                datos = descomprimir(contenedor.bloque(i))
+                partes.append(datos[max(inicio - posicion, 0):fin - posicion])
+            if siguiente >= fin:
+                break
+            posicion = siguiente
+        return b"".join(partes)
+
+
+def _despues_de_salto(datos, n):
+    """Posición siguiente al n-ésimo salto de línea de `datos` (len si hay menos)."""
+    posicion = 0
+    for _ in range(n):
+        posicion = datos.find(b"\n", posicion) + 1
+        if posicion == 0:
+            return len(datos)
+    return posicion
+
+
+def extraer_lineas(ruta_entrada, primera, ultima=None):
+    """Líneas primera..ultima (desde 1, inclusive) del texto original.
+
+    Con el índice de líneas por bloque se salta directo al bloque donde
+    empieza la primera línea y se para al terminar la última.
+    """
+    if primera < 1:
+        raise ValueError("Las líneas se numeran desde 1")
+    with _abrir_texto(ruta_entrada) as contenedor:
+        n_bloques = len(contenedor.bloques)
+        descomprimir = _DESCOMPRESORES[contenedor.codec]
+        # Archivos sin índice de líneas: se cuentan decodificando desde el principio
+        conteos = contenedor.meta_final.get("lineas_por_bloque")
+
+        # Saltos de línea antes del bloque inicial
+        antes = 0
+        i = 0
+        while conteos is not None and i < n_bloques and antes + conteos[i] < primera - 1:
+            antes += conteos[i]
+            i += 1
+
+        partes = []
+        saltos = antes
+        while i < n_bloques and (ultima is None or saltos < ultima):
+            datos = descomprimir(contenedor.bloque(i))
+            partes.append(datos)
+            saltos += datos.count(b"\n")
+            i += 1
+
+    texto = b"".join(partes)
+    inicio = _despues_de_salto(texto, primera - 1 - antes)
+    fin = len(texto) if ultima is None else _despues_de_salto(texto, ultima - antes)
+    return texto[inicio:fin]
+
+
+def descomprimir_con_tabla(datos, n_bits, tabla):
+    """Decodifica varios bits por búsqueda; tabla es {caracter: (codigo, longitud)}."""
+    return ''.join(DecodificadorTabla(tabla, unir=''.join).decodificar(datos, n_bits))
+
+def descomprimir_con_arbol(datos, n_bits, codigos):
     raiz = NodoHuffman(None, 0)
     for caracter, codigo in codigos.items():
         nodo_actual = raiz
@@ -77,16 +408,16 @@ def descomprimir_con_arbol(texto_codificado, codigos):
 
     resultado = []
     nodo_actual = raiz
-    for bit in texto_codificado:
-        if bit == '0':
-            nodo_actual = nodo_actual.izq
-        else:
+    for bit in iterar_bits(datos, n_bits):
+        if bit:
             nodo_actual = nodo_actual.der
-        
+        else:
+            nodo_actual = nodo_actual.izq
+
         if nodo_actual.caracter is not None:
             resultado.append(nodo_actual.caracter)
             nodo_actual = raiz
-    
+
     return ''.join(resultado)
 
 
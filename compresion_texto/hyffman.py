@@ -2,6 +2,12 @@ import heapq
 from collections import Counter
 import pickle
 
+from utils.bits import EscritorBits
+from utils.huffman_canonico import (codigos_canonicos, serializar_longitudes,
+                                    deserializar_longitudes, limitar_longitudes,
+                                    LONGITUD_MAXIMA)
+from utils.metricas import SIN_METRICAS
+
 class NodoHuffman:
     def __init__(self, caracter, frecuencia):
         self.caracter = caracter
@@ -37,7 +43,8 @@ def generar_codigos(nodo, codigo_actual="", codigos=None):
         return codigos
 
     if nodo.caracter is not None:
-        codigos[nodo.caracter] = codigo_actual
+        # Un texto con un solo carácter distinto necesita al menos un bit por símbolo
+        codigos[nodo.caracter] = codigo_actual or "0"
         return codigos
 
     generar_codigos(nodo.izq, codigo_actual + "0", codigos)
@@ -45,8 +52,43 @@ def generar_codigos(nodo, codigo_actual="", codigos=None):
     return codigos
 
 
-def comprimir_texto(texto):
+def generar_longitudes(texto, max_code_len=None):
+    """Longitud del código de Huffman de cada carácter -> (longitudes, pérdida).
+
+    Con `max_code_len` ningún código supera esa longitud (package-merge); la
+    pérdida es la fracción de bits de más frente al árbol sin límite.
+    `texto` puede ser el texto o un Counter con sus frecuencias ya contadas.
+    """
     arbol = construir_arbol(texto)
-    codigos = generar_codigos(arbol)
-    texto_codificado = ''.join(codigos[char] for char in texto)
-    return texto_codificado, codigos
+    longitudes = {char: len(codigo) for char, codigo in generar_codigos(arbol).items()}
+    if max_code_len is None:
+        return longitudes, 0.0
+    return limitar_longitudes(Counter(texto), longitudes, max_code_len)
+
+
+def cabecera_de_longitudes(longitudes):
+    """Serializa {caracter: longitud} usando el punto de código de cada carácter."""
+    return serializar_longitudes({ord(char): longitud for char, longitud in longitudes.items()})
+
+
+def longitudes_de_cabecera(cabecera):
+    longitudes, _ = deserializar_longitudes(cabecera)
+    return {chr(punto): longitud for punto, longitud in longitudes.items()}
+
+
+def comprimir_texto(texto, max_code_len=LONGITUD_MAXIMA, metricas=SIN_METRICAS):
+    """Devuelve (bytes empaquetados, bits válidos, longitudes, pérdida por el límite).
+
+    Los códigos son canónicos, así que `longitudes` alcanza para decodificar.
+    """
+    with metricas.etapa("frecuencias"):
+        frecuencias = Counter(texto)
+    with metricas.etapa("arbol"):
+        longitudes, perdida = generar_longitudes(frecuencias, max_code_len)
+        tabla = codigos_canonicos(longitudes)
+
+    with metricas.etapa("codificacion"):
+        escritor = EscritorBits()
+        escritor.escribir_simbolos(texto, tabla)
+        datos = escritor.cerrar()
+    return datos, escritor.total_bits, longitudes, perdida
@@ -2,6 +2,9 @@ import os
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
 from compresion_imagen import rle_imagen
+from compresion_imagen.vista_previa import leer_vista_previa
+from utils.metricas import Metricas
+from utils.trabajos import cola_con_avance, CANCELADO, ERROR
 
 def create_imagen_frame(parent, show_frame_callback):
     frame = ctk.CTkFrame(parent)
@@ -63,6 +66,10 @@ def create_imagen_frame(parent, show_frame_callback):
                               text_color="#C9D6E3", font=ctk.CTkFont(size=13))
     label_ruta.pack(pady=10)
 
+    # Miniatura guardada en el .rlebits (se lee sin descomprimir)
+    label_vista_previa = ctk.CTkLabel(frame, text="")
+    label_vista_previa.pack()
+
     # Tamaños
     frame_tamaños = ctk.CTkFrame(frame, fg_color="#1B2A41", corner_radius=12)
     frame_tamaños.pack(pady=15, padx=20, fill="x")
@@ -80,6 +87,27 @@ def create_imagen_frame(parent, show_frame_callback):
                                 text_color="#98C1D9", font=ctk.CTkFont(size=13))
     estado_label.pack(pady=15)
 
+    # Métricas de la última operación (tiempo por etapa, bytes, píxeles)
+    label_metricas = ctk.CTkLabel(frame, text="", justify="left",
+                                  text_color="#C9D6E3", font=ctk.CTkFont(size=12))
+    label_metricas.pack(pady=(0, 15))
+
+    # Avance del trabajo en segundo plano
+    frame_progreso = ctk.CTkFrame(frame, fg_color="transparent")
+    frame_progreso.pack(pady=(0, 5), padx=20, fill="x")
+
+    barra_progreso = ctk.CTkProgressBar(frame_progreso)
+    barra_progreso.set(0)
+    barra_progreso.pack(side="left", padx=10, fill="x", expand=True)
+
+    btn_cancelar = ctk.CTkButton(frame_progreso, text="✖ Cancelar", width=120, state="disabled")
+    btn_cancelar.pack(side="right", padx=10)
+
+    label_progreso = ctk.CTkLabel(frame, text="", text_color="#C9D6E3", font=ctk.CTkFont(size=12))
+    label_progreso.pack(pady=(0, 15))
+
+    cola = cola_con_avance(frame, barra_progreso.set, label_progreso, btn_cancelar)
+
     # ==== Funciones internas ====
     def cargar_archivo():
         ruta = filedialog.askopenfilename(
@@ -93,17 +121,31 @@ def create_imagen_frame(parent, show_frame_callback):
             nombre = os.path.basename(ruta)
             ext = os.path.splitext(nombre)[1].lower()
             label_ruta.configure(text=f"Archivo seleccionado: {nombre}")
+            label_vista_previa.configure(image=None, text="")
+            label_metricas.configure(text="")
             tamaño_original.set("Tamaño original: ---")
             tamaño_comprimido.set("Tamaño comprimido: ---")
             if ext in [".png", ".jpg"]:
                 estado.set("Imagen cargada correctamente. Lista para comprimir.")
             elif ext == ".rlebits":
                 estado.set("Archivo RLE cargado correctamente. Listo para descomprimir.")
+                mostrar_vista_previa(ruta)
             else:
                 estado.set("Formato no compatible.")
         else:
             estado.set("No se seleccionó ningún archivo.")
 
+    def mostrar_vista_previa(ruta):
+        try:
+            miniatura = leer_vista_previa(ruta)
+        except Exception:
+            miniatura = None
+        if miniatura is None:
+            label_vista_previa.configure(image=None, text="(sin vista previa)")
+            return
+        imagen = ctk.CTkImage(light_image=miniatura, dark_image=miniatura, size=miniatura.size)
+        label_vista_previa.configure(image=imagen, text="")
+
     def comprimir():
         if not ruta_archivo.get():
             messagebox.showwarning("Atención", "Primero selecciona una imagen PNG o JPG.")
@@ -111,15 +153,28 @@ def create_imagen_frame(parent, show_frame_callback):
         if not ruta_archivo.get().lower().endswith((".png", ".jpg")):
             messagebox.showwarning("Atención", "Solo se pueden comprimir imágenes PNG o JPG.")
             return
-        try:
-            archivo_salida = rle_imagen.comprimir_a_rlebits(ruta_archivo.get())
-            tamaño_o = os.path.getsize(ruta_archivo.get())
-            tamaño_c = os.path.getsize(archivo_salida)
-            tamaño_original.set(f"Tamaño original: {tamaño_o} bytes ({tamaño_o*8} bits)")
-            tamaño_comprimido.set(f"Tamaño comprimido: {tamaño_c} bytes ({tamaño_c*8} bits)")
-            estado.set(f"Ahorro: {tamaño_o - tamaño_c} bytes ({(tamaño_o - tamaño_c)*8} bits)")
-        except Exception as e:
-            messagebox.showerror("Error", f"Ocurrió un error al comprimir:\n{e}")
+        ruta = ruta_archivo.get()
+        metricas = Metricas()
+        estado.set("⏳ Compresión en cola...")
+        cola.agregar(os.path.basename(ruta), rle_imagen.comprimir_a_rlebits, ruta, metricas=metricas,
+                     al_terminar=lambda trabajo: compresion_terminada(trabajo, ruta, metricas))
+
+    def compresion_terminada(trabajo, ruta, metricas):
+        if trabajo.estado == CANCELADO:
+            estado.set("⛔ Compresión cancelada.")
+            return
+        if trabajo.estado == ERROR:
+            estado.set("❌ Error al comprimir.")
+            messagebox.showerror("Error", f"Ocurrió un error al comprimir:\n{trabajo.error}")
+            return
+        archivo_salida = trabajo.resultado
+        metricas.exportar_jsonl()
+        label_metricas.configure(text=metricas.resumen())
+        tamaño_o = os.path.getsize(ruta)
+        tamaño_c = os.path.getsize(archivo_salida)
+        tamaño_original.set(f"Tamaño original: {tamaño_o} bytes ({tamaño_o*8} bits)")
+        tamaño_comprimido.set(f"Tamaño comprimido: {tamaño_c} bytes ({tamaño_c*8} bits)")
+        estado.set(f"Ahorro: {tamaño_o - tamaño_c} bytes ({(tamaño_o - tamaño_c)*8} bits)")
 
     def descomprimir():
         if not ruta_archivo.get():
@@ -128,12 +183,24 @@ def create_imagen_frame(parent, show_frame_callback):
         if not ruta_archivo.get().lower().endswith(".rlebits"):
             messagebox.showwarning("Atención", "Solo se pueden descomprimir archivos .rlebits.")
             return
-        try:
-            archivo_salida = rle_imagen.descomprimir_rlebits(ruta_archivo.get())
-            estado.set(f"✅ Archivo descomprimido correctamente.\nGuardado en:\n{archivo_salida}")
-            tamaño_original.set("Tamaño original: ---")
-            tamaño_comprimido.set("Tamaño comprimido: ---")
-        except Exception as e:
-            messagebox.showerror("Error", f"Ocurrió un error al descomprimir:\n{e}")
+        ruta = ruta_archivo.get()
+        metricas = Metricas()
+        estado.set("⏳ Descompresión en cola...")
+        cola.agregar(os.path.basename(ruta), rle_imagen.descomprimir_rlebits, ruta, metricas=metricas,
+                     al_terminar=lambda trabajo: descompresion_terminada(trabajo, metricas))
+
+    def descompresion_terminada(trabajo, metricas):
+        if trabajo.estado == CANCELADO:
+            estado.set("⛔ Descompresión cancelada.")
+            return
+        if trabajo.estado == ERROR:
+            estado.set("❌ Error al descomprimir.")
+            messagebox.showerror("Error", f"Ocurrió un error al descomprimir:\n{trabajo.error}")
+            return
+        metricas.exportar_jsonl()
+        label_metricas.configure(text=metricas.resumen())
+        estado.set(f"✅ Archivo descomprimido correctamente.\nGuardado en:\n{trabajo.resultado}")
+        tamaño_original.set("Tamaño original: ---")
+        tamaño_comprimido.set("Tamaño comprimido: ---")
 
     return frame
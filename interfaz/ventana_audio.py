@@ -1,6 +1,9 @@
 import os
 import platform
 import tempfile
+import threading
+import time
+import wave
 import tkinter as tk
 from tkinter import ttk, filedialog as fd, messagebox as mb
 
@@ -26,6 +29,10 @@ except ModuleNotFoundError:
     if CompresionAudio is None:
         raise ModuleNotFoundError("No se encontró compresion_audio/huffman_audio.py")
 
+from utils.buffer_circular import BufferCircular
+from utils.metricas import Metricas
+from utils.trabajos import cola_con_avance, CANCELADO, ERROR
+
 try:
     import simpleaudio as sa
 except Exception:
@@ -40,10 +47,47 @@ if USE_WINSOUND:
         USE_WINSOUND = False
 
 
+def _pcm_de_wav(ruta: str, inicio: int = 0, tam: int = 4096):
+    """PCM de un WAV desde la muestra `inicio`, de a `tam` muestras por canal."""
+    with wave.open(ruta, "rb") as wav:
+        wav.setpos(min(inicio, wav.getnframes()))
+        while True:
+            pcm = wav.readframes(tam)
+            if not pcm:
+                return
+            yield pcm
+
+
 class ReproductorAudio:
+    """Con simpleaudio reproduce en streaming: un hilo decodifica (o lee el WAV)
+    hacia un buffer circular y otro lo va reproduciendo de a trozos, así el
+    sonido arranca con la primera trama y pausar/reanudar sigue donde quedó.
+    simpleaudio no tiene salida continua: cada trozo es un play_buffer aparte
+    y se manda a la hora en que termina el anterior (ver _consumir).
+    Sin simpleaudio usa winsound, que solo reproduce archivos WAV enteros."""
+
+    SEGUNDOS_BUFFER = 2.0
+    SEGUNDOS_TROZO = 0.5
+    # Atraso (en segundos) hasta el que un trozo sigue pegado al anterior
+    TOLERANCIA = 0.02
+
     def __init__(self):
-        self.play_obj = None
+        # Trozos mandados a simpleaudio que pueden seguir sonando; el candado
+        # hace que parar y mandar un trozo nuevo no se crucen (ver _parar_hilos)
+        self._sonando = []
+        self._candado = threading.Lock()
         self._aviso_pausa = False
+        # (función inicio -> iterador de PCM, parámetros WAV) de lo último que se reprodujo
+        self._fuente = None
+        self._posicion = 0
+        self._inicio_trozo = (0, 0.0)
+        self._detener = threading.Event()
+        self._buffer = None
+        self._hilos = []
+
+    @property
+    def reproduciendo(self) -> bool:
+        return any(hilo.is_alive() for hilo in self._hilos)
 
     def reproducir_wav(self, ruta: str):
         if not os.path.exists(ruta):
@@ -52,35 +96,148 @@ class ReproductorAudio:
             raise ValueError("Solo se permiten archivos WAV")
         self.detener()
         if sa is not None:
-            wave_obj = sa.WaveObject.from_wave_file(ruta)
-            self.play_obj = wave_obj.play()
+            with wave.open(ruta, "rb") as wav:
+                params = {"nchannels": wav.getnchannels(), "sampwidth": wav.getsampwidth(),
+                          "framerate": wav.getframerate()}
+            self._fuente = (lambda inicio: _pcm_de_wav(ruta, inicio), params)
+            self._iniciar()
         elif USE_WINSOUND and winsound is not None:
             winsound.PlaySound(ruta, winsound.SND_FILENAME | winsound.SND_ASYNC)
         else:
             raise RuntimeError("Instala simpleaudio para reproducir audio")
 
-    def pausar(self):
-        if not self._aviso_pausa:
-            mb.showinfo("Pausa", "Pausar reinicia el audio al reanudar.")
-            self._aviso_pausa = True
+    def reproducir_comprimido(self, ruta: str):
+        """Reproduce un .flac decodificándolo de a una trama, sin escribir un WAV."""
+        if not os.path.exists(ruta):
+            raise FileNotFoundError("No se encontró el archivo")
         self.detener()
+        comp = CompresionAudio(ruta)
+        if sa is None:
+            # winsound necesita un archivo: se descomprime entero a un WAV temporal
+            destino = os.path.join(tempfile.gettempdir(), "datazip_reproduccion.wav")
+            if os.path.exists(destino):
+                os.remove(destino)
+            self.reproducir_wav(comp.extraerArchivo(ruta, destino))
+            return
+        self._fuente = (lambda inicio: comp.iterar_pcm(ruta, inicio), comp.parametros_comprimido(ruta))
+        self._iniciar()
 
-    def reanudar(self, ruta: str):
-        self.reproducir_wav(ruta)
+    def pausar(self):
+        if sa is None or self._fuente is None:
+            if not self._aviso_pausa:
+                mb.showinfo("Pausa", "Pausar reinicia el audio al reanudar.")
+                self._aviso_pausa = True
+            self.detener()
+            return
+        if self.reproduciendo:
+            # Posición aproximada dentro del trozo que estaba sonando
+            muestra, momento = self._inicio_trozo
+            transcurrido = int((time.monotonic() - momento) * self._fuente[1]["framerate"])
+            self._parar_hilos()
+            self._posicion = muestra + max(transcurrido, 0)
+
+    def reanudar(self, ruta: str = None):
+        if sa is not None and self._fuente is not None:
+            if not self.reproduciendo:
+                self._iniciar()
+        elif ruta:
+            self.reproducir_wav(ruta)
 
     def detener(self):
-        if sa is not None and self.play_obj is not None:
+        self._parar_hilos()
+        self._fuente = None
+        self._posicion = 0
+        if USE_WINSOUND and winsound is not None:
             try:
-                self.play_obj.stop()
+                winsound.PlaySound(None, 0)
             except Exception:
                 pass
-            self.play_obj = None
-        if USE_WINSOUND and winsound is not None:
+
+    def _iniciar(self):
+        abrir, params = self._fuente
+        bytes_por_muestra = params["sampwidth"] * params["nchannels"]
+        self._detener = threading.Event()
+        self._buffer = BufferCircular(int(self.SEGUNDOS_BUFFER * params["framerate"]) * bytes_por_muestra)
+        self._hilos = [
+            threading.Thread(target=self._producir, args=(abrir(self._posicion), self._buffer, self._detener),
+                             daemon=True),
+            threading.Thread(target=self._consumir, args=(params, self._buffer, self._detener), daemon=True),
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def _parar_hilos(self):
+        # Con el candado tomado _consumir no puede estar entre revisar
+        # detener y play_buffer, así que después de esto no sale otro trozo
+        with self._candado:
+            self._detener.set()
+        if self._buffer is not None:
+            self._buffer.cerrar()
+        self._callar()
+        for hilo in self._hilos:
+            hilo.join(timeout=2)
+        self._hilos = []
+        # Por si un hilo no terminó a tiempo y dejó algo sonando
+        self._callar()
+
+    def _callar(self):
+        with self._candado:
+            sonando, self._sonando = self._sonando, []
+        for play_obj in sonando:
             try:
-                winsound.PlaySound(None, 0)
+                play_obj.stop()
             except Exception:
                 pass
 
+    @staticmethod
+    def _producir(partes, buffer, detener):
+        try:
+            for parte in partes:
+                if detener.is_set() or not buffer.escribir(parte):
+                    break
+        finally:
+            partes.close()
+            buffer.cerrar()
+
+    def _consumir(self, params, buffer, detener):
+        bytes_por_muestra = params["sampwidth"] * params["nchannels"]
+        maximo = int(self.SEGUNDOS_TROZO * params["framerate"]) * bytes_por_muestra
+        resto = b""
+        # Cada trozo se manda a la hora en que termina el anterior, contada
+        # desde que se mandó ese y no con wait_done(): así el arranque del
+        # dispositivo (parecido en todos los trozos) no deja un hueco entre
+        # trozos, y el siguiente ya está leído cuando llega su momento
+        siguiente = None
+        while not detener.is_set():
+            trozo = resto + buffer.leer(maximo - len(resto))
+            if len(trozo) == len(resto):
+                break
+            # Solo muestras completas; lo que sobra va al principio del próximo trozo
+            corte = len(trozo) - len(trozo) % bytes_por_muestra
+            trozo, resto = trozo[:corte], trozo[corte:]
+            if not trozo:
+                continue
+            if siguiente is not None and detener.wait(max(siguiente - time.monotonic(), 0)):
+                return
+            ahora = time.monotonic()
+            # Si el decodificador se atrasó, el trozo sale tarde y el reloj se reinicia
+            inicio = siguiente if siguiente is not None and ahora - siguiente < self.TOLERANCIA else ahora
+            with self._candado:
+                if detener.is_set():
+                    return
+                self._inicio_trozo = (self._posicion, inicio)
+                self._sonando = [p for p in self._sonando if p.is_playing()]
+                self._sonando.append(sa.play_buffer(trozo, params["nchannels"], params["sampwidth"],
+                                                    params["framerate"]))
+            muestras = len(trozo) // bytes_por_muestra
+            siguiente = inicio + muestras / params["framerate"]
+            self._posicion += muestras
+        if siguiente is not None and detener.wait(max(siguiente - time.monotonic(), 0)):
+            return
+        if not detener.is_set():
+            # Terminó: reanudar vuelve a empezar desde el principio
+            self._posicion = 0
+
 def create_audio_frame(parent, show_frame_callback):
     frame = ttk.Frame(parent)
     
@@ -128,6 +285,7 @@ def create_audio_frame(parent, show_frame_callback):
     ttk.Button(botones, text="Comprimir WAV → FLAC", command=lambda: comprimir()).pack(side="left", padx=6)
     ttk.Button(botones, text="Descomprimir FLAC → WAV", command=lambda: descomprimir()).pack(side="left", padx=6)
     ttk.Button(botones, text="▶ Reproducir WAV", command=lambda: reproducir_wav()).pack(side="left", padx=6)
+    ttk.Button(botones, text="▶ Reproducir FLAC", command=lambda: reproducir_flac()).pack(side="left", padx=6)
     ttk.Button(botones, text="⏸ Pausar", command=lambda: rep.pausar()).pack(side="left", padx=6)
     ttk.Button(botones, text="🔁 Reanudar", command=lambda: rep.reanudar(ruta_wav.get())).pack(side="left", padx=6)
 
@@ -142,6 +300,22 @@ def create_audio_frame(parent, show_frame_callback):
     estado = ttk.Label(frame, text="Listo.", foreground="#499ac5")
     estado.pack(anchor="w", padx=20, pady=(0, 10))
 
+    # Métricas de la última compresión o descompresión
+    metricas_label = ttk.Label(frame, text="", justify="left")
+    metricas_label.pack(anchor="w", padx=20, pady=(0, 10))
+
+    # Avance del trabajo en segundo plano
+    fila_progreso = ttk.Frame(frame)
+    fila_progreso.pack(fill="x", padx=20, pady=(0, 10))
+    barra_progreso = ttk.Progressbar(fila_progreso, mode="determinate", maximum=1.0)
+    barra_progreso.pack(side="left", fill="x", expand=True)
+    btn_cancelar = ttk.Button(fila_progreso, text="✖ Cancelar", state="disabled")
+    btn_cancelar.pack(side="left", padx=6)
+    progreso_label = ttk.Label(frame, text="")
+    progreso_label.pack(anchor="w", padx=20, pady=(0, 10))
+    cola = cola_con_avance(frame, lambda fraccion: barra_progreso.configure(value=fraccion),
+                           progreso_label, btn_cancelar)
+
     # === Funciones internas ===
     def set_estado(msg):
         estado.config(text=msg)
@@ -177,32 +351,62 @@ def create_audio_frame(parent, show_frame_callback):
         except Exception as e:
             mb.showerror("Error", str(e))
 
-    def comprimir():
-        if not ruta_wav.get():
-            mb.showwarning("Sin archivo", "Selecciona un WAV para comprimir.")
+    def reproducir_flac():
+        if not ruta_flac.get():
+            mb.showwarning("Sin archivo", "Selecciona un archivo FLAC primero.")
             return
         try:
-            comp = CompresionAudio(ruta_wav.get())
-            res = comp.comprimir()
-            ruta_flac.set(res["flac"])
-            mb.showinfo("Éxito", "Archivo comprimido correctamente.")
-            set_estado("Compresión completada.")
+            rep.reproducir_comprimido(ruta_flac.get())
+            set_estado(f"Reproduciendo: {os.path.basename(ruta_flac.get())}")
         except Exception as e:
             mb.showerror("Error", str(e))
+
+    def comprimir():
+        if not ruta_wav.get():
+            mb.showwarning("Sin archivo", "Selecciona un WAV para comprimir.")
+            return
+        comp = CompresionAudio(ruta_wav.get())
+        metricas = Metricas()
+        set_estado("Compresión en cola...")
+        cola.agregar(os.path.basename(ruta_wav.get()), comp.comprimir, metricas=metricas,
+                     al_terminar=lambda trabajo: compresion_terminada(trabajo, metricas))
+
+    def compresion_terminada(trabajo, metricas):
+        if trabajo.estado == CANCELADO:
+            set_estado("Compresión cancelada.")
+            return
+        if trabajo.estado == ERROR:
+            mb.showerror("Error", str(trabajo.error))
             set_estado("Error durante compresión.")
+            return
+        metricas.exportar_jsonl()
+        metricas_label.config(text=metricas.resumen())
+        ruta_flac.set(trabajo.resultado["flac"])
+        mb.showinfo("Éxito", "Archivo comprimido correctamente.")
+        set_estado("Compresión completada.")
 
     def descomprimir():
         if not ruta_flac.get():
             mb.showwarning("Sin archivo", "Selecciona un FLAC para descomprimir.")
             return
-        try:
-            comp = CompresionAudio("dummy.wav")
-            comp.extraerArchivo(ruta_flac.get())
-            mb.showinfo("Éxito", "Archivo descomprimido correctamente.")
-            set_estado("Descompresión completada.")
-        except Exception as e:
-            mb.showerror("Error", str(e))
+        comp = CompresionAudio("dummy.wav")
+        metricas = Metricas()
+        set_estado("Descompresión en cola...")
+        cola.agregar(os.path.basename(ruta_flac.get()), comp.extraerArchivo, ruta_flac.get(),
+                     metricas=metricas, al_terminar=lambda trabajo: descompresion_terminada(trabajo, metricas))
+
+    def descompresion_terminada(trabajo, metricas):
+        if trabajo.estado == CANCELADO:
+            set_estado("Descompresión cancelada.")
+            return
+        if trabajo.estado == ERROR:
+            mb.showerror("Error", str(trabajo.error))
             set_estado("Error durante descompresión.")
+            return
+        metricas.exportar_jsonl()
+        metricas_label.config(text=metricas.resumen())
+        mb.showinfo("Éxito", "Archivo descomprimido correctamente.")
+        set_estado("Descompresión completada.")
 
     return frame
 
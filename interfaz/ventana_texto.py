@@ -2,7 +2,6 @@ import customtkinter as ctk
 from PIL import Image
 import os
 from tkinter import filedialog, messagebox
-import time
 import sys
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -17,6 +16,8 @@ print("📦 Paths configurados:")
 try:
     from compresion_texto import gestor_archivos_texto
     from compresion_texto import hyffman
+    from utils.metricas import Metricas
+    from utils.trabajos import cola_con_avance, CANCELADO, ERROR
     LOGICA_DISPONIBLE = True
     print("✅ Módulos importados correctamente")
     
@@ -154,140 +155,138 @@ def create_text_compression_frame(main_container, show_frame_callback):
     def decompress_file():
         file_path = selected_file_path.get()
         if file_path and os.path.exists(file_path):
-            try:
-                # Verificar que sea un archivo .bin
-                if not file_path.lower().endswith('.bin'):
-                    messagebox.showwarning("Advertencia", "Por favor seleccione un archivo .bin comprimido")
-                    return
-
-                # Seleccionar donde guardar el archivo descomprimido
-                output_path = filedialog.asksaveasfilename(
-                    title="Guardar archivo descomprimido como...",
-                    defaultextension=".txt",
-                    filetypes=[("Archivos de texto", "*.txt"), ("Todos los archivos", "*.*")]
-                )
-
-                if output_path:
-                    # Mostrar progreso
-                    result_text.delete("1.0", "end")
-                    result_text.insert("1.0", "⏳ Descomprimiendo archivo...\n")
-                    frame.update()
-
-                    start_time = time.time()
-
-                    # Usar tu lógica real de descompresión
-                    gestor_archivos_texto.descomprimir_archivo_txt(file_path, output_path)
-
-                    end_time = time.time()
-                    decompression_time = end_time - start_time
+            # Verificar que sea un archivo .bin
+            if not file_path.lower().endswith('.bin'):
+                messagebox.showwarning("Advertencia", "Por favor seleccione un archivo .bin comprimido")
+                return
 
-                    # Calcular información del archivo resultante
-                    if os.path.exists(output_path):
-                        decompressed_size = os.path.getsize(output_path) / 1024
-                        compressed_size_bytes = os.path.getsize(file_path)
-                        decompressed_size_bytes = os.path.getsize(output_path)
-
-                        result_text.delete("1.0", "end")
-                        result_text.insert("1.0", 
-                            f"✅ Descompresión completada\n\n"
-                            f"• Archivo comprimido: {os.path.basename(file_path)}\n"
-                            f"• Tamaño comprimido: {compressed_size_bytes / 1024:.2f} KB\n"
-                            f"• Archivo descomprimido: {os.path.basename(output_path)}\n"
-                            f"• Tamaño descomprimido: {decompressed_size:.2f} KB\n"
-                            f"• Tiempo de descompresión: {decompression_time:.2f} segundos\n\n"
-                            f"💡 Archivo guardado en:\n{output_path}"
-                        )
-                    else:
-                        result_text.insert("1.0", 
-                            f"✅ Descompresión completada\n"
-                            f"• Tiempo: {decompression_time:.2f} segundos\n"
-                            f"• Archivo guardado en: {output_path}"
-                        )
+            # Seleccionar donde guardar el archivo descomprimido
+            output_path = filedialog.asksaveasfilename(
+                title="Guardar archivo descomprimido como...",
+                defaultextension=".txt",
+                filetypes=[("Archivos de texto", "*.txt"), ("Todos los archivos", "*.*")]
+            )
 
-            except Exception as e:
-                messagebox.showerror("Error", f"Error en descompresión: {str(e)}")
+            if output_path:
+                # Se descomprime en segundo plano; el resultado llega a decompression_done
                 result_text.delete("1.0", "end")
-                result_text.insert("1.0", f"❌ Error en descompresión: {str(e)}")
+                result_text.insert("1.0", "⏳ Descompresión en cola...\n")
+                metricas = Metricas()
+                cola.agregar(os.path.basename(file_path), gestor_archivos_texto.descomprimir_archivo_txt,
+                             file_path, output_path, metricas=metricas,
+                             al_terminar=lambda trabajo: decompression_done(trabajo, file_path, output_path, metricas))
         else:
             messagebox.showwarning("Advertencia", "Primero debe seleccionar un archivo comprimido")
+
+    def decompression_done(trabajo, file_path, output_path, metricas):
+        if trabajo.estado == CANCELADO:
+            result_text.delete("1.0", "end")
+            result_text.insert("1.0", "⛔ Descompresión cancelada")
+            return
+        if trabajo.estado == ERROR:
+            messagebox.showerror("Error", f"Error en descompresión: {str(trabajo.error)}")
+            result_text.delete("1.0", "end")
+            result_text.insert("1.0", f"❌ Error en descompresión: {str(trabajo.error)}")
+            return
+        metricas.exportar_jsonl()
+        decompressed_size = os.path.getsize(output_path) / 1024
+        compressed_size_bytes = os.path.getsize(file_path)
+
+        result_text.delete("1.0", "end")
+        result_text.insert("1.0", 
+            f"✅ Descompresión completada\n\n"
+            f"• Archivo comprimido: {os.path.basename(file_path)}\n"
+            f"• Tamaño comprimido: {compressed_size_bytes / 1024:.2f} KB\n"
+            f"• Archivo descomprimido: {os.path.basename(output_path)}\n"
+            f"• Tamaño descomprimido: {decompressed_size:.2f} KB\n"
+            f"• Tiempo de descompresión: {metricas.segundos:.2f} segundos\n\n"
+            f"💡 Archivo guardado en:\n{output_path}\n\n"
+            f"📊 Métricas\n{metricas.resumen()}"
+        )
     
     def compress_huffman():
         file_path = selected_file_path.get()
         if file_path:
-            try:
-                result_text.delete("1.0", "end")
-                result_text.insert("1.0", "⏳ Comprimiendo archivo...\n")
-                frame.update()
-                
-                file_dir = os.path.dirname(file_path)
-                file_name = os.path.basename(file_path)
-                compressed_path = os.path.join(file_dir, f"comprimido_{file_name}.bin")
-                
-                start_time = time.time()
-                
-                gestor_archivos_texto.comprimir_archivo_txt(file_path, compressed_path)
-                
-                end_time = time.time()
-                compression_time = end_time - start_time
-                
-                original_size_bytes = os.path.getsize(file_path)
-                compressed_size_bytes = os.path.getsize(compressed_path)
-                ratio = (1 - (compressed_size_bytes / original_size_bytes)) * 100
-                
-                original_size.set(f"{original_size_bytes / 1024:.2f} KB")
-                compressed_size.set(f"{compressed_size_bytes / 1024:.2f} KB")
-                compression_ratio.set(f"{ratio:.1f}%")
-                compressed_file_path.set(compressed_path)
-                
-                result_text.delete("1.0", "end")
-                result_text.insert("1.0", 
-                    f"✅ Compresión Huffman completada\n\n"
-                    f"• Archivo original: {os.path.basename(file_path)}\n"
-                    f"• Tamaño original: {original_size.get()}\n"
-                    f"• Tamaño comprimido: {compressed_size.get()}\n"
-                    f"• Ratio de compresión: {compression_ratio.get()}\n"
-                    f"• Tiempo de compresión: {compression_time:.2f} segundos\n"
-                    f"• Archivo comprimido: {os.path.basename(compressed_path)}\n\n"
-                    f"💡 Espacio ahorrado: {original_size_bytes - compressed_size_bytes} bytes"
-                )
-                
-                save_btn.configure(state="normal")
-                
-            except Exception as e:
-                messagebox.showerror("Error", f"Error en compresión Huffman: {str(e)}")
-                result_text.delete("1.0", "end")
-                result_text.insert("1.0", f"❌ Error en compresión: {str(e)}")
+            file_dir = os.path.dirname(file_path)
+            file_name = os.path.basename(file_path)
+            compressed_path = os.path.join(file_dir, f"comprimido_{file_name}.bin")
+
+            # Se comprime en segundo plano; el resultado llega a compression_done
+            result_text.delete("1.0", "end")
+            result_text.insert("1.0", "⏳ Compresión en cola...\n")
+            metricas = Metricas()
+            cola.agregar(file_name, gestor_archivos_texto.comprimir_archivo_txt,
+                         file_path, compressed_path, metricas=metricas,
+                         al_terminar=lambda trabajo: compression_done(trabajo, file_path, compressed_path, metricas))
+
+    def compression_done(trabajo, file_path, compressed_path, metricas):
+        if trabajo.estado == CANCELADO:
+            result_text.delete("1.0", "end")
+            result_text.insert("1.0", "⛔ Compresión cancelada")
+            return
+        if trabajo.estado == ERROR:
+            messagebox.showerror("Error", f"Error en compresión Huffman: {str(trabajo.error)}")
+            result_text.delete("1.0", "end")
+            result_text.insert("1.0", f"❌ Error en compresión: {str(trabajo.error)}")
+            return
+        metricas.exportar_jsonl()
+
+        original_size_bytes = os.path.getsize(file_path)
+        compressed_size_bytes = os.path.getsize(compressed_path)
+        ratio = (1 - (compressed_size_bytes / original_size_bytes)) * 100 if original_size_bytes else 0.0
+
+        original_size.set(f"{original_size_bytes / 1024:.2f} KB")
+        compressed_size.set(f"{compressed_size_bytes / 1024:.2f} KB")
+        compression_ratio.set(f"{ratio:.1f}%")
+        compressed_file_path.set(compressed_path)
+
+        result_text.delete("1.0", "end")
+        result_text.insert("1.0", 
+            f"✅ Compresión Huffman completada\n\n"
+            f"• Archivo original: {os.path.basename(file_path)}\n"
+            f"• Tamaño original: {original_size.get()}\n"
+            f"• Tamaño comprimido: {compressed_size.get()}\n"
+            f"• Ratio de compresión: {compression_ratio.get()}\n"
+            f"• Tiempo de compresión: {metricas.segundos:.2f} segundos\n"
+            f"• Archivo comprimido: {os.path.basename(compressed_path)}\n\n"
+            f"💡 Espacio ahorrado: {original_size_bytes - compressed_size_bytes} bytes\n\n"
+            f"📊 Métricas\n{metricas.resumen()}"
+        )
+
+        save_btn.configure(state="normal")
     
     def decompress_file():
         if compressed_file_path.get() and os.path.exists(compressed_file_path.get()):
-            try:
-                output_path = filedialog.asksaveasfilename(
-                    title="Guardar archivo descomprimido",
-                    defaultextension=".txt",
-                    filetypes=[("Archivos de texto", "*.txt")]
-                )
-                
-                if output_path:
-                    result_text.insert("end", f"\n\n⏳ Descomprimiendo archivo...")
-                    frame.update()
-                    
-                    start_time = time.time()
-                    
-                    gestor_archivos_texto.descomprimir_archivo_txt(compressed_file_path.get(), output_path)
-                    
-                    end_time = time.time()
-                    decompression_time = end_time - start_time
-                    
-                    result_text.insert("end", 
-                        f"\n✅ Descompresión completada\n"
-                        f"• Archivo guardado: {os.path.basename(output_path)}\n"
-                        f"• Tiempo de descompresión: {decompression_time:.2f} segundos"
-                    )
-                    
-            except Exception as e:
-                messagebox.showerror("Error", f"Error en descompresión: {str(e)}")
+            output_path = filedialog.asksaveasfilename(
+                title="Guardar archivo descomprimido",
+                defaultextension=".txt",
+                filetypes=[("Archivos de texto", "*.txt")]
+            )
+            
+            if output_path:
+                result_text.insert("end", f"\n\n⏳ Descompresión en cola...")
+                metricas = Metricas()
+                cola.agregar(os.path.basename(compressed_file_path.get()),
+                             gestor_archivos_texto.descomprimir_archivo_txt,
+                             compressed_file_path.get(), output_path, metricas=metricas,
+                             al_terminar=lambda trabajo: last_decompression_done(trabajo, output_path, metricas))
         else:
             messagebox.showwarning("Advertencia", "Primero debe comprimir un archivo")
+
+    def last_decompression_done(trabajo, output_path, metricas):
+        if trabajo.estado == CANCELADO:
+            result_text.insert("end", "\n⛔ Descompresión cancelada")
+            return
+        if trabajo.estado == ERROR:
+            messagebox.showerror("Error", f"Error en descompresión: {str(trabajo.error)}")
+            return
+        metricas.exportar_jsonl()
+        result_text.insert("end", 
+            f"\n✅ Descompresión completada\n"
+            f"• Archivo guardado: {os.path.basename(output_path)}\n"
+            f"• Tiempo de descompresión: {metricas.segundos:.2f} segundos\n\n"
+            f"📊 Métricas\n{metricas.resumen()}"
+        )
     
     def preview_content():
         file_path = selected_file_path.get()
@@ -409,6 +408,24 @@ def create_text_compression_frame(main_container, show_frame_callback):
     result_text = ctk.CTkTextbox(right_panel, height=150, font=ctk.CTkFont(size=12))
     result_text.pack(pady=10, padx=20, fill="both", expand=True)
     result_text.insert("1.0", "Los resultados de compresión aparecerán aquí...")
+
+    # Avance del trabajo en segundo plano (lo actualiza la cola)
+    progress_frame = ctk.CTkFrame(right_panel, fg_color="transparent")
+    progress_frame.pack(pady=(0, 5), padx=20, fill="x")
+
+    progress_bar = ctk.CTkProgressBar(progress_frame, progress_color="#6de0ff")
+    progress_bar.set(0)
+    progress_bar.pack(side="left", padx=5, fill="x", expand=True)
+
+    cancel_btn = ctk.CTkButton(progress_frame, text="✖ Cancelar", width=100, state="disabled",
+                               fg_color="#122448", hover_color="#6de0ff",
+                               border_color="#6de0ff", border_width=1)
+    cancel_btn.pack(side="right", padx=5)
+
+    progress_label = ctk.CTkLabel(right_panel, text="", text_color="white")
+    progress_label.pack(padx=20, anchor="w")
+
+    cola = cola_con_avance(frame, progress_bar.set, progress_label, cancel_btn)
     
     action_buttons = ctk.CTkFrame(right_panel, fg_color="transparent")
     action_buttons.pack(pady=20, padx=20, fill="x")
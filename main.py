@@ -0,0 +1,469 @@
+"""Línea de comandos de DataZip.
+
+    python main.py comprimir libro.txt foto.png voz.wav
+    python main.py comprimir -r datos/ -o comprimidos/ --jobs 4
+    python main.py descomprimir "comprimidos/*.bin" -o textos/
+    python main.py verificar -r comprimidos/
+    cat libro.txt | python main.py comprimir - > libro.txt.bin
+    python main.py bench correr -t chico
+    python main.py extraer comprimido.bin --lineas 100:200
+    python main.py extraer comprimido.bin --bytes 0:4096 -o parte.txt
+    python main.py extraer grabacion.flac --segundos 90:120 -o parte.wav
+    python main.py vista-previa foto_png.rlebits -o miniatura.png
+
+`comprimir`, `descomprimir` y `verificar` aceptan archivos, patrones (*.txt),
+carpetas con -r y "-" para la entrada estándar. El códec sale del tipo de
+archivo: imágenes con RLE, WAV con el códec de audio y todo lo demás con
+Huffman por bytes; al descomprimir, de la cabecera del comprimido. Con
+--jobs N los archivos se reparten entre N procesos (con un solo archivo, los
+N procesos los usa el códec para sus bloques). Los códecs se importan recién
+cuando hace falta uno, así la interfaz gráfica, Pillow y simpleaudio no se
+cargan para comprimir texto.
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from utils.paralelo import mapear_en_orden, cantidad_procesos
+from utils.metricas import Metricas, VARIABLE_ENTORNO
+from utils.operaciones import CODECS, EXTENSIONES, iguales_bytes
+from utils.contenedor import (es_contenedor, leer_cabecera, CODEC_TEXTO_HUFFMAN, CODEC_TEXTO_BYTES,
+                              CODEC_IMAGEN_RLE_BITS, CODEC_IMAGEN_RLE_BYTES, CODEC_IMAGEN_RASTER,
+                              CODEC_IMAGEN_PALETA, CODEC_IMAGEN_ALMACENADO, CODEC_AUDIO_HUFFMAN,
+                              CODEC_AUDIO_PREDICTIVO)
+
+
+def _rango(texto):
+    """'A:B', 'A:' o 'A' -> (A, B o None)."""
+    inicio, _, fin = texto.partition(":")
+    return int(inicio or 0), (int(fin) if fin else None)
+
+
+def _rango_segundos(texto):
+    """'A:B', 'A:' o 'A' en segundos -> (A, B o None)."""
+    inicio, _, fin = texto.partition(":")
+    return float(inicio or 0), (float(fin) if fin else None)
+
+
+def comando_extraer_audio(args):
+    from compresion_audio.huffman_audio import CompresionAudio
+
+    inicio, fin = _rango_segundos(args.segundos)
+    salida = CompresionAudio(args.archivo).extraer_rango(inicio, fin, args.archivo, args.salida, legado=args.legado)
+    print(f"Segmento guardado en {salida}")
+
+
+def comando_extraer(args):
+    if args.segundos:
+        return comando_extraer_audio(args)
+
+    from compresion_texto import gestor_archivos_texto
+
+    if args.lineas:
+        primera, ultima = _rango(args.lineas)
+        if ":" not in args.lineas:
+            ultima = primera
+        datos = gestor_archivos_texto.extraer_lineas(args.archivo, primera, ultima)
+    else:
+        inicio, fin = _rango(args.bytes)
+        datos = gestor_archivos_texto.extraer_rango_bytes(args.archivo, inicio, fin)
+
+    if args.salida:
+        with open(args.salida, "wb") as f:
+            f.write(datos)
+    else:
+        sys.stdout.buffer.write(datos)
+
+
+def comando_vista_previa(args):
+    from compresion_imagen.vista_previa import leer_vista_previa
+    from utils.contenedor import leer_cabecera
+
+    # Solo se leen la cabecera y la miniatura del principio del archivo
+    meta = leer_cabecera(args.archivo).meta
+    if "ancho" in meta:
+        print(f"Imagen: {meta['ancho']}x{meta['alto']} {meta['modo']} ({meta['formato']})")
+    imagen = leer_vista_previa(args.archivo)
+    if imagen is None:
+        print("El archivo no tiene vista previa")
+        return 1
+    print(f"Vista previa: {imagen.width}x{imagen.height}")
+    if args.salida:
+        imagen.save(args.salida)
+    if args.mostrar:
+        imagen.show()
+
+
+# ---------------- Compresión por lotes ----------------
+
+# Comprimidos anteriores al contenedor que se guardaban con pickle (los
+# .rlebits de entonces eran texto)
+_EXTENSIONES_PICKLE = (EXTENSIONES["texto"], EXTENSIONES["audio"])
+
+# Extensión del descomprimido cuando el nombre del comprimido no la trae
+_EXTENSIONES_ORIGINAL = {"texto": ".txt", "imagen": ".png", "audio": ".wav"}
+
+_TIPOS_POR_EXTENSION = {".wav": "audio", ".png": "imagen", ".jpg": "imagen", ".jpeg": "imagen",
+                        ".bmp": "imagen", ".tif": "imagen", ".tiff": "imagen", ".ppm": "imagen"}
+
+_TIPOS_POR_CODEC = {CODEC_TEXTO_HUFFMAN: "texto", CODEC_TEXTO_BYTES: "texto",
+                    CODEC_IMAGEN_RLE_BITS: "imagen", CODEC_IMAGEN_RLE_BYTES: "imagen",
+                    CODEC_IMAGEN_RASTER: "imagen", CODEC_IMAGEN_PALETA: "imagen", CODEC_IMAGEN_ALMACENADO: "imagen",
+                    CODEC_AUDIO_HUFFMAN: "audio", CODEC_AUDIO_PREDICTIVO: "audio"}
+
+
+def _extension_por_contenido(inicio: bytes) -> str:
+    """Extensión de los formatos que se reconocen por sus primeros bytes, o ""."""
+    if inicio.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if inicio.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if inicio[:4] == b"RIFF" and inicio[8:12] == b"WAVE":
+        return ".wav"
+    if inicio[:2] == b"BM" and inicio[6:10] == b"\0\0\0\0":
+        return ".bmp"
+    if inicio[:4] in (b"II*\0", b"MM\0*"):
+        return ".tif"
+    if inicio[:2] == b"P6" and inicio[2:3].isspace():
+        return ".ppm"
+    return ""
+
+
+def tipo_original(ruta) -> str:
+    """Códec con el que se comprime `ruta`: por la extensión o, si no la
+    reconoce, por el contenido. Lo que no es imagen ni WAV va como texto
+    (Huffman por bytes sirve para cualquier archivo)."""
+    tipo = _TIPOS_POR_EXTENSION.get(os.path.splitext(ruta)[1].lower())
+    if tipo is None:
+        with open(ruta, "rb") as f:
+            tipo = _TIPOS_POR_EXTENSION.get(_extension_por_contenido(f.read(16)), "texto")
+    return tipo
+
+
+def tipo_comprimido(ruta, legado=False):
+    """Códec de un archivo comprimido (de la cabecera o, en los formatos
+    anteriores al contenedor, de la extensión); None si no es un comprimido.
+    Los .bin y .flac anteriores se leen con pickle, que puede ejecutar
+    código: solo cuentan con `legado`."""
+    if es_contenedor(ruta):
+        return _TIPOS_POR_CODEC.get(leer_cabecera(ruta).codec)
+    for tipo, extension in EXTENSIONES.items():
+        if ruta.lower().endswith(extension):
+            return tipo if legado or extension not in _EXTENSIONES_PICKLE else None
+    return None
+
+
+def _es_pickle_anterior(ruta) -> bool:
+    return ruta.lower().endswith(_EXTENSIONES_PICKLE) and not es_contenedor(ruta)
+
+
+def _nombre_descomprimido(ruta, tipo) -> str:
+    # libro.txt.bin -> libro.txt; voz.flac -> voz.wav; foto_png.rlebits -> foto.png
+    nombre = os.path.basename(ruta)
+    if nombre.lower().endswith(EXTENSIONES[tipo]):
+        nombre = nombre[:-len(EXTENSIONES[tipo])]
+        if os.path.splitext(nombre)[1]:
+            return nombre
+    if tipo == "imagen" and es_contenedor(ruta):
+        meta = leer_cabecera(ruta).meta
+        if "nombre" in meta:
+            return meta["nombre"] + meta["extension"]
+    return nombre + _EXTENSIONES_ORIGINAL[tipo]
+
+
+def _verificar(tipo, entrada, n_procesos, opciones):
+    # Un comprimido se descomprime en una carpeta temporal (así se revisan los
+    # CRC de todos los bloques); un original se comprime, se descomprime y se
+    # compara. Devuelve (tamaño comprimido de la ida y vuelta, si lo
+    # descomprimido es idéntico byte a byte), o (None, None)
+    comprimir, descomprimir, iguales = CODECS[tipo]
+    with tempfile.TemporaryDirectory(prefix="datazip_") as carpeta:
+        if tipo_comprimido(entrada, opciones.get("legado", False)) is not None:
+            destino = os.path.join(carpeta, _nombre_descomprimido(entrada, tipo))
+            descomprimir(entrada, destino, n_procesos, Metricas(), opciones)
+            return None, None
+        comprimido = comprimir(entrada, os.path.join(carpeta, "comprimido" + EXTENSIONES[tipo]),
+                               n_procesos, Metricas(), opciones)
+        extension = os.path.splitext(entrada)[1] or _EXTENSIONES_ORIGINAL[tipo]
+        destino = os.path.join(carpeta, "resultado" + extension)
+        resultado = descomprimir(comprimido, destino, n_procesos, Metricas(), opciones)
+        if not iguales(entrada, resultado):
+            raise ValueError("lo descomprimido no coincide con el original")
+        return os.path.getsize(comprimido), iguales_bytes(entrada, resultado)
+
+
+def procesar(tarea):
+    """Corre una tarea (operación, códec, entrada, salida, procesos del códec,
+    detalle, opciones) y devuelve un diccionario con el resultado. No lanza: el error
+    queda en "error", así un archivo dañado no corta el lote."""
+    operacion, tipo, entrada, salida, n_procesos, detalle, opciones = tarea
+    resultado = {"operacion": operacion, "tipo": tipo, "entrada": entrada, "salida": salida,
+                 "error": None, "metricas": None}
+    # Los códecs cuentan lo que hacen con print(): solo se muestra con
+    # --detalle y nunca por la salida estándar, que puede llevar datos
+    with contextlib.redirect_stdout(sys.stderr if detalle else io.StringIO()):
+        try:
+            if operacion == "verificar":
+                resultado["bytes_comprimido"], resultado["identico"] = _verificar(tipo, entrada, n_procesos,
+                                                                                   opciones)
+            else:
+                metricas = Metricas()
+                funcion = CODECS[tipo][0 if operacion == "comprimir" else 1]
+                if os.path.exists(salida):
+                    os.remove(salida)
+                resultado["salida"] = funcion(entrada, salida, n_procesos, metricas, opciones)
+                resultado["metricas"] = metricas.como_dict()
+        except Exception as e:
+            resultado["error"] = f"{type(e).__name__}: {e}"
+    return resultado
+
+
+def _buscar_archivos(entradas, recursivo):
+    """Expande patrones y carpetas -> ([(ruta, carpeta recorrida o None)], [(entrada, error)])."""
+    encontrados, errores = [], []
+    for entrada in entradas:
+        if entrada == "-":
+            encontrados.append((entrada, None))
+            continue
+        # La consola de Windows no expande los patrones
+        rutas = sorted(glob.glob(entrada, recursive=True)) if glob.has_magic(entrada) else [entrada]
+        if not rutas:
+            errores.append((entrada, "ningún archivo coincide"))
+        for ruta in rutas:
+            if os.path.isfile(ruta):
+                encontrados.append((ruta, None))
+            elif not os.path.isdir(ruta):
+                errores.append((ruta, "no existe"))
+            elif not recursivo:
+                errores.append((ruta, "es una carpeta (use -r para recorrerla)"))
+            else:
+                for raiz, carpetas, nombres in os.walk(ruta):
+                    carpetas.sort()
+                    encontrados += [(os.path.join(raiz, nombre), ruta) for nombre in sorted(nombres)]
+    return encontrados, errores
+
+
+def _leer_entrada_estandar(carpeta):
+    # Los códecs trabajan sobre archivos: la entrada estándar se guarda en uno
+    # con la extensión que corresponde a su contenido
+    ruta = os.path.join(carpeta, "stdin")
+    with open(ruta, "wb") as f:
+        shutil.copyfileobj(sys.stdin.buffer, f)
+    if es_contenedor(ruta):
+        extension = EXTENSIONES.get(tipo_comprimido(ruta), "")
+    else:
+        with open(ruta, "rb") as f:
+            extension = _extension_por_contenido(f.read(16))
+    os.rename(ruta, ruta + extension)
+    return ruta + extension
+
+
+def _planificar(args, temporal):
+    """-> ([(operación, códec, entrada, salida)], errores, salida que va a la salida estándar o None)."""
+    encontrados, errores = _buscar_archivos(args.entradas, args.recursivo)
+    if sum(ruta == "-" for ruta, _ in encontrados) > 1:
+        raise SystemExit("error: la entrada estándar ('-') se puede leer una sola vez")
+    if args.salida == "-" and len(encontrados) != 1:
+        raise SystemExit("error: con -o - hay que pasar un solo archivo")
+    a_carpeta = args.salida not in (None, "-") and (
+        len(encontrados) > 1 or os.path.isdir(args.salida) or args.salida.endswith(("/", os.sep)))
+
+    tareas, destinos, salida_estandar = [], set(), None
+    for ruta, recorrida in encontrados:
+        estandar = ruta == "-"
+        try:
+            if estandar:
+                ruta = _leer_entrada_estandar(temporal)
+            comprimido = tipo_comprimido(ruta, args.legado)
+            if args.operacion == "comprimir":
+                if recorrida and es_contenedor(ruta):
+                    continue  # Ya estaba comprimido
+                tipo = args.tipo or tipo_original(ruta)
+            elif comprimido is not None:
+                tipo = comprimido
+            elif _es_pickle_anterior(ruta):
+                raise ValueError("formato anterior al contenedor, que se lee con pickle y puede ejecutar "
+                                 "código (use --legado solo si confía en el archivo)")
+            elif args.operacion == "verificar":
+                tipo = args.tipo or tipo_original(ruta)
+            elif recorrida:
+                continue  # Al descomprimir una carpeta se saltean los que no son comprimidos
+            else:
+                raise ValueError("no es un archivo comprimido")
+
+            if args.operacion == "verificar":
+                tareas.append((args.operacion, tipo, ruta, None))
+                continue
+            if args.operacion == "comprimir":
+                nombre = os.path.basename(ruta) + EXTENSIONES[tipo]
+            else:
+                nombre = _nombre_descomprimido(ruta, tipo)
+            if args.salida == "-" or (args.salida is None and estandar):
+                destino = salida_estandar = os.path.join(temporal, "salida_" + nombre)
+            elif a_carpeta:
+                relativa = os.path.relpath(os.path.dirname(ruta), recorrida) if recorrida else ""
+                destino = os.path.normpath(os.path.join(args.salida, relativa, nombre))
+            else:
+                destino = args.salida or os.path.join(os.path.dirname(ruta), nombre)
+            if destino in destinos:
+                raise ValueError(f"otro archivo de la lista también se guardaría en {destino}")
+            if os.path.exists(destino) and not args.forzar:
+                raise ValueError(f"{destino} ya existe (use -f para sobrescribirlo)")
+            destinos.add(destino)
+            if os.path.dirname(destino):
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+            tareas.append((args.operacion, tipo, ruta, destino))
+        except (OSError, ValueError) as e:
+            errores.append(("-" if estandar else ruta, str(e)))
+    return tareas, errores, salida_estandar
+
+
+def _tamano(n_bytes) -> str:
+    if n_bytes < 1024:
+        return f"{n_bytes} B"
+    for unidad in ("KB", "MB", "GB"):
+        n_bytes /= 1024
+        if n_bytes < 1024 or unidad == "GB":
+            return f"{n_bytes:.1f} {unidad}"
+
+
+def _informar(resultado, entrada, salida, mostrar):
+    if resultado["error"]:
+        print(f"ERROR {entrada}: {resultado['error']}", file=sys.stderr)
+    elif resultado["operacion"] == "verificar":
+        detalle = ""
+        if resultado["bytes_comprimido"] is not None:
+            original = os.path.getsize(resultado["entrada"])
+            detalle = f", ida y vuelta {_tamano(original)} -> {_tamano(resultado['bytes_comprimido'])}"
+            if not resultado["identico"]:
+                detalle += ", mismos píxeles y metadatos pero no idéntico byte a byte"
+        mostrar(f"OK    {entrada} [{resultado['tipo']}{detalle}]")
+    else:
+        metricas = resultado["metricas"]
+        bytes_entrada = metricas["contadores"].get("bytes_entrada", 0)
+        bytes_salida = metricas["contadores"].get("bytes_salida", 0)
+        proporcion = ""
+        if resultado["operacion"] == "comprimir" and bytes_entrada:
+            proporcion = f" ({bytes_salida / bytes_entrada:.1%})"
+        mostrar(f"{entrada} -> {salida} [{resultado['tipo']}] {_tamano(bytes_entrada)} -> "
+                f"{_tamano(bytes_salida)}{proporcion} en {metricas['segundos']:.2f} s")
+
+
+def comando_lote(args):
+    n_procesos = cantidad_procesos(args.jobs or None)
+    ruta_metricas = args.metricas or os.environ.get(VARIABLE_ENTORNO)
+    with tempfile.TemporaryDirectory(prefix="datazip_") as temporal:
+        tareas, errores, salida_estandar = _planificar(args, temporal)
+        # Si la salida estándar lleva datos, el informe va a la de errores
+        flujo = sys.stderr if salida_estandar else sys.stdout
+        mostrar = lambda texto: print(texto, file=flujo)
+        for entrada, error in errores:
+            print(f"ERROR {entrada}: {error}", file=sys.stderr)
+        if not tareas and not errores:
+            mostrar("No hay archivos para procesar")
+
+        # Con un solo archivo los procesos los reparte el códec entre sus bloques
+        n_codec, n_lote = (n_procesos, 1) if len(tareas) == 1 else (1, n_procesos)
+        opciones = {"vista_previa": not args.sin_vista_previa, "legado": args.legado}
+        tareas = [tarea + (n_codec, args.detalle, opciones) for tarea in tareas]
+        fallidos = len(errores)
+        for resultado in mapear_en_orden(procesar, tareas, n_lote):
+            entrada = "-" if os.path.dirname(resultado["entrada"]) == temporal else resultado["entrada"]
+            salida = "-" if salida_estandar else resultado["salida"]
+            _informar(resultado, entrada, salida, mostrar)
+            if resultado["error"]:
+                fallidos += 1
+                continue
+            if ruta_metricas and resultado["metricas"]:
+                with open(ruta_metricas, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(resultado["metricas"], ensure_ascii=False) + "\n")
+            if salida_estandar:
+                with open(resultado["salida"], "rb") as f:
+                    shutil.copyfileobj(f, sys.stdout.buffer)
+                sys.stdout.buffer.flush()
+
+    if len(tareas) + len(errores) > 1:
+        mostrar(f"{len(tareas) + len(errores)} archivos, {fallidos} con errores")
+    return 1 if fallidos else 0
+
+
+def comando_bench(args):
+    from benchmarks import suite
+    return suite.main(args.argumentos or ["correr"])
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="datazip", description="Compresión de texto, imágenes y audio")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    ayudas = {"comprimir": "comprime archivos; el códec se elige por el tipo de archivo",
+              "descomprimir": "descomprime archivos comprimidos con cualquiera de los códecs",
+              "verificar": "revisa comprimidos (CRC) u originales (ida y vuelta sin pérdida)"}
+    alias = {"comprimir": "compress", "descomprimir": "decompress", "verificar": "verify"}
+    for operacion, ayuda in ayudas.items():
+        lote = comandos.add_parser(operacion, aliases=[alias[operacion]], help=ayuda)
+        lote.add_argument("entradas", nargs="+", metavar="ENTRADA",
+                          help="archivos, patrones (*.txt), carpetas con -r o - para la entrada estándar")
+        lote.add_argument("-r", "--recursivo", action="store_true", help="recorre las carpetas")
+        lote.add_argument("-j", "--jobs", type=int, default=1, metavar="N",
+                          help="procesos en paralelo (0 = todos los núcleos; por defecto 1)")
+        lote.add_argument("-v", "--detalle", action="store_true",
+                          help="muestra los mensajes de los códecs (por la salida de errores)")
+        if operacion != "verificar":
+            lote.add_argument("-o", "--salida", help="archivo o carpeta de salida (- para la salida estándar; "
+                                                     "por defecto junto a cada entrada)")
+            lote.add_argument("-f", "--forzar", action="store_true", help="sobrescribe las salidas que ya existen")
+            lote.add_argument("--metricas", metavar="ARCHIVO.jsonl",
+                              help=f"agrega las métricas de cada archivo (por defecto ${VARIABLE_ENTORNO})")
+        if operacion != "descomprimir":
+            lote.add_argument("-t", "--tipo", choices=list(CODECS), help="fuerza el códec en vez de elegirlo")
+        if operacion == "comprimir":
+            lote.add_argument("--sin-vista-previa", action="store_true",
+                              help="no guarda la miniatura al principio de las imágenes comprimidas")
+        else:
+            lote.add_argument("--legado", action="store_true",
+                              help="también abre los .bin y .flac anteriores al contenedor, que se leen con "
+                                   "pickle y pueden ejecutar código: solo con archivos de confianza")
+        lote.set_defaults(funcion=comando_lote, operacion=operacion, salida=None, forzar=False,
+                          metricas=None, tipo=None, sin_vista_previa=False, legado=False)
+
+    bench = comandos.add_parser("bench", help="benchmarks de los códecs (ver benchmarks/suite.py)",
+                                add_help=False)
+    bench.add_argument("argumentos", nargs=argparse.REMAINDER,
+                       help="argumentos de python -m benchmarks.suite (por defecto: correr)")
+    bench.set_defaults(funcion=comando_bench)
+
+    extraer = comandos.add_parser("extraer", help="extrae un rango de un texto (.bin) o audio (.flac) comprimido")
+    extraer.add_argument("archivo")
+    grupo = extraer.add_mutually_exclusive_group(required=True)
+    grupo.add_argument("--bytes", metavar="INICIO:FIN", help="rango de bytes [INICIO, FIN)")
+    grupo.add_argument("--lineas", metavar="A:B", help="líneas A a B, numeradas desde 1")
+    grupo.add_argument("--segundos", metavar="INICIO:FIN", help="audio entre esos segundos, como WAV")
+    extraer.add_argument("-o", "--salida", help="archivo de salida (por defecto la salida estándar; "
+                                                "en audio, un WAV junto al comprimido)")
+    extraer.add_argument("--legado", action="store_true",
+                         help="también abre los .flac anteriores al contenedor (se leen con pickle)")
+    extraer.set_defaults(funcion=comando_extraer)
+
+    vista = comandos.add_parser("vista-previa", aliases=["preview"],
+                                help="muestra la miniatura guardada en una imagen comprimida (.rlebits)")
+    vista.add_argument("archivo")
+    vista.add_argument("-o", "--salida", help="guarda la miniatura en este archivo (PNG, JPG...)")
+    vista.add_argument("--mostrar", action="store_true", help="abre la miniatura con el visor del sistema")
+    vista.set_defaults(funcion=comando_vista_previa)
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    return args.funcion(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""Lectura y escritura de flujos de bits empaquetados en bytes.
+
+Los bits se guardan MSB primero, es decir, en el mismo orden en que se
+leería una cadena '0101...' de izquierda a derecha.
+"""
+
+# Bits que se dejan acumular antes de volcarlos al bytearray.
+_UMBRAL_VOLCADO = 512
+
+# BITS_DE_BYTE[b] = tupla con los 8 bits de b, del más significativo al menos.
+BITS_DE_BYTE = tuple(tuple((b >> d) & 1 for d in range(7, -1, -1)) for b in range(256))
+
+
+def iterar_bits(datos, n_bits: int):
+    """Recorre los primeros `n_bits` bits de `datos` sin construir cadenas."""
+    completos, sobran = divmod(n_bits, 8)
+    tabla = BITS_DE_BYTE
+    for byte in datos[:completos]:
+        yield from tabla[byte]
+    if sobran:
+        yield from tabla[datos[completos]][:sobran]
+
+
+class EscritorBits:
+    """Empaqueta códigos de longitud variable directamente en un bytearray."""
+
+    __slots__ = ("datos", "_acumulador", "_n_bits", "_bytes_entregados", "_relleno")
+
+    def __init__(self):
+        self.datos = bytearray()
+        self._acumulador = 0
+        self._n_bits = 0
+        self._bytes_entregados = 0
+        self._relleno = 0
+
+    @property
+    def total_bits(self) -> int:
+        """Bits válidos escritos hasta ahora (sin contar el relleno final)."""
+        return (self._bytes_entregados + len(self.datos)) * 8 + self._n_bits - self._relleno
+
+    def escribir(self, codigo: int, longitud: int):
+        """Agrega los `longitud` bits menos significativos de `codigo`."""
+        self._acumulador = (self._acumulador << longitud) | codigo
+        self._n_bits += longitud
+        if self._n_bits >= _UMBRAL_VOLCADO:
+            self._volcar()
+
+    def escribir_simbolos(self, simbolos, tabla):
+        """Codifica una secuencia usando tabla[simbolo] = (codigo, longitud)."""
+        acc = self._acumulador
+        n = self._n_bits
+        datos = self.datos
+        for s in simbolos:
+            codigo, longitud = tabla[s]
+            acc = (acc << longitud) | codigo
+            n += longitud
+            if n >= _UMBRAL_VOLCADO:
+                sobran = n & 7
+                datos += (acc >> sobran).to_bytes((n - sobran) >> 3, "big")
+                acc &= (1 << sobran) - 1
+                n = sobran
+        self._acumulador = acc
+        self._n_bits = n
+
+    def _volcar(self):
+        sobran = self._n_bits & 7
+        completos = self._n_bits - sobran
+        if completos:
+            self.datos += (self._acumulador >> sobran).to_bytes(completos >> 3, "big")
+            self._acumulador &= (1 << sobran) - 1
+            self._n_bits = sobran
+
+    def tomar_bytes(self) -> bytes:
+        """Devuelve y descarta los bytes completos ya escritos (para escribir por partes)."""
+        self._volcar()
+        completos = bytes(self.datos)
+        self._bytes_entregados += len(completos)
+        self.datos.clear()
+        return completos
+
+    def cerrar(self) -> bytearray:
+        """Rellena con ceros el último byte y devuelve todos los datos pendientes."""
+        self._volcar()
+        if self._n_bits:
+            self._relleno = 8 - self._n_bits
+            self.datos.append((self._acumulador << self._relleno) & 0xFF)
+            self._acumulador = 0
+            self._n_bits = 0
+        return self.datos
+
+
+class LectorBits:
+    """Lee bits MSB primero desde bytes/bytearray/memoryview con un acumulador entero."""
+
+    __slots__ = ("_datos", "_pos", "_acumulador", "_n_bits", "restantes")
+
+    def __init__(self, datos, n_bits: int = None):
+        self._datos = datos
+        self._pos = 0
+        self._acumulador = 0
+        self._n_bits = 0
+        # bits válidos que aún no se han consumido (excluye el relleno final)
+        self.restantes = len(datos) * 8 if n_bits is None else n_bits
+
+    def _rellenar(self, minimo: int):
+        # Carga de 8 en 8 bytes hasta tener al menos `minimo` bits en el acumulador
+        datos = self._datos
+        while self._n_bits < minimo and self._pos < len(datos):
+            trozo = datos[self._pos:self._pos + 8]
+            self._pos += len(trozo)
+            self._acumulador = (self._acumulador << (8 * len(trozo))) | int.from_bytes(trozo, "big")
+            self._n_bits += 8 * len(trozo)
+
+    def ver(self, n: int) -> int:
+        """Devuelve los próximos n bits sin consumirlos (rellena con ceros al final)."""
+        if self._n_bits < n:
+            self._rellenar(n)
+            if self._n_bits < n:
+                return (self._acumulador << (n - self._n_bits)) & ((1 << n) - 1)
+        return (self._acumulador >> (self._n_bits - n)) & ((1 << n) - 1)
+
+    def consumir(self, n: int):
+        if self._n_bits < n:
+            self._rellenar(n)
+        # si ya no hay datos se consume el relleno implícito de ceros
+        self._n_bits = max(self._n_bits - n, 0)
+        self._acumulador &= (1 << self._n_bits) - 1
+        self.restantes -= n
+
+    def leer(self, n: int) -> int:
+        valor = self.ver(n)
+        self.consumir(n)
+        return valor
+
+
+def escribir_varint(salida: bytearray, valor: int):
+    """Entero no negativo en grupos de 7 bits, el menos significativo primero."""
+    while valor >= 0x80:
+        salida.append((valor & 0x7F) | 0x80)
+        valor >>= 7
+    salida.append(valor)
+
+
+def leer_varint(datos, pos: int):
+    """Inverso de escribir_varint -> (valor, posición siguiente)."""
+    valor = 0
+    desplazamiento = 0
+    while True:
+        byte = datos[pos]
+        pos += 1
+        valor |= (byte & 0x7F) << desplazamiento
+        if byte < 0x80:
+            return valor, pos
+        desplazamiento += 7
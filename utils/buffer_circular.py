@@ -0,0 +1,73 @@
+"""Buffer circular de bytes para pasar datos entre dos hilos.
+
+Un productor escribe (se bloquea si el buffer está lleno) y un consumidor
+lee lo que haya (se bloquea si está vacío). Al cerrarlo, el consumidor
+termina de leer lo pendiente y después recibe b"".
+"""
+import threading
+
+
+class BufferCircular:
+
+    def __init__(self, capacidad: int):
+        if capacidad <= 0:
+            raise ValueError("La capacidad debe ser positiva")
+        self._datos = bytearray(capacidad)
+        self._inicio = 0
+        self._largo = 0
+        self._cerrado = False
+        self._condicion = threading.Condition()
+
+    @property
+    def capacidad(self) -> int:
+        return len(self._datos)
+
+    def __len__(self):
+        with self._condicion:
+            return self._largo
+
+    def escribir(self, datos) -> bool:
+        """Agrega todos los `datos`, esperando lugar cuando hace falta; False si se cerró antes."""
+        datos = memoryview(datos).cast("B")
+        capacidad = len(self._datos)
+        with self._condicion:
+            while len(datos):
+                while self._largo == capacidad and not self._cerrado:
+                    self._condicion.wait()
+                if self._cerrado:
+                    return False
+                fin = (self._inicio + self._largo) % capacidad
+                cantidad = min(len(datos), capacidad - self._largo, capacidad - fin)
+                self._datos[fin:fin + cantidad] = datos[:cantidad]
+                self._largo += cantidad
+                datos = datos[cantidad:]
+                self._condicion.notify_all()
+        return True
+
+    def leer(self, maximo: int, timeout: float = None) -> bytes:
+        """Hasta `maximo` bytes, esperando a que haya alguno; b"" si se cerró y está vacío.
+
+        Con `timeout` devuelve b"" si pasa ese tiempo sin datos (ver `cerrado`).
+        """
+        capacidad = len(self._datos)
+        with self._condicion:
+            if not self._condicion.wait_for(lambda: self._largo or self._cerrado, timeout):
+                return b""
+            cantidad = min(maximo, self._largo)
+            primera = min(cantidad, capacidad - self._inicio)
+            salida = bytes(self._datos[self._inicio:self._inicio + primera])
+            salida += self._datos[:cantidad - primera]
+            self._inicio = (self._inicio + cantidad) % capacidad
+            self._largo -= cantidad
+            self._condicion.notify_all()
+            return salida
+
+    @property
+    def cerrado(self) -> bool:
+        return self._cerrado
+
+    def cerrar(self):
+        """Ya no se escribe más; despierta a quien esté esperando."""
+        with self._condicion:
+            self._cerrado = True
+            self._condicion.notify_all()
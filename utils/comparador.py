@@ -0,0 +1,64 @@
+"""Comparación de tamaños y de resultados de benchmarks.
+
+Un archivo de resultados (ver benchmarks/suite.py) tiene una entrada por
+(códec, corpus) con la proporción comprimida y, para comprimir y
+descomprimir, la velocidad en MB/s y el pico de memoria. Comparar dos
+archivos marca como regresión cualquier métrica que empeore más que un
+umbral relativo.
+"""
+from collections import namedtuple
+
+Diferencia = namedtuple("Diferencia", "clave metrica antes despues cambio regresion")
+
+# (ruta dentro de la entrada, True si más grande es mejor)
+METRICAS = {
+    "ratio": (("ratio",), False),
+    "comprimir_mb_s": (("comprimir", "mb_s"), True),
+    "descomprimir_mb_s": (("descomprimir", "mb_s"), True),
+    "comprimir_memoria": (("comprimir", "memoria_pico"), False),
+    "descomprimir_memoria": (("descomprimir", "memoria_pico"), False),
+}
+
+
+def proporcion(tamano_original: int, tamano_comprimido: int) -> float:
+    """Tamaño comprimido / original (menos es mejor); 1.0 si el original está vacío."""
+    return tamano_comprimido / tamano_original if tamano_original else 1.0
+
+
+def ahorro(tamano_original: int, tamano_comprimido: int) -> float:
+    """Fracción del original que se ahorró (0.75 = 75 % más chico)."""
+    return 1.0 - proporcion(tamano_original, tamano_comprimido)
+
+
+def _valor(entrada, ruta):
+    for clave in ruta:
+        entrada = entrada.get(clave) if isinstance(entrada, dict) else None
+    return entrada
+
+
+def _clave(entrada):
+    return f"{entrada['codec']}/{entrada['corpus']}/{entrada['tamano']}"
+
+
+def comparar_resultados(base: dict, nuevo: dict, umbral: float = 0.10) -> list:
+    """Diferencias de cada métrica entre dos corridas -> lista de Diferencia.
+
+    `cambio` es relativo y positivo cuando la métrica mejoró. Una diferencia
+    es regresión si empeoró más que `umbral` (0.10 = 10 %). Solo se comparan
+    las entradas presentes en ambas corridas.
+    """
+    anteriores = {_clave(e): e for e in base["resultados"]}
+    diferencias = []
+    for entrada in nuevo["resultados"]:
+        clave = _clave(entrada)
+        if clave not in anteriores:
+            continue
+        for metrica, (ruta, mas_es_mejor) in METRICAS.items():
+            antes, despues = _valor(anteriores[clave], ruta), _valor(entrada, ruta)
+            if not antes or despues is None:
+                continue
+            cambio = (despues - antes) / antes
+            if not mas_es_mejor:
+                cambio = -cambio
+            diferencias.append(Diferencia(clave, metrica, antes, despues, cambio, cambio < -umbral))
+    return diferencias
@@ -0,0 +1,237 @@
+"""Contenedor binario versionado para los archivos comprimidos del proyecto.
+
+Reemplaza los diccionarios guardados con pickle. Todos los enteros van en
+little-endian y el archivo se escribe de corrido (sin volver atrás), así
+que también sirve para escribir en una tubería.
+
+    Cabecera
+        magia         4s   b"DZIP"
+        version       B    VERSION
+        codec         B    uno de los CODEC_*
+        banderas      H    BANDERA_* (0 si no hay secciones opcionales)
+        largo_meta    I    bytes de metadatos que siguen
+        meta          JSON UTF-8 con los parámetros del códec
+    Vista previa (solo con BANDERA_VISTA_PREVIA)
+        largo         I
+        imagen        miniatura ya codificada (PNG o JPEG)
+    Bloques
+        los datos comprimidos de cada bloque, uno detrás de otro
+    Índice (una entrada por bloque)
+        desplazamiento Q   posición del bloque desde el inicio del archivo
+        largo          I   bytes comprimidos
+        largo_original Q   bytes que ocupa el bloque descomprimido
+        crc32          I   zlib.crc32 de los bytes comprimidos
+    Metadatos finales
+        JSON UTF-8 con datos que recién se conocen al terminar
+    Cola (últimos 28 bytes)
+        desplazamiento_indice Q
+        n_bloques             I
+        tamano_original       Q    suma de los largos originales
+        largo_meta_final      I
+        magia                 4s   b"DZIP"
+
+Un lector abre el archivo con mmap, lee la cola, salta al índice y desde ahí
+puede ir directo a cualquier bloque sin leer el resto. La cabecera y la vista
+previa están al principio, así que leer_cabecera() las obtiene leyendo solo
+los primeros KB del archivo.
+"""
+import json
+import mmap
+import struct
+import zlib
+from collections import namedtuple
+
+MAGIA = b"DZIP"
+VERSION = 1
+
+# Identificadores de códec
+CODEC_TEXTO_HUFFMAN = 1
+CODEC_AUDIO_HUFFMAN = 2
+CODEC_IMAGEN_RLE_BITS = 3
+CODEC_TEXTO_BYTES = 4
+CODEC_IMAGEN_RLE_BYTES = 5
+CODEC_IMAGEN_RASTER = 6
+CODEC_IMAGEN_PALETA = 7
+CODEC_AUDIO_PREDICTIVO = 8
+CODEC_IMAGEN_ALMACENADO = 9
+
+# Banderas de la cabecera
+BANDERA_VISTA_PREVIA = 1
+
+_CABECERA = struct.Struct("<4sBBHI")
+_LARGO = struct.Struct("<I")
+_ENTRADA = struct.Struct("<QIQI")
+_COLA = struct.Struct("<QIQI4s")
+
+EntradaBloque = namedtuple("EntradaBloque", "desplazamiento largo largo_original crc")
+Cabecera = namedtuple("Cabecera", "version codec meta vista_previa")
+
+
+class ErrorContenedor(ValueError):
+    """El archivo no es un contenedor válido o está dañado."""
+
+
+def es_contenedor(ruta) -> bool:
+    """True si el archivo empieza con la magia del contenedor."""
+    with open(ruta, "rb") as f:
+        return f.read(len(MAGIA)) == MAGIA
+
+
+def exigir_legado(ruta, legado: bool):
+    """Los formatos anteriores al contenedor se guardaban con pickle, que puede
+    ejecutar código al leer: solo se abren si quien llama lo pide con `legado`."""
+    if not legado:
+        raise ErrorContenedor(f"{ruta} no es un contenedor: los formatos anteriores se leen con pickle, "
+                              "que puede ejecutar código; ábralo solo si confía en el archivo")
+
+
+def leer_cabecera(ruta) -> Cabecera:
+    """Versión, códec, metadatos y vista previa (o None) sin mapear ni leer el resto del archivo."""
+    with open(ruta, "rb") as f:
+        try:
+            magia, version, codec, banderas, largo_meta = _CABECERA.unpack(f.read(_CABECERA.size))
+        except struct.error:
+            raise ErrorContenedor("Archivo demasiado corto") from None
+        if magia != MAGIA:
+            raise ErrorContenedor("Contenedor inválido: magia incorrecta")
+        meta = json.loads(f.read(largo_meta))
+        vista_previa = None
+        if banderas & BANDERA_VISTA_PREVIA:
+            largo, = _LARGO.unpack(f.read(_LARGO.size))
+            vista_previa = f.read(largo)
+    return Cabecera(version, codec, meta, vista_previa)
+
+
+def _json(datos) -> bytes:
+    return json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def tamano_contenedor(meta: dict, largos_bloques) -> int:
+    """Bytes que ocupa un contenedor con estos metadatos y bloques, sin vista
+    previa ni metadatos finales; sirve para elegir entre candidatos sin escribirlos."""
+    largos_bloques = list(largos_bloques)
+    return (_CABECERA.size + len(_json(meta or {})) + sum(largos_bloques)
+            + _ENTRADA.size * len(largos_bloques) + len(_json({})) + _COLA.size)
+
+
+class EscritorContenedor:
+    """Escribe un contenedor en un archivo binario ya abierto.
+
+    Uso:
+        with open(ruta, "wb") as f, EscritorContenedor(f, CODEC_X, meta) as esc:
+            esc.agregar_bloque(datos, largo_original)
+
+    `vista_previa` son los bytes de una miniatura que se guarda tras la cabecera.
+    """
+
+    def __init__(self, f, codec: int, meta: dict = None, vista_previa: bytes = None):
+        self._f = f
+        self._indice = []
+        self.meta_final = {}
+        self.tamano_original = 0
+        meta_bytes = _json(meta or {})
+        banderas = BANDERA_VISTA_PREVIA if vista_previa is not None else 0
+        cabecera = _CABECERA.pack(MAGIA, VERSION, codec, banderas, len(meta_bytes)) + meta_bytes
+        if vista_previa is not None:
+            cabecera += _LARGO.pack(len(vista_previa)) + vista_previa
+        f.write(cabecera)
+        self._pos = len(cabecera)
+        self._cerrado = False
+
+    def agregar_bloque(self, datos, largo_original: int):
+        self._f.write(datos)
+        self._indice.append(EntradaBloque(self._pos, len(datos), largo_original, zlib.crc32(datos)))
+        self._pos += len(datos)
+        self.tamano_original += largo_original
+
+    @property
+    def n_bloques(self) -> int:
+        return len(self._indice)
+
+    def cerrar(self):
+        if self._cerrado:
+            return
+        self._cerrado = True
+        indice = b"".join(_ENTRADA.pack(*entrada) for entrada in self._indice)
+        meta_final = _json(self.meta_final)
+        self._f.write(indice)
+        self._f.write(meta_final)
+        self._f.write(_COLA.pack(self._pos, len(self._indice), self.tamano_original,
+                                 len(meta_final), MAGIA))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        if tipo is None:
+            self.cerrar()
+
+
+class LectorContenedor:
+    """Lee un contenedor con mmap; los bloques se devuelven como memoryview."""
+
+    def __init__(self, ruta):
+        self._archivo = open(ruta, "rb")
+        try:
+            self._mapa = mmap.mmap(self._archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._archivo.close()
+            raise ErrorContenedor("Archivo vacío") from None
+        self._vista = memoryview(self._mapa)
+        try:
+            self._leer_estructura()
+        except (struct.error, ValueError) as e:
+            self.cerrar()
+            raise ErrorContenedor(f"Contenedor inválido: {e}") from None
+
+    def _leer_estructura(self):
+        vista = self._vista
+        magia, self.version, self.codec, self.banderas, largo_meta = _CABECERA.unpack_from(vista, 0)
+        if magia != MAGIA:
+            raise ValueError("magia incorrecta")
+        if self.version > VERSION:
+            raise ValueError(f"versión {self.version} no soportada")
+        inicio_meta = _CABECERA.size
+        self.meta = json.loads(bytes(vista[inicio_meta:inicio_meta + largo_meta]))
+        self.fin_cabecera = inicio_meta + largo_meta
+        self.vista_previa = None
+        if self.banderas & BANDERA_VISTA_PREVIA:
+            largo, = _LARGO.unpack_from(vista, self.fin_cabecera)
+            inicio = self.fin_cabecera + _LARGO.size
+            self.vista_previa = bytes(vista[inicio:inicio + largo])
+            self.fin_cabecera = inicio + largo
+
+        (desplazamiento_indice, n_bloques, self.tamano_original,
+         largo_meta_final, magia_final) = _COLA.unpack_from(vista, len(vista) - _COLA.size)
+        if magia_final != MAGIA:
+            raise ValueError("archivo truncado (falta la cola)")
+        self.bloques = [EntradaBloque(*_ENTRADA.unpack_from(vista, desplazamiento_indice + i * _ENTRADA.size))
+                        for i in range(n_bloques)]
+        inicio_final = desplazamiento_indice + n_bloques * _ENTRADA.size
+        self.meta_final = json.loads(bytes(vista[inicio_final:inicio_final + largo_meta_final]))
+
+    def bloque(self, i: int, verificar: bool = True) -> memoryview:
+        entrada = self.bloques[i]
+        datos = self._vista[entrada.desplazamiento:entrada.desplazamiento + entrada.largo]
+        if verificar and zlib.crc32(datos) != entrada.crc:
+            raise ErrorContenedor(f"El bloque {i} está dañado (CRC distinto)")
+        return datos
+
+    def iterar_bloques(self, verificar: bool = True):
+        for i in range(len(self.bloques)):
+            yield self.bloque(i, verificar)
+
+    def cerrar(self):
+        self._vista.release()
+        try:
+            self._mapa.close()
+        except BufferError:
+            # Aún hay vistas de bloques vivas; el mapa se libera cuando las suelten
+            pass
+        self._archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        self.cerrar()
@@ -0,0 +1,182 @@
+"""Huffman sobre un alfabeto de bytes (256 símbolos) con tablas planas.
+
+Hay dos motores con la misma salida bit a bit: uno en Python puro y otro con
+NumPy, que se usa solo si está instalado. `motor` permite elegir uno a mano
+("python" o "numpy"); por defecto se usa NumPy cuando está disponible.
+"""
+import sys
+from functools import lru_cache
+
+from utils.bits import EscritorBits
+from utils.huffman_canonico import (codigos_canonicos, longitudes_huffman, limitar_longitudes,
+                                    serializar_longitudes, deserializar_longitudes,
+                                    DecodificadorTabla, LONGITUD_MAXIMA,
+                                    empaquetar_bloque, desempaquetar_bloque)
+from utils.metricas import SIN_METRICAS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAY_NUMPY = np is not None
+
+# Con NumPy cada código se ubica en una ventana de hasta 64 bits que empieza en
+# su byte; el desfase dentro del byte es de hasta 7 bits.
+_LONGITUD_MAXIMA_NUMPY = 64 - 7
+
+
+def _usar_numpy(motor) -> bool:
+    if motor is None:
+        return HAY_NUMPY
+    if motor == "numpy" and not HAY_NUMPY:
+        raise ImportError("El motor 'numpy' necesita numpy instalado")
+    if motor not in ("numpy", "python"):
+        raise ValueError(f"Motor desconocido: {motor!r}")
+    return motor == "numpy"
+
+
+def frecuencias_bytes(datos, motor=None) -> list:
+    """Histograma de 256 entradas (frecuencias[b] = apariciones del byte b)."""
+    if _usar_numpy(motor):
+        return np.bincount(np.frombuffer(datos, dtype=np.uint8), minlength=256).tolist()
+    # bytes.count corre en C y solo se llama para los valores presentes
+    datos = bytes(datos)
+    frecuencias = [0] * 256
+    for valor in set(datos):
+        frecuencias[valor] = datos.count(bytes((valor,)))
+    return frecuencias
+
+
+def tabla_bytes(codigos: dict) -> list:
+    """{byte: (codigo, longitud)} -> lista de 256 entradas (None si el byte no aparece)."""
+    tabla = [None] * 256
+    for valor, par in codigos.items():
+        tabla[valor] = par
+    return tabla
+
+
+def codificar_bytes(datos, tabla: list, motor=None):
+    """Empaqueta `datos` con tabla[byte] = (codigo, longitud) -> (bytearray, bits válidos)."""
+    if _usar_numpy(motor) and len(datos):
+        longitud_maxima = max(par[1] for par in tabla if par)
+        if longitud_maxima <= _LONGITUD_MAXIMA_NUMPY:
+            return _codificar_numpy(datos, tabla, longitud_maxima)
+    return _codificar_python(datos, tabla)
+
+
+def _tabla_de_pares(tabla):
+    # Código de dos bytes seguidos indexado como los lee memoryview.cast("H")
+    pares = [None] * 65536
+    presentes = [valor for valor in range(256) if tabla[valor]]
+    little = sys.byteorder == "little"
+    for a in presentes:
+        codigo_a, largo_a = tabla[a]
+        for b in presentes:
+            codigo_b, largo_b = tabla[b]
+            indice = a | (b << 8) if little else (a << 8) | b
+            pares[indice] = ((codigo_a << largo_b) | codigo_b, largo_a + largo_b)
+    return pares
+
+
+def _codificar_python(datos, tabla):
+    # Se codifican dos bytes por búsqueda (el byte impar del final va aparte),
+    # salvo en bloques tan chicos que armar la tabla de pares cuesta más
+    escritor = EscritorBits()
+    n_pares = len(datos) // 2
+    n_presentes = sum(1 for par in tabla if par)
+    if n_pares > n_presentes ** 2:
+        escritor.escribir_simbolos(memoryview(datos)[:2 * n_pares].cast("H"), _tabla_de_pares(tabla))
+        if len(datos) % 2:
+            escritor.escribir(*tabla[datos[-1]])
+    else:
+        escritor.escribir_simbolos(datos, tabla)
+    salida = escritor.cerrar()
+    return salida, escritor.total_bits
+
+
+def _codificar_numpy(datos, tabla, longitud_maxima):
+    codigos = np.zeros(256, dtype=np.uint64)
+    longitudes = np.zeros(256, dtype=np.int64)
+    for valor, par in enumerate(tabla):
+        if par:
+            codigos[valor], longitudes[valor] = par
+
+    simbolos = np.frombuffer(datos, dtype=np.uint8)
+    largos = longitudes[simbolos]
+    fin = np.cumsum(largos)
+    n_bits = int(fin[-1])
+    inicio = fin - largos
+
+    # Cada código se alinea dentro de una ventana de `ancho` bits que empieza en
+    # el byte donde cae su primer bit
+    n_planos = (7 + longitud_maxima + 7) // 8
+    ancho = 8 * n_planos
+    byte_inicial = inicio >> 3
+    corrimiento = (ancho - (inicio & 7) - largos).astype(np.uint64)
+    ventanas = codigos[simbolos] << corrimiento
+
+    # Los bits de códigos distintos no se pisan, así que sumar es lo mismo que
+    # hacer OR; bincount suma cada plano de bytes en su posición de salida
+    # (las ventanas pueden pasarse del final, pero solo con ceros)
+    n_bytes = (n_bits + 7) // 8
+    salida = np.zeros(n_bytes + n_planos, dtype=np.float64)
+    for k in range(n_planos):
+        plano = (ventanas >> np.uint64(ancho - 8 * (k + 1))) & np.uint64(0xFF)
+        salida += np.bincount(byte_inicial + k, weights=plano, minlength=n_bytes + n_planos)
+    return bytearray(salida[:n_bytes].astype(np.uint8).tobytes()), n_bits
+
+
+def longitudes_bytes(frecuencias, max_code_len=LONGITUD_MAXIMA):
+    """Histograma de 256 entradas -> ({byte: longitud}, pérdida por el límite)."""
+    presentes = {valor: f for valor, f in enumerate(frecuencias) if f}
+    longitudes, perdida = longitudes_huffman(presentes), 0.0
+    if max_code_len is not None:
+        longitudes, perdida = limitar_longitudes(presentes, longitudes, max_code_len)
+    return longitudes, perdida
+
+
+def comprimir_bytes(datos, max_code_len=LONGITUD_MAXIMA, motor=None, metricas=SIN_METRICAS):
+    """Devuelve (bytes empaquetados, bits válidos, longitudes {byte: largo}, pérdida por el límite)."""
+    with metricas.etapa("frecuencias"):
+        frecuencias = frecuencias_bytes(datos, motor)
+    with metricas.etapa("arbol"):
+        longitudes, perdida = longitudes_bytes(frecuencias, max_code_len)
+    with metricas.etapa("codificacion"):
+        salida, n_bits = codificar_bytes(datos, tabla_bytes(codigos_canonicos(longitudes)), motor)
+    return salida, n_bits, longitudes, perdida
+
+
+def _trozo_latin1(simbolos):
+    return bytes(simbolos).decode("latin-1")
+
+
+@lru_cache(maxsize=2)
+def _decodificador(longitudes):
+    # Armar la tabla cuesta más que decodificar un bloque chico: cuando muchos
+    # bloques comparten longitudes (teselas de una imagen) se arma una sola vez
+    return DecodificadorTabla(codigos_canonicos(dict(longitudes)), unir=_trozo_latin1)
+
+
+def descomprimir_bytes(datos, n_bits, longitudes):
+    """Inverso de comprimir_bytes -> bytes originales.
+
+    Los trozos de la tabla se guardan como str latin-1 (un carácter por byte):
+    ''.join y encode("latin-1") son bastante más rápidos que b''.join sobre
+    cientos de miles de bytes sueltos.
+    """
+    decodificador = _decodificador(tuple(sorted(longitudes.items())))
+    return "".join(decodificador.decodificar(datos, n_bits)).encode("latin-1")
+
+
+def comprimir_a_bloque(datos, max_code_len=LONGITUD_MAXIMA) -> bytes:
+    """comprimir_bytes empaquetado con su cabecera de longitudes, listo para el contenedor."""
+    empaquetados, n_bits, longitudes, _ = comprimir_bytes(datos, max_code_len)
+    return empaquetar_bloque(n_bits, serializar_longitudes(longitudes), empaquetados)
+
+
+def descomprimir_de_bloque(bloque) -> bytes:
+    """Inverso de comprimir_a_bloque."""
+    n_bits, cabecera, datos = desempaquetar_bloque(bloque)
+    longitudes, _ = deserializar_longitudes(cabecera)
+    return descomprimir_bytes(datos, n_bits, longitudes)
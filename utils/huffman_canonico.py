@@ -0,0 +1,269 @@
+"""Códigos de Huffman canónicos y su cabecera compacta de longitudes.
+
+Con un código canónico basta guardar la longitud del código de cada símbolo:
+los códigos se reasignan en orden (longitud, símbolo), de modo que el
+decodificador los reconstruye exactamente igual que el codificador.
+"""
+import heapq
+import struct
+
+from utils.bits import escribir_varint, leer_varint
+
+# Longitud máxima de código que usan por defecto los compresores del proyecto.
+LONGITUD_MAXIMA = 20
+
+
+def longitudes_huffman(frecuencias: dict) -> dict:
+    """Longitudes de Huffman sin armar nodos: solo un heap y un arreglo de padres."""
+    simbolos = list(frecuencias)
+    n = len(simbolos)
+    if n <= 1:
+        return {s: 1 for s in simbolos}
+    heap = [(frecuencias[s], i) for i, s in enumerate(simbolos)]
+    heapq.heapify(heap)
+    padres = [0] * (2 * n - 1)
+    siguiente = n
+    while len(heap) > 1:
+        f1, a = heapq.heappop(heap)
+        f2, b = heapq.heappop(heap)
+        padres[a] = padres[b] = siguiente
+        heapq.heappush(heap, (f1 + f2, siguiente))
+        siguiente += 1
+    # Los nodos internos se crean en orden, así que el padre siempre tiene índice mayor
+    profundidad = [0] * (2 * n - 1)
+    for i in range(2 * n - 3, -1, -1):
+        profundidad[i] = profundidad[padres[i]] + 1
+    return {s: profundidad[i] for i, s in enumerate(simbolos)}
+
+
+def longitudes_limitadas(frecuencias: dict, max_longitud: int) -> dict:
+    """Longitudes óptimas con tope `max_longitud` (algoritmo package-merge).
+
+    Cada nivel empaqueta de a pares la lista anterior y la mezcla con las
+    hojas; de la lista final se toman los 2n-2 elementos más livianos y la
+    longitud de cada símbolo es la cantidad de veces que aparece en ellos.
+    """
+    n = len(frecuencias)
+    if n == 0:
+        return {}
+    if n == 1:
+        return {next(iter(frecuencias)): 1}
+    if n > (1 << max_longitud):
+        raise ValueError(f"{n} símbolos no caben en códigos de {max_longitud} bits")
+
+    simbolos = sorted(frecuencias, key=lambda s: frecuencias[s])
+    # Un elemento es (peso, nodo): el nodo es el índice de una hoja o un par de nodos
+    hojas = [(frecuencias[s], i) for i, s in enumerate(simbolos)]
+    lista = hojas
+    for _ in range(max_longitud - 1):
+        paquetes = [(lista[j][0] + lista[j + 1][0], (lista[j][1], lista[j + 1][1]))
+                    for j in range(0, len(lista) - 1, 2)]
+        lista = list(heapq.merge(hojas, paquetes, key=lambda elemento: elemento[0]))
+
+    cuentas = [0] * n
+    pendientes = [nodo for _, nodo in lista[:2 * n - 2]]
+    while pendientes:
+        nodo = pendientes.pop()
+        if isinstance(nodo, tuple):
+            pendientes.extend(nodo)
+        else:
+            cuentas[nodo] += 1
+    return {s: cuentas[i] for i, s in enumerate(simbolos)}
+
+
+def bits_totales(frecuencias: dict, longitudes: dict) -> int:
+    return sum(f * longitudes[s] for s, f in frecuencias.items())
+
+
+def limitar_longitudes(frecuencias: dict, longitudes: dict, max_longitud: int):
+    """Aplica el tope solo si hace falta -> (longitudes, pérdida relativa de ratio).
+
+    La pérdida es cuántos bits de más ocupa el flujo respecto del Huffman sin
+    límite (0.01 = 1 % más grande).
+    """
+    if not longitudes or max(longitudes.values()) <= max_longitud:
+        return longitudes, 0.0
+    limitadas = longitudes_limitadas(frecuencias, max_longitud)
+    libres = bits_totales(frecuencias, longitudes)
+    return limitadas, bits_totales(frecuencias, limitadas) / libres - 1
+
+
+def codigos_canonicos(longitudes: dict) -> dict:
+    """{simbolo: longitud} -> {simbolo: (codigo, longitud)}."""
+    tabla = {}
+    codigo = 0
+    longitud_previa = 0
+    for simbolo, longitud in sorted(longitudes.items(), key=lambda par: (par[1], par[0])):
+        codigo <<= longitud - longitud_previa
+        tabla[simbolo] = (codigo, longitud)
+        codigo += 1
+        longitud_previa = longitud
+    return tabla
+
+
+def codigos_como_texto(tabla: dict) -> dict:
+    """{simbolo: (codigo, longitud)} -> {simbolo: '0101'}."""
+    return {s: format(codigo, f"0{longitud}b") for s, (codigo, longitud) in tabla.items()}
+
+
+def serializar_longitudes(longitudes: dict) -> bytes:
+    """Cabecera: cantidad de símbolos y pares (delta del símbolo, longitud).
+
+    Los símbolos deben ser enteros no negativos; se guardan ordenados y como
+    diferencia con el anterior, así que un alfabeto típico ocupa unos 2 bytes
+    por símbolo.
+    """
+    salida = bytearray()
+    escribir_varint(salida, len(longitudes))
+    previo = 0
+    for simbolo in sorted(longitudes):
+        escribir_varint(salida, simbolo - previo)
+        salida.append(longitudes[simbolo])
+        previo = simbolo
+    return bytes(salida)
+
+
+def deserializar_longitudes(datos, pos: int = 0):
+    """Inverso de serializar_longitudes -> ({simbolo: longitud}, posición final)."""
+    cantidad, pos = leer_varint(datos, pos)
+    longitudes = {}
+    simbolo = 0
+    for _ in range(cantidad):
+        delta, pos = leer_varint(datos, pos)
+        simbolo += delta
+        longitudes[simbolo] = datos[pos]
+        pos += 1
+    return longitudes, pos
+
+
+def _combinar(transiciones):
+    """Transiciones de k bits -> las de 2k bits.
+
+    transiciones[estado][valor] es (símbolos emitidos, estado siguiente) o
+    None si el camino no existe en el árbol."""
+    mitad = len(transiciones[0])
+    combinadas = []
+    for fila in transiciones:
+        nueva = []
+        for alto in fila:
+            if alto is None:
+                nueva.extend([None] * mitad)
+                continue
+            emitidos, siguiente = alto
+            for bajo in transiciones[siguiente]:
+                nueva.append(None if bajo is None else (emitidos + bajo[0], bajo[1]))
+        combinadas.append(nueva)
+    return combinadas
+
+
+class DecodificadorTabla:
+    """Decodificador de Huffman por tabla que consume un byte completo por búsqueda.
+
+    El estado es el nodo interno del árbol en el que quedó el código a medias,
+    y tabla[estado][byte] da todos los símbolos que se completan con esos 8
+    bits junto con el estado siguiente. Así una búsqueda emite cero, uno o
+    varios símbolos y los códigos largos no necesitan un camino lento: quedan
+    repartidos entre búsquedas. Sirve para cualquier código prefijo, no solo
+    para los canónicos.
+
+    Si se pasa `unir` (por ejemplo ''.join o bytes), cada entrada se guarda ya
+    unida y la salida es una lista de trozos en vez de símbolos sueltos.
+
+    Con alfabetos de más de 256 símbolos (texto CJK) la tabla de 256 entradas
+    por nodo interno tarda más en armarse que lo que ahorra al decodificar un
+    bloque; por encima de MAX_ESTADOS_TABLA_BYTE nodos se usan transiciones
+    de 4 bits (16 entradas por nodo y dos búsquedas por byte).
+    """
+
+    MAX_ESTADOS_TABLA_BYTE = 256
+
+    def __init__(self, tabla: dict, unir=None):
+        """`tabla` es {simbolo: (codigo, longitud)}."""
+        self._unir = unir
+        # hijos[n] = [izq, der]; un entero >= 0 es un nodo interno y ~i es la hoja i
+        hijos = [[None, None]]
+        simbolos = []
+        for simbolo, (codigo, longitud) in tabla.items():
+            nodo = 0
+            for d in range(longitud - 1, 0, -1):
+                bit = (codigo >> d) & 1
+                if hijos[nodo][bit] is None:
+                    hijos.append([None, None])
+                    hijos[nodo][bit] = len(hijos) - 1
+                nodo = hijos[nodo][bit]
+            hijos[nodo][codigo & 1] = ~len(simbolos)
+            simbolos.append(simbolo)
+        self._hijos = hijos
+        self._simbolos = simbolos
+
+        # Transiciones de 1 bit y, combinando de a dos, las de 2, 4 y 8 bits
+        unos = [[None if hijo is None else ((), hijo) if hijo >= 0 else ((simbolos[~hijo],), 0)
+                 for hijo in izq_der] for izq_der in hijos]
+        tabla = _combinar(_combinar(unos))
+        self._por_byte = len(hijos) <= self.MAX_ESTADOS_TABLA_BYTE
+        if self._por_byte:
+            tabla = _combinar(tabla)
+        if unir:
+            tabla = [[par and (unir(par[0]), par[1]) for par in fila] for fila in tabla]
+        self._filas = tabla
+
+    def _recorrer(self, estado, valor, n_bits):
+        # Baja n_bits bits por el árbol; None si el camino no existe
+        salida = []
+        for d in range(n_bits - 1, -1, -1):
+            siguiente = self._hijos[estado][(valor >> d) & 1]
+            if siguiente is None:
+                return None
+            if siguiente < 0:
+                salida.append(self._simbolos[~siguiente])
+                siguiente = 0
+            estado = siguiente
+        return tuple(salida), estado
+
+    def decodificar(self, datos, n_bits: int) -> list:
+        """Decodifica los primeros `n_bits` bits de `datos`."""
+        filas = self._filas
+        salida = []
+        agregar = salida.append if self._unir else salida.extend
+        completos, sobran = divmod(n_bits, 8)
+        estado = 0
+        try:
+            if self._por_byte:
+                for byte in datos[:completos]:
+                    simbolos, estado = filas[estado][byte]
+                    agregar(simbolos)
+            else:
+                for byte in datos[:completos]:
+                    simbolos, estado = filas[estado][byte >> 4]
+                    agregar(simbolos)
+                    simbolos, estado = filas[estado][byte & 15]
+                    agregar(simbolos)
+        except TypeError:
+            raise ValueError("Flujo de bits inválido para la tabla de Huffman") from None
+
+        if sobran:
+            # Último byte incompleto: solo los bits válidos, sin el relleno
+            par = self._recorrer(estado, datos[completos] >> (8 - sobran), sobran)
+            if par is None:
+                raise ValueError("Flujo de bits inválido para la tabla de Huffman")
+            simbolos, estado = par
+            agregar(self._unir(simbolos) if self._unir else simbolos)
+        if estado != 0:
+            raise ValueError("Flujo de bits incompleto: el último código quedó cortado")
+        return salida
+
+
+# Bloque Huffman dentro del contenedor: n_bits (Q), largo de la cabecera (I),
+# cabecera de longitudes y los bits empaquetados.
+_BLOQUE = struct.Struct("<QI")
+
+
+def empaquetar_bloque(n_bits: int, cabecera: bytes, datos) -> bytes:
+    return _BLOQUE.pack(n_bits, len(cabecera)) + cabecera + bytes(datos)
+
+
+def desempaquetar_bloque(bloque):
+    """bytes/memoryview -> (n_bits, cabecera de longitudes, datos)."""
+    n_bits, largo_cabecera = _BLOQUE.unpack_from(bloque, 0)
+    inicio = _BLOQUE.size
+    return n_bits, bloque[inicio:inicio + largo_cabecera], bloque[inicio + largo_cabecera:]
@@ -0,0 +1,171 @@
+"""Métricas de una compresión o descompresión: tiempo por etapa, bytes y símbolos.
+
+Los puntos de entrada de los códecs aceptan `metricas=Metricas()`; sin ese
+argumento usan SIN_METRICAS, que tiene la misma interfaz y no mide nada.
+
+    metricas = Metricas(usuario="ana")
+    comprimir_archivo_txt("libro.txt", "libro.bin", metricas=metricas)
+    print(metricas.resumen())
+    metricas.exportar_jsonl("metricas.jsonl")
+
+Las etapas se pueden anidar y cada una cuenta solo su tiempo propio (sin el
+de las etapas de adentro), así la suma de las etapas no pasa del total.
+Cuando el trabajo se reparte entre procesos, cada proceso mide sus etapas y
+se suman con sumar_etapas(): en ese caso son tiempo de CPU sumado y pueden
+superar al total.
+
+Si la variable de entorno COMPRESOR_METRICAS tiene una ruta, exportar_jsonl()
+sin argumentos agrega ahí una línea JSON por operación.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+VARIABLE_ENTORNO = "COMPRESOR_METRICAS"
+
+# Cómo se muestran los contadores en resumen() (los demás, con su nombre)
+_NOMBRES = {"simbolos": "Símbolos", "simbolos_distintos": "Símbolos distintos", "pixeles": "Píxeles",
+            "muestras": "Muestras", "tramas": "Tramas", "teselas": "Teselas", "bloques": "Bloques"}
+
+
+class Metricas:
+
+    def __init__(self, **etiquetas):
+        # Datos libres que se exportan tal cual (archivo, usuario, máquina...)
+        self.etiquetas = etiquetas
+        self.operacion = None
+        self.codec = None
+        self.fecha = None
+        self.segundos = 0.0
+        self.etapas = {}
+        self.contadores = {}
+        self._inicio = None
+        # Tiempo de las etapas hijas de cada etapa abierta
+        self._pila = []
+
+    def comenzar(self, operacion: str, codec: str, **etiquetas):
+        """Marca el inicio de la operación (la llama el códec)."""
+        self.operacion = operacion
+        self.codec = codec
+        self.etiquetas.update(etiquetas)
+        self.fecha = datetime.now().isoformat(timespec="seconds")
+        self._inicio = time.perf_counter()
+
+    def etiquetar(self, **etiquetas):
+        self.etiquetas.update(etiquetas)
+
+    def terminar(self):
+        if self._inicio is not None:
+            self.segundos += time.perf_counter() - self._inicio
+            self._inicio = None
+
+    @contextmanager
+    def etapa(self, nombre: str):
+        self._pila.append(0.0)
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            transcurrido = time.perf_counter() - inicio
+            hijas = self._pila.pop()
+            self.etapas[nombre] = self.etapas.get(nombre, 0.0) + transcurrido - hijas
+            if self._pila:
+                self._pila[-1] += transcurrido
+
+    def iterar(self, nombre: str, iterable):
+        """Recorre `iterable` contando el tiempo de cada paso en la etapa `nombre`.
+
+        Sirve para lectores y decodificadores perezosos, que hacen su trabajo
+        recién cuando se les pide el siguiente elemento.
+        """
+        iterador = iter(iterable)
+        while True:
+            with self.etapa(nombre):
+                try:
+                    elemento = next(iterador)
+                except StopIteration:
+                    return
+            yield elemento
+
+    def sumar_etapas(self, etapas: dict):
+        """Agrega etapas medidas aparte (por ejemplo en otro proceso)."""
+        for nombre, segundos in etapas.items():
+            self.etapas[nombre] = self.etapas.get(nombre, 0.0) + segundos
+
+    def contar(self, nombre: str, cantidad=1):
+        self.contadores[nombre] = self.contadores.get(nombre, 0) + cantidad
+
+    def maximo(self, nombre: str, valor):
+        self.contadores[nombre] = max(self.contadores.get(nombre, valor), valor)
+
+    def como_dict(self) -> dict:
+        return {
+            "fecha": self.fecha,
+            "operacion": self.operacion,
+            "codec": self.codec,
+            **self.etiquetas,
+            "segundos": round(self.segundos, 6),
+            "etapas": {nombre: round(segundos, 6) for nombre, segundos in self.etapas.items()},
+            "contadores": dict(self.contadores),
+        }
+
+    def resumen(self) -> str:
+        """Texto de varias líneas para mostrar en la interfaz."""
+        lineas = [f"Tiempo total: {self.segundos:.3f} s"]
+        for nombre, segundos in sorted(self.etapas.items(), key=lambda e: -e[1]):
+            parte = f" ({segundos / self.segundos:.0%})" if self.segundos else ""
+            lineas.append(f"  {nombre}: {segundos:.3f} s{parte}")
+        entrada = self.contadores.get("bytes_entrada")
+        salida = self.contadores.get("bytes_salida")
+        if entrada is not None and salida is not None:
+            lineas.append(f"Bytes: {entrada} -> {salida}")
+            # La velocidad siempre sobre el tamaño sin comprimir
+            original = salida if self.operacion == "descomprimir" else entrada
+            if self.segundos:
+                lineas.append(f"Velocidad: {original / self.segundos / 1e6:.2f} MB/s")
+        for nombre, valor in self.contadores.items():
+            if nombre not in ("bytes_entrada", "bytes_salida"):
+                lineas.append(f"{_NOMBRES.get(nombre, nombre)}: {valor}")
+        return "\n".join(lineas)
+
+    def exportar_jsonl(self, ruta: str = None) -> bool:
+        """Agrega una línea JSON a `ruta` (o a la de COMPRESOR_METRICAS); False si no hay ruta."""
+        ruta = ruta or os.environ.get(VARIABLE_ENTORNO)
+        if not ruta:
+            return False
+        with open(ruta, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.como_dict(), ensure_ascii=False) + "\n")
+        return True
+
+
+class _SinMetricas:
+    # Misma interfaz que Metricas, sin medir nada
+
+    def comenzar(self, operacion, codec, **etiquetas):
+        pass
+
+    def etiquetar(self, **etiquetas):
+        pass
+
+    def terminar(self):
+        pass
+
+    def etapa(self, nombre):
+        return nullcontext()
+
+    def iterar(self, nombre, iterable):
+        return iterable
+
+    def sumar_etapas(self, etapas):
+        pass
+
+    def contar(self, nombre, cantidad=1):
+        pass
+
+    def maximo(self, nombre, valor):
+        pass
+
+
+SIN_METRICAS = _SinMetricas()
@@ -0,0 +1,77 @@
+"""Operaciones de cada códec con una firma común, para main.py y los benchmarks.
+
+Cada operación recibe la entrada, la ruta de salida, los procesos del
+códec, las métricas y un diccionario de opciones de la línea de comandos
+(las que no usa las ignora), y devuelve la ruta que escribió. Junto a cada
+par comprimir/descomprimir va la función que decide si lo descomprimido es
+igual al original. Los códecs se importan recién al usarlos.
+"""
+
+
+def _comprimir_texto(entrada, salida, n_procesos, metricas, opciones):
+    from compresion_texto.gestor_archivos_texto import comprimir_archivo_txt
+    comprimir_archivo_txt(entrada, salida, n_procesos=n_procesos, metricas=metricas)
+    return salida
+
+
+def _descomprimir_texto(entrada, salida, n_procesos, metricas, opciones):
+    from compresion_texto.gestor_archivos_texto import descomprimir_archivo_txt
+    descomprimir_archivo_txt(entrada, salida, n_procesos=n_procesos, metricas=metricas,
+                             legado=opciones.get("legado", False))
+    return salida
+
+
+def _comprimir_imagen(entrada, salida, n_procesos, metricas, opciones):
+    from compresion_imagen.rle_imagen import comprimir_a_rlebits
+    return comprimir_a_rlebits(entrada, n_procesos=n_procesos, vista_previa=opciones.get("vista_previa", True),
+                               metricas=metricas, ruta_salida=salida)
+
+
+def _descomprimir_imagen(entrada, salida, n_procesos, metricas, opciones):
+    from compresion_imagen.rle_imagen import descomprimir_rlebits
+    return descomprimir_rlebits(entrada, n_procesos=n_procesos, metricas=metricas, ruta_salida=salida)
+
+
+def _comprimir_audio(entrada, salida, n_procesos, metricas, opciones):
+    from compresion_audio.huffman_audio import CompresionAudio
+    return CompresionAudio(entrada).comprimir(salida, crear_copia_wav=False, n_procesos=n_procesos,
+                                              metricas=metricas)["flac"]
+
+
+def _descomprimir_audio(entrada, salida, n_procesos, metricas, opciones):
+    from compresion_audio.huffman_audio import CompresionAudio
+    return CompresionAudio(entrada).extraerArchivo(entrada, salida, n_procesos=n_procesos, metricas=metricas,
+                                                   legado=opciones.get("legado", False))
+
+
+def iguales_bytes(original, resultado) -> bool:
+    """True si los dos archivos tienen exactamente los mismos bytes."""
+    with open(original, "rb") as a, open(resultado, "rb") as b:
+        return a.read() == b.read()
+
+
+def _contenido_imagen(imagen):
+    # Lo que conservan los modos raster y paleta: todo menos cómo está codificado el archivo
+    info = {clave: valor for clave, valor in imagen.info.items() if clave not in ("compression", "interlace")}
+    return imagen.size, imagen.mode, imagen.getpalette(), info, imagen.tobytes()
+
+
+def iguales_pixeles(original, resultado) -> bool:
+    """True si las dos imágenes tienen los mismos bytes o, si no, el mismo
+    tamaño, modo, paleta, metadatos y píxeles: los modos raster y paleta
+    conservan todo eso pero no los bytes del archivo."""
+    if iguales_bytes(original, resultado):
+        return True
+    from PIL import Image
+    with Image.open(original) as a, Image.open(resultado) as b:
+        return _contenido_imagen(a) == _contenido_imagen(b)
+
+
+CODECS = {
+    "texto": (_comprimir_texto, _descomprimir_texto, iguales_bytes),
+    "imagen": (_comprimir_imagen, _descomprimir_imagen, iguales_pixeles),
+    "audio": (_comprimir_audio, _descomprimir_audio, iguales_bytes),
+}
+
+# Extensión que se agrega al comprimir con cada códec
+EXTENSIONES = {"texto": ".bin", "imagen": ".rlebits", "audio": ".flac"}
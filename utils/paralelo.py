@@ -0,0 +1,48 @@
+"""Reparto de trabajo independiente (bloques, tramas, teselas) entre procesos."""
+import os
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+
+
+def cantidad_procesos(n_procesos=None):
+    """None -> todos los núcleos; siempre al menos 1."""
+    if n_procesos is None:
+        n_procesos = os.cpu_count() or 1
+    return max(1, int(n_procesos))
+
+
+def mapear_en_orden(funcion, elementos, n_procesos=1, en_vuelo=None):
+    """Como map(funcion, elementos) pero repartido en un ProcessPoolExecutor.
+
+    Los resultados salen en el mismo orden de entrada y solo hay `en_vuelo`
+    elementos enviados a la vez (por defecto 2 por proceso), así la memoria no
+    depende de cuántos elementos haya. Con un solo proceso no se crea el pool.
+    `funcion` debe poder serializarse con pickle (función de módulo o partial).
+    """
+    n_procesos = cantidad_procesos(n_procesos)
+    if n_procesos == 1:
+        for elemento in elementos:
+            yield funcion(elemento)
+        return
+
+    en_vuelo = en_vuelo or 2 * n_procesos
+    with ProcessPoolExecutor(max_workers=n_procesos) as pool:
+        pendientes = deque()
+        for elemento in elementos:
+            pendientes.append(pool.submit(funcion, elemento))
+            if len(pendientes) >= en_vuelo:
+                yield pendientes.popleft().result()
+        while pendientes:
+            yield pendientes.popleft().result()
+
+
+def en_lotes(elementos, tam: int):
+    """Agrupa `elementos` en listas de hasta `tam`, para mandar varios por tarea
+    cuando cada uno es chico y pasarlo a otro proceso cuesta más que procesarlo."""
+    elementos = iter(elementos)
+    while True:
+        lote = list(islice(elementos, tam))
+        if not lote:
+            return
+        yield lote
@@ -0,0 +1,134 @@
+"""Códigos de Rice con parámetro adaptativo por partición (necesita NumPy).
+
+Un valor no negativo `u` con parámetro `k` se codifica como el cociente
+q = u >> k en unario (q ceros y un 1) seguido de los k bits bajos de u.
+Los residuos de un bloque se dividen en 2**p particiones iguales y cada una
+lleva su propio k; se elige la división y los k que dan menos bits.
+
+Para poder codificar y decodificar sin recorrer los valores uno por uno, las
+dos mitades de cada código van en secciones separadas: primero todos los
+cocientes en unario y después todos los bits bajos. Los bits totales son los
+mismos que con los códigos intercalados.
+
+    Sección de residuos
+        p             B       orden de partición
+        k             B * 2**p
+        largo_unario  varint  bytes de la sección unaria
+        unario        cocientes en unario, MSB primero
+        bits bajos    los k bits bajos de cada valor, partición tras partición
+"""
+from utils.bits import escribir_varint, leer_varint
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Como mucho 2**ORDEN_PARTICION_MAXIMO particiones, de al menos _MIN_PARTICION valores
+ORDEN_PARTICION_MAXIMO = 4
+_MIN_PARTICION = 64
+
+
+def zigzag(valores):
+    """Enteros con signo -> no negativos (0, -1, 1, -2... -> 0, 1, 2, 3...)."""
+    valores = valores.astype(np.int64)
+    return (valores << 1) ^ (valores >> 63)
+
+
+def deshacer_zigzag(valores):
+    return (valores >> 1) ^ -(valores & 1)
+
+
+def _limites(n, orden):
+    particiones = 1 << orden
+    return (np.arange(particiones + 1) * n) // particiones
+
+
+def parametros_rice(u):
+    """-> (bits aproximados, orden de partición, lista de k) que minimizan el tamaño de `u`."""
+    n = len(u)
+    orden_maximo = 0
+    while orden_maximo < ORDEN_PARTICION_MAXIMO and (n >> (orden_maximo + 1)) >= _MIN_PARTICION:
+        orden_maximo += 1
+    limites = _limites(n, orden_maximo)
+    tamanos = np.diff(limites)
+    # El k óptimo de una partición está cerca de log2 de su media, así que
+    # solo se prueban los k entre la menor y la mayor estimación (±1)
+    sumas = np.add.reduceat(u, limites[:-1])
+    estimados = [max(int(m).bit_length() - 1, 0) for m in (sumas // tamanos).tolist()]
+    k_minimo, k_maximo = max(min(estimados) - 1, 0), max(estimados) + 1
+    # costos[k - k_minimo, i] = bits de la partición fina i con parámetro k
+    costos = np.empty((k_maximo - k_minimo + 1, len(tamanos)), dtype=np.int64)
+    for k in range(k_minimo, k_maximo + 1):
+        costos[k - k_minimo] = np.add.reduceat(u >> k, limites[:-1]) + tamanos * (k + 1)
+
+    mejor = None
+    for orden in range(orden_maximo, -1, -1):
+        if orden < orden_maximo:
+            # Dos particiones vecinas forman una del orden siguiente
+            costos = costos[:, 0::2] + costos[:, 1::2]
+        parametros = costos.argmin(axis=0) + k_minimo
+        bits = int(costos.min(axis=0).sum()) + 8 * len(parametros)
+        if mejor is None or bits < mejor[0]:
+            mejor = (bits, orden, parametros.tolist())
+    return mejor
+
+
+def codificar_rice(salida: bytearray, u, parametros=None):
+    """Agrega a `salida` la sección de residuos de los valores no negativos `u` (arreglo int64).
+
+    `parametros` es el resultado de parametros_rice(u), si ya se calculó.
+    """
+    _, orden, parametros = parametros or parametros_rice(u)
+    limites = _limites(len(u), orden)
+    salida.append(orden)
+    salida += bytes(parametros)
+
+    ks = np.repeat(np.array(parametros, dtype=np.int64), np.diff(limites))
+    cocientes = u >> ks
+    unos = np.cumsum(cocientes + 1) - 1
+    unario = np.zeros(int(unos[-1]) + 1 if len(u) else 0, dtype=np.uint8)
+    unario[unos] = 1
+    unario = np.packbits(unario).tobytes()
+    escribir_varint(salida, len(unario))
+    salida += unario
+
+    planos = []
+    for k, inicio, fin in zip(parametros, limites[:-1], limites[1:]):
+        if k:
+            bajos = u[inicio:fin, None] >> np.arange(k - 1, -1, -1, dtype=np.int64)
+            planos.append((bajos & 1).astype(np.uint8).ravel())
+    if planos:
+        salida += np.packbits(np.concatenate(planos)).tobytes()
+
+
+def decodificar_rice(datos, pos: int, n: int):
+    """Inverso de codificar_rice -> (n valores no negativos, posición siguiente)."""
+    orden = datos[pos]
+    particiones = 1 << orden
+    parametros = list(datos[pos + 1:pos + 1 + particiones])
+    largo_unario, pos = leer_varint(datos, pos + 1 + particiones)
+    unario = np.unpackbits(np.frombuffer(datos, dtype=np.uint8, count=largo_unario, offset=pos))
+    pos += largo_unario
+    unos = np.flatnonzero(unario)[:n]
+    if len(unos) < n:
+        raise ValueError("Sección de residuos truncada")
+    cocientes = np.diff(unos, prepend=-1) - 1
+
+    limites = _limites(n, orden)
+    tamanos = np.diff(limites)
+    bits_bajos = int(np.dot(tamanos, parametros))
+    largo_bajos = (bits_bajos + 7) // 8
+    bajos = np.unpackbits(np.frombuffer(datos, dtype=np.uint8, count=largo_bajos, offset=pos))
+    pos += largo_bajos
+
+    valores = cocientes.astype(np.int64)
+    bit = 0
+    for k, inicio, fin in zip(parametros, limites[:-1], limites[1:]):
+        if k:
+            cantidad = (fin - inicio) * k
+            plano = bajos[bit:bit + cantidad].reshape(-1, k).astype(np.int64)
+            bit += cantidad
+            pesos = np.int64(1) << np.arange(k - 1, -1, -1, dtype=np.int64)
+            valores[inicio:fin] = (valores[inicio:fin] << k) | (plano @ pesos)
+    return valores, pos
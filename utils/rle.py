@@ -0,0 +1,90 @@
+"""RLE binario por bytes al estilo PackBits.
+
+El flujo es una serie de paquetes, cada uno con una cabecera varint `h`:
+
+    h par    literal: siguen (h >> 1) + 1 bytes copiados tal cual
+    h impar  repetición: sigue 1 byte que se repite (h >> 1) + MIN_REPETICION veces
+
+Solo las rachas de MIN_REPETICION bytes o más se guardan como repetición;
+lo demás va en literales, así que un archivo sin rachas crece apenas unos
+bytes de cabecera. Las rachas se buscan con NumPy si está instalado o con
+una expresión regular sobre los bytes (ambas dan la misma salida).
+"""
+import re
+
+from utils.bits import escribir_varint, leer_varint
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MIN_REPETICION = 3
+
+_RACHA = re.compile(rb"(.)\1{%d,}" % (MIN_REPETICION - 1), re.DOTALL)
+
+
+def _rachas_numpy(datos):
+    # Inicio y fin de cada racha máxima de bytes iguales, quedándose con las largas
+    arreglo = np.frombuffer(datos, dtype=np.uint8)
+    cambios = np.flatnonzero(arreglo[1:] != arreglo[:-1]) + 1
+    inicios = np.concatenate(([0], cambios))
+    fines = np.concatenate((cambios, [len(arreglo)]))
+    largas = fines - inicios >= MIN_REPETICION
+    return zip(inicios[largas].tolist(), fines[largas].tolist())
+
+
+def _rachas_regex(datos):
+    return (coincidencia.span() for coincidencia in _RACHA.finditer(datos))
+
+
+def _agregar_literal(salida, datos, inicio, fin):
+    if fin > inicio:
+        escribir_varint(salida, (fin - inicio - 1) << 1)
+        salida += datos[inicio:fin]
+
+
+def codificar_rle(datos) -> bytes:
+    """Bytes -> flujo de paquetes literal/repetición."""
+    datos = bytes(datos)
+    if not datos:
+        return b""
+    rachas = _rachas_numpy(datos) if np is not None else _rachas_regex(datos)
+    salida = bytearray()
+    posicion = 0
+    for inicio, fin in rachas:
+        _agregar_literal(salida, datos, posicion, inicio)
+        escribir_varint(salida, ((fin - inicio - MIN_REPETICION) << 1) | 1)
+        salida.append(datos[inicio])
+        posicion = fin
+    _agregar_literal(salida, datos, posicion, len(datos))
+    return bytes(salida)
+
+
+def decodificar_rle(datos, largo: int) -> bytearray:
+    """Inverso de codificar_rle; `largo` es el tamaño original, para reservar la salida de una vez."""
+    salida = bytearray(largo)
+    posicion = 0
+    i = 0
+    n = len(datos)
+    try:
+        while i < n:
+            cabecera = datos[i]
+            if cabecera < 0x80:
+                i += 1
+            else:
+                cabecera, i = leer_varint(datos, i)
+            if cabecera & 1:
+                cantidad = (cabecera >> 1) + MIN_REPETICION
+                salida[posicion:posicion + cantidad] = bytes((datos[i],)) * cantidad
+                i += 1
+            else:
+                cantidad = (cabecera >> 1) + 1
+                salida[posicion:posicion + cantidad] = datos[i:i + cantidad]
+                i += cantidad
+            posicion += cantidad
+    except IndexError:
+        raise ValueError("Flujo RLE truncado") from None
+    if posicion != largo or len(salida) != largo or i != n:
+        raise ValueError("El flujo RLE no coincide con el tamaño original")
+    return salida
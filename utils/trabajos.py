@@ -0,0 +1,215 @@
+"""Cola de trabajos en segundo plano para la interfaz.
+
+Con archivos grandes los códecs tardan minutos; si corren dentro de un
+callback de Tk la ventana se congela hasta que terminan. ColaTrabajos los
+corre de a uno en un hilo aparte y avisa del avance y del final en el hilo
+de Tk, revisando cada tanto con `after()` (Tk no se puede usar desde otros
+hilos).
+
+Los puntos de entrada de los códecs aceptan `progreso=funcion(hechos, total)`
+y la llaman después de cada bloque, trama o tesela. La cola les pasa una que
+guarda el avance y que, si el trabajo se canceló, lanza Cancelado: así la
+cancelación corta el códec en el bloque siguiente.
+
+    cola = ColaTrabajos(ventana, al_cambiar=actualizar_barra)
+    cola.agregar("libro.txt", comprimir_archivo_txt, "libro.txt", "libro.bin",
+                 al_terminar=mostrar_resultado)
+
+Las ventanas que muestran el avance en una barra, una etiqueta y un botón de
+cancelar arman la cola con `cola_con_avance`.
+"""
+import os
+import queue
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+PENDIENTE, CORRIENDO, HECHO, ERROR, CANCELADO = "pendiente", "corriendo", "hecho", "error", "cancelado"
+
+
+class Cancelado(Exception):
+    """El trabajo se canceló antes de terminar."""
+
+
+def sin_progreso(hechos, total):
+    """Valor por defecto de `progreso` en los códecs: no hace nada."""
+
+
+@contextmanager
+def borrar_si_falla(ruta):
+    """Borra `ruta` si el bloque termina con una excepción (también Cancelado),
+    para no dejar archivos escritos a medias."""
+    try:
+        yield
+    except BaseException:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        raise
+
+
+class Trabajo:
+
+    def __init__(self, nombre, funcion, args, kwargs, al_terminar=None):
+        self.nombre = nombre
+        self.estado = PENDIENTE
+        self.hechos = 0
+        self.total = 0
+        self.resultado = None
+        self.error = None
+        self.al_terminar = al_terminar
+        self._funcion = funcion
+        self._args = args
+        self._kwargs = kwargs
+        self._cancelado = threading.Event()
+
+    @property
+    def fraccion(self) -> float:
+        return min(self.hechos / self.total, 1.0) if self.total else 0.0
+
+    def _progreso(self, hechos, total):
+        # Corre en el hilo del trabajo, llamada desde el códec
+        if self._cancelado.is_set():
+            raise Cancelado(self.nombre)
+        self.hechos, self.total = hechos, total
+
+    def _correr(self):
+        self.estado = CORRIENDO
+        try:
+            self.resultado = self._funcion(*self._args, progreso=self._progreso, **self._kwargs)
+            self.estado = HECHO
+        except Cancelado:
+            self.estado = CANCELADO
+        except Exception as e:
+            self.error = e
+            self.estado = ERROR
+
+
+class ColaTrabajos:
+    """Corre los trabajos en orden, de a uno, en un hilo aparte.
+
+    `al_cambiar(cola)` y el `al_terminar(trabajo)` de cada trabajo se llaman
+    en el hilo de Tk: el primero cada `intervalo_ms` mientras haya trabajo
+    (para la barra de progreso), el segundo cuando el trabajo termina, falla
+    o se cancela (ver `trabajo.estado`, `resultado` y `error`).
+    """
+
+    def __init__(self, widget, al_cambiar=None, intervalo_ms: int = 100):
+        self._widget = widget
+        self._al_cambiar = al_cambiar
+        self._intervalo_ms = intervalo_ms
+        self._cola = deque()
+        self._actual = None
+        self._hilo = None
+        self._terminados = queue.Queue()
+        self._candado = threading.Lock()
+        self._revisando = False
+
+    @property
+    def actual(self):
+        """El trabajo que está corriendo, o None."""
+        return self._actual
+
+    def pendientes(self) -> list:
+        with self._candado:
+            return list(self._cola)
+
+    def ocupada(self) -> bool:
+        with self._candado:
+            return bool(self._cola) or self._actual is not None or not self._terminados.empty()
+
+    def agregar(self, nombre, funcion, *args, al_terminar=None, **kwargs) -> Trabajo:
+        """Encola funcion(*args, progreso=..., **kwargs) y devuelve el Trabajo."""
+        trabajo = Trabajo(nombre, funcion, args, kwargs, al_terminar)
+        with self._candado:
+            self._cola.append(trabajo)
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._trabajar, daemon=True)
+                self._hilo.start()
+        self._programar()
+        return trabajo
+
+    def cancelar(self, trabajo=None):
+        """Cancela `trabajo` (por defecto el que está corriendo).
+
+        Uno pendiente sale de la cola; el que corre se detiene la próxima
+        vez que el códec informa su avance.
+        """
+        with self._candado:
+            trabajo = trabajo or self._actual
+            if trabajo is None:
+                return
+            if trabajo in self._cola:
+                self._cola.remove(trabajo)
+                trabajo.estado = CANCELADO
+                self._terminados.put(trabajo)
+            else:
+                trabajo._cancelado.set()
+        self._programar()
+
+    def cancelar_todo(self):
+        for trabajo in self.pendientes():
+            self.cancelar(trabajo)
+        self.cancelar()
+
+    def _trabajar(self):
+        while True:
+            with self._candado:
+                if not self._cola:
+                    self._hilo = None
+                    return
+                trabajo = self._actual = self._cola.popleft()
+            trabajo._correr()
+            # Primero a terminados y después se suelta: así ocupada() nunca
+            # da False con un final sin avisar
+            self._terminados.put(trabajo)
+            with self._candado:
+                self._actual = None
+
+    def _programar(self):
+        if not self._revisando:
+            self._revisando = True
+            self._widget.after(self._intervalo_ms, self._revisar)
+
+    def _revisar(self):
+        # Hilo de Tk
+        self._revisando = False
+        while True:
+            try:
+                trabajo = self._terminados.get_nowait()
+            except queue.Empty:
+                break
+            if trabajo.al_terminar is not None:
+                trabajo.al_terminar(trabajo)
+        if self._al_cambiar is not None:
+            self._al_cambiar(self)
+        if self.ocupada():
+            self._programar()
+
+
+def texto_avance(cola) -> str:
+    """'⏳ libro.txt: 40% · 2 en cola', o '' si no hay nada corriendo."""
+    actual = cola.actual
+    if actual is None:
+        return ""
+    en_cola = len(cola.pendientes())
+    extra = f" · {en_cola} en cola" if en_cola else ""
+    return f"⏳ {actual.nombre}: {actual.fraccion:.0%}{extra}"
+
+
+def cola_con_avance(widget, poner_fraccion, etiqueta, boton_cancelar) -> ColaTrabajos:
+    """ColaTrabajos que muestra su avance en los widgets de una ventana.
+
+    `poner_fraccion(0..1)` mueve la barra (con customtkinter basta
+    `barra.set`; con ttk, `lambda f: barra.configure(value=f)`), `etiqueta`
+    recibe texto_avance y `boton_cancelar` se habilita solo mientras hay un
+    trabajo corriendo y lo cancela.
+    """
+    def al_cambiar(cola):
+        actual = cola.actual
+        poner_fraccion(actual.fraccion if actual else 0)
+        etiqueta.configure(text=texto_avance(cola))
+        boton_cancelar.configure(state="normal" if actual else "disabled")
+
+    cola = ColaTrabajos(widget, al_cambiar=al_cambiar)
+    boton_cancelar.configure(command=cola.cancelar)
+    return cola